@@ -16,6 +16,10 @@ class BaseDistribution(object, metaclass=ABCMeta):
 
     LOG_FLOAT_TINY = np.log(np.finfo(float).tiny)
 
+    # bounds of compare() scores
+    SCALE_MIN = -708.3964
+    SCALE_MAX = 100
+
     def __init__(self):
         self.additional_channels = []
 
@@ -53,6 +57,22 @@ class BaseDistribution(object, metaclass=ABCMeta):
         """
         pass
 
+    def compare_groups(self, df: pd.DataFrame, groupby: List[str], reference_channel: str,
+                       data_channel: str) -> pd.Series:
+        """
+        Scores each group of rows in the dataframe (df) with compare(). Distributions that can score many groups in a
+        single vectorized pass should override this.
+        Args:
+            df: pandas DataFrame with columns of data to compare
+            groupby: columns of df that identify each group to score, e.g. sample and stratifiers
+            reference_channel: reference data channel in dataframe
+            data_channel: simulation data channel to compare to the reference data channel
+
+        Returns: a pandas Series of compare() scores indexed by the groupby columns
+        """
+        return df.set_index(groupby).groupby(groupby).apply(self.compare, reference_channel=reference_channel,
+                                                            data_channel=data_channel)
+
     @abstractmethod
     def add_percentile_values(self, dfw: DataFrameWrapper, channel: str, p: float) -> List[str]:
         """
@@ -67,6 +87,21 @@ class BaseDistribution(object, metaclass=ABCMeta):
         """
         pass
 
+    @abstractmethod
+    def add_percentile_values_batch(self, dfw: DataFrameWrapper, channel: str, ps: List[float]) -> List[str]:
+        """
+        Adds one new data channel per requested probability threshold/value to a DataFrameWrapper object for a
+        specified channel. All thresholds are computed in a single pass over the data and added to dfw at once, making
+        this preferable to repeated add_percentile_values() calls when constructing uncertainty envelopes.
+        Args:
+            dfw: DataFrameWrapper with data to construct percentiles and to add percentiles to
+            channel: the column in dfw that percentiles will be constructed from/for
+            ps: the 0-1 percentile levels for the given channel to add
+
+        Returns: a list containing the new channel names in dfw, in the same order as ps
+        """
+        pass
+
     @classmethod
     def from_string(cls, distribution_name: str) -> 'BaseDistribution':
         """
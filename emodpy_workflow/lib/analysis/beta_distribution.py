@@ -88,8 +88,9 @@ class BetaDistribution(BaseDistribution):
         return '%s--Beta-%s' % (channel, type)
 
     def add_percentile_values(self, dfw, channel, p):
-        from scipy.stats import beta
+        return self.add_percentile_values_batch(dfw=dfw, channel=channel, ps=[p])
 
+    def add_percentile_values_batch(self, dfw, channel, ps):
         alpha_channel = self.construct_beta_channel(channel=channel, type='alpha')
         beta_channel = self.construct_beta_channel(channel=channel, type='beta')
         required_items = [alpha_channel, beta_channel]
@@ -98,12 +99,16 @@ class BetaDistribution(BaseDistribution):
         except dfw.MissingRequiredData:
             self.add_beta_parameters(dfw=dfw, channel=channel)
 
-        values = beta.ppf(p, dfw._dataframe[alpha_channel], dfw._dataframe[beta_channel])
-        p_channel = self.construct_beta_channel(channel=channel, type=p)
-        values_df = pd.DataFrame({p_channel: values})
+        # one ppf call for all thresholds: broadcasting (n_ps, 1) against (1, n_rows) yields a (n_ps, n_rows) array
+        ps = np.asarray(ps, dtype=float)
+        alphas = dfw._dataframe[alpha_channel].to_numpy()
+        betas = dfw._dataframe[beta_channel].to_numpy()
+        values = beta.ppf(ps[:, np.newaxis], alphas[np.newaxis, :], betas[np.newaxis, :])
+
+        p_channels = [self.construct_beta_channel(channel=channel, type=float(p)) for p in ps]
+        values_df = pd.DataFrame(values.T, columns=p_channels, index=dfw._dataframe.index)
         dfw._dataframe = dfw._dataframe.join(values_df)
-        new_channels = [p_channel]
-        return new_channels
+        return p_channels
 
     def add_beta_parameters(self, dfw, channel):
         """
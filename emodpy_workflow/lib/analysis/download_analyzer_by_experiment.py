@@ -18,61 +18,94 @@ class DownloadAnalyzerByExperiment(IAnalyzer):
         self.output_path = output_path
         self.use_run_number = use_run_number
         self.use_sample_index = use_sample_index
+        self._infixes = {}  # (sample index, run number): filename infix, as many files share them
 
     def _directory_for_experiment(self, experiment_id):
         return os.path.join(self.output_path, experiment_id)
 
+    @staticmethod
+    def _directory_for_file(directory, filename):
+        return os.path.join(directory, os.path.splitext(os.path.basename(filename))[0])
+
     def directory_for_experiment_and_file(self, experiment_id, filename):
-        return os.path.join(self._directory_for_experiment(experiment_id=experiment_id),
-                            os.path.splitext(os.path.basename(filename))[0])
+        return self._directory_for_file(directory=self._directory_for_experiment(experiment_id=experiment_id),
+                                        filename=filename)
+
+    def destinations(self, item: Simulation):
+        # the directories and tags (for file naming) to write the files of a simulation with
+        return [(self._directory_for_experiment(experiment_id=str(item.experiment.id)), item.tags)]
 
     def per_group(self, items):
-        # Discover all experiment ids from the items
-        experiment_ids = {str(item.experiment.id) for item_id, item in items.items()}
+        # Discover all destination directories from the items
+        directories = {directory for item_id, item in items.items() for directory, _ in self.destinations(item=item)}
 
-        # make a directory matching each experiment and filename to download
-        for experiment_id in experiment_ids:
+        # make a directory matching each destination and filename to download
+        for directory in directories:
             for filename in self.filenames:
-                os.makedirs(self.directory_for_experiment_and_file(experiment_id=experiment_id, filename=filename),
-                            exist_ok=True)
+                os.makedirs(self._directory_for_file(directory=directory, filename=filename), exist_ok=True)
 
-    def _construct_output_file_path(self, item: Simulation, source_filename: str) -> str:
+    def _construct_output_file_path(self, directory: str, simulation_tags: dict, source_filename: str) -> str:
         # Sim files will be written to directories grouped by filename
-        output_dir = self.directory_for_experiment_and_file(experiment_id=str(item.experiment.id),
-                                                            filename=source_filename)
+        output_dir = self._directory_for_file(directory=directory, filename=source_filename)
         # construct the full file destination path
-        dest_filename = self._construct_filename(item.tags, source_filename)
+        dest_filename = self._construct_filename(simulation_tags, source_filename)
         file_path = os.path.join(output_dir, os.path.basename(dest_filename))
         return file_path
 
+    def destination_paths(self, item: Simulation, source_filename: str) -> list:
+        """
+        Determines where a simulation file is written to, creating the destination directories as needed.
+
+        Args:
+            item: the simulation the file belongs to
+            source_filename: the simulation directory relative path of the file
+
+        Returns: a list of destination file paths (more than one if the simulation stands in for several samples)
+        """
+        file_paths = []
+        for directory, simulation_tags in self.destinations(item=item):
+            os.makedirs(self._directory_for_file(directory=directory, filename=source_filename), exist_ok=True)
+            file_paths.append(self._construct_output_file_path(directory=directory, simulation_tags=simulation_tags,
+                                                               source_filename=source_filename))
+        return file_paths
+
     def map(self, data, item: Simulation):
         # Create the requested files
         file_paths = []
-        for source_filename in self.filenames:
-            file_path = self._construct_output_file_path(item=item, source_filename=source_filename)
-
-            with open(file_path, 'wb') as outfile:
-                try:
-                    outfile.write(data[source_filename])
-                except Exception:
-                    print(f"Could not write the file {source_filename} for simulation {item.id}")
-            file_paths.append(file_path)
+        for directory, simulation_tags in self.destinations(item=item):
+            for source_filename in self.filenames:
+                file_path = self._construct_output_file_path(directory=directory,
+                                                             simulation_tags=simulation_tags,
+                                                             source_filename=source_filename)
+
+                with open(file_path, 'wb') as outfile:
+                    try:
+                        outfile.write(data[source_filename])
+                    except Exception:
+                        print(f"Could not write the file {source_filename} for simulation {item.id}")
+                file_paths.append(file_path)
         return file_paths  # returning file_paths written out so reduce() can report them to the caller
 
-    def _construct_filename(self, simulation_tags, filename):
-        infix = []
+    def _filename_infix(self, simulation_tags):
         try:
-            if self.use_sample_index:
-                sample_index = simulation_tags[self.sample_tag]
-                infix.append('sample{:05d}'.format(int(sample_index)))
-            if self.use_run_number:
-                run_number = simulation_tags[self.run_number]
-                infix.append("run{:05d}".format(int(run_number)))
+            key = (simulation_tags[self.sample_tag] if self.use_sample_index else None,
+                   simulation_tags[self.run_number] if self.use_run_number else None)
         except KeyError:
             raise KeyError(f'Experiment simulations must have the following tags in order to be compatible:'
                            f'\n- {self.sample_tag} for the sample index'
                            f'\n- {self.run_number} for the repetition/run number')
+        if key not in self._infixes:
+            sample_index, run_number = key
+            infix = []
+            if self.use_sample_index:
+                infix.append('sample{:05d}'.format(int(sample_index)))
+            if self.use_run_number:
+                infix.append("run{:05d}".format(int(run_number)))
+            self._infixes[key] = infix
+        return self._infixes[key]
 
+    def _construct_filename(self, simulation_tags, filename):
+        infix = self._filename_infix(simulation_tags=simulation_tags)
         prefix, extension = os.path.splitext(filename)
         constructed_filename = '_'.join([prefix, *infix]) + extension
         return constructed_filename
@@ -2,6 +2,7 @@ import os
 import pandas as pd
 
 from emodpy_workflow.lib.analysis.download_analyzer_by_experiment import DownloadAnalyzerByExperiment
+from emodpy_workflow.lib.utils.simulation_index import LINKED_SIMULATIONS_FILENAME
 
 
 class DownloadAnalyzerByExperimentReceipt(DownloadAnalyzerByExperiment):
@@ -12,15 +13,44 @@ class DownloadAnalyzerByExperimentReceipt(DownloadAnalyzerByExperiment):
     def __init__(self, filenames, receipt_file, use_run_number=True, use_sample_index=True):
         self.receipt = pd.read_csv(receipt_file, index_col='index')
         output_path = os.path.dirname(os.path.abspath(receipt_file))
+        # previously completed simulations linked into the receipt experiments instead of being re-run (if any)
+        linked_path = os.path.join(output_path, LINKED_SIMULATIONS_FILENAME)
+        if os.path.exists(linked_path):
+            self.linked_simulations = pd.read_csv(linked_path, dtype={'simulation_id': str})
+        else:
+            self.linked_simulations = pd.DataFrame(columns=['receipt_index', 'sample_index', 'simulation_id'])
         super().__init__(filenames=filenames, output_path=output_path,
                          use_run_number=use_run_number, use_sample_index=use_sample_index)
 
+        # lookups by experiment / simulation id, computed once rather than by filtering the receipt for every file
+        self._experiment_directories = {}
+        for receipt_index, row in self.receipt.iterrows():
+            if not pd.isna(row['experiment_id']):
+                # the first receipt row of an experiment id names its directory
+                self._experiment_directories.setdefault(str(row['experiment_id']), os.path.join(
+                    self.output_path, self._directory_name(experiment_name=row['experiment_name'],
+                                                           sample_index=receipt_index)))
+        self._linked_destinations = {}
+        for _, row in self.linked_simulations.iterrows():
+            self._linked_destinations.setdefault(str(row['simulation_id']), []).append(
+                (os.path.join(self.output_path, self._directory_name(
+                    experiment_name=self.receipt.loc[row['receipt_index'], 'experiment_name'],
+                    sample_index=row['receipt_index'])), int(row['sample_index'])))
+
     @staticmethod
     def _directory_name(experiment_name, sample_index):
         return f'{experiment_name}--{sample_index}'
 
     def _directory_for_experiment(self, experiment_id):
-        receipt_row = self.receipt[self.receipt['experiment_id'] == experiment_id]
-        return os.path.join(self.output_path, self._directory_name(
-            experiment_name=receipt_row.experiment_name.values[0],
-            sample_index=receipt_row.index.values[0]))
+        return self._experiment_directories[str(experiment_id)]
+
+    @property
+    def linked_simulation_ids(self):
+        return sorted(self.linked_simulations['simulation_id'].unique())
+
+    def destinations(self, item):
+        linked = self._linked_destinations.get(str(item.id))
+        if linked is None:
+            return super().destinations(item=item)
+        # a linked simulation is written as the sample of each receipt experiment it stands in for
+        return [(directory, {**item.tags, self.sample_tag: sample_index}) for directory, sample_index in linked]
@@ -1,4 +1,3 @@
-import math
 import numpy as np
 import pandas as pd
 
@@ -12,6 +11,8 @@ class GaussianDistribution(BaseDistribution):
 
     UNCERTAINTY_CHANNEL = 'two_sigma'
 
+    LOG_ROOT_2PI = np.multiply(0.5, np.log(np.multiply(2, np.pi)))
+
     def prepare(self, dfw, channel, weight_channel=None, additional_keep=None):
         additional_keep = additional_keep or []
         # First verify that the data row uncertainties are set properly (all > 0)
@@ -28,65 +29,105 @@ class GaussianDistribution(BaseDistribution):
         channels_to_keep = channels_to_keep + [weight_channel] if weight_channel is not None else channels_to_keep
         dfw = dfw.filter(keep_only=channels_to_keep)
         self.additional_channels.append(self.UNCERTAINTY_CHANNEL)
+
+        # precompute the reference variance terms once so every later compare() call can reuse them
+        self.variance_channel, self.log_variance_channel = self.add_variance_terms(dfw=dfw)
+        self.additional_channels += [self.variance_channel, self.log_variance_channel]
         return dfw
 
     @staticmethod
     def construct_gaussian_channel(channel, type):
         return '%s--Gaussian-%s' % (channel, type)
 
+    def add_variance_terms(self, dfw):
+        """
+        Compute and add the variance and log(variance) of the reference data, derived from the uncertainty channel, to
+            the provided DataFrameWrapper. Results are put into new channels/columns named two_sigma--Gaussian-variance
+            and two_sigma--Gaussian-log_variance . If both channels already exist in the dataframe, nothing is computed.
+        :param dfw: The DataFrameWrapper to add variance channels to.
+        :return: a list of the variance and log(variance) channel names.
+        """
+        variance_channel = self.construct_gaussian_channel(channel=self.UNCERTAINTY_CHANNEL, type='variance')
+        log_variance_channel = self.construct_gaussian_channel(channel=self.UNCERTAINTY_CHANNEL, type='log_variance')
+        new_channels = [variance_channel, log_variance_channel]
+
+        if variance_channel not in dfw.channels and log_variance_channel not in dfw.channels:
+            dfw.verify_required_items(needed=[self.UNCERTAINTY_CHANNEL])
+            variance, log_variance = self.variance_terms(two_sigma=dfw._dataframe[self.UNCERTAINTY_CHANNEL])
+            dfw._dataframe = dfw._dataframe.join(pd.DataFrame({variance_channel: variance,
+                                                               log_variance_channel: log_variance}))
+        return new_channels
+
+    @staticmethod
+    def variance_terms(two_sigma):
+        """
+        Converts two-sigma uncertainties into variances and their logarithms.
+        :param two_sigma: scalar or array of two-sigma uncertainty values
+        :return: a tuple of (variance, log(variance)) with the same shape as two_sigma
+        """
+        variance = np.divide(two_sigma, 1.96)**2
+        return variance, np.log(variance)
+
+    @classmethod
+    def scaled_log_likelihoods(cls, reference, simulated, variance, log_variance):
+        """
+        The vectorized gaussian scoring kernel. Computes the scaled log likelihood of each simulated value given its
+        reference value and (row-specific) reference variance. All inputs are broadcast against each other, so any mix
+        of scalars and equal-length arrays (e.g. every sample x stratum row of an analysis at once) is accepted.
+        :param reference: reference data values
+        :param simulated: simulation data values
+        :param variance: reference data variances, e.g. from variance_terms()
+        :param log_variance: log of the variance argument, e.g. from variance_terms()
+        :return: an array of scores between SCALE_MIN and SCALE_MAX (bad, good), one per input row
+        """
+        largest_possible_log_of_gaussian = - cls.LOG_ROOT_2PI - np.multiply(0.5, log_variance)
+        log_of_gaussian = largest_possible_log_of_gaussian - \
+            np.divide(np.multiply(0.5, (np.subtract(simulated, reference)**2)), variance)
+
+        # NaN comparisons are False, so invalid rows are floored to SCALE_MIN as well
+        return np.where(log_of_gaussian > cls.SCALE_MIN,
+                        log_of_gaussian + cls.SCALE_MAX - largest_possible_log_of_gaussian,
+                        cls.SCALE_MIN)
+
+    def _scaled_log_likelihoods_for(self, df, reference_channel, data_channel):
+        variance_channel = self.construct_gaussian_channel(channel=self.UNCERTAINTY_CHANNEL, type='variance')
+        log_variance_channel = self.construct_gaussian_channel(channel=self.UNCERTAINTY_CHANNEL, type='log_variance')
+        if variance_channel in df.columns and log_variance_channel in df.columns:
+            variance = df[variance_channel].to_numpy()
+            log_variance = df[log_variance_channel].to_numpy()
+        else:
+            variance, log_variance = self.variance_terms(two_sigma=df[self.UNCERTAINTY_CHANNEL].to_numpy())
+        return self.scaled_log_likelihoods(reference=df[reference_channel].to_numpy(),
+                                           simulated=df[data_channel].to_numpy(),
+                                           variance=variance,
+                                           log_variance=log_variance)
+
     def add_percentile_values(self, dfw, channel, p):
+        return self.add_percentile_values_batch(dfw=dfw, channel=channel, ps=[p])
+
+    def add_percentile_values_batch(self, dfw, channel, ps):
         required_items = [channel, self.UNCERTAINTY_CHANNEL]
         dfw.verify_required_items(needed=required_items)
 
-        values = norm.ppf(p, dfw._dataframe[channel], dfw._dataframe[self.UNCERTAINTY_CHANNEL])
-        p_channel = self.construct_gaussian_channel(channel=channel, type=p)
+        # one ppf call for all thresholds: broadcasting (n_ps, 1) against (1, n_rows) yields a (n_ps, n_rows) array
+        ps = np.asarray(ps, dtype=float)
+        means = dfw._dataframe[channel].to_numpy()
+        sigmas = dfw._dataframe[self.UNCERTAINTY_CHANNEL].to_numpy()
+        values = norm.ppf(ps[:, np.newaxis], means[np.newaxis, :], sigmas[np.newaxis, :])
 
-        values_df = pd.DataFrame({p_channel: values})
+        p_channels = [self.construct_gaussian_channel(channel=channel, type=float(p)) for p in ps]
+        values_df = pd.DataFrame(values.T, columns=p_channels, index=dfw._dataframe.index)
         dfw._dataframe = dfw._dataframe.join(values_df)
-        new_channels = [p_channel]
-        return new_channels
+        return p_channels
 
     def compare(self, df, reference_channel, data_channel):
-        # Note: Might be called extra times by pandas on apply for purposes of "optimization"
-        # http://stackoverflow.com/questions/21635915/why-does-pandas-apply-calculate-twice
-        #
-        log_root_2pi = np.multiply(0.5, np.log(np.multiply(2, np.pi)))
-
-        raw_data = df[reference_channel]
-        sim_data = df[data_channel]
-
-        two_sigma = df[self.UNCERTAINTY_CHANNEL]
-        if len(two_sigma.unique()) != 1:
-            raise Exception('Cannot determine what the raw data uncertainty is since it varies between replicates.')
-        two_sigma = list(two_sigma)[0]
-
-        raw_data_variance = np.divide(two_sigma, 1.96)**2
-
-        log_of_gaussian = - log_root_2pi -\
-            np.multiply(0.5, np.log(raw_data_variance)) -\
-            np.divide(np.multiply(0.5, ((sim_data - raw_data)**2)), raw_data_variance)
-
-        # add likelihood columns to df
-        df_sample_PA = df.copy()
-
-        df_sample_PA['log_of_gaussian'] = log_of_gaussian
-
-        largest_possible_log_of_gaussian = 0
-        largest_possible_log_of_gaussian = largest_possible_log_of_gaussian + (np.multiply(-1, log_root_2pi) - np.multiply(0.5, math.log(raw_data_variance)))
-
-        df_sample_PA['lplg'] = largest_possible_log_of_gaussian
-        df_sample_PA['scale_min'] = -708.3964
-        df_sample_PA['scale_max'] = 100
-
-        conditions = [
-            df_sample_PA['log_of_gaussian'] <= df_sample_PA['scale_min'],
-            df_sample_PA['log_of_gaussian'] > df_sample_PA['scale_min']]
-
-        choices = [df_sample_PA['scale_min'],
-                   df_sample_PA['log_of_gaussian'] + df_sample_PA['scale_max'] - df_sample_PA['lplg']]
-
-        df_sample_PA['scaled_log_of_gaussian'] = np.select(conditions, choices, default=-708.3964)
-
-        df_sample_PA['mean_of_gaussian'] = df_sample_PA['scaled_log_of_gaussian'].mean()
-
-        return df_sample_PA['scaled_log_of_gaussian'].mean()
+        scaled_log_of_gaussian = self._scaled_log_likelihoods_for(df=df, reference_channel=reference_channel,
+                                                                  data_channel=data_channel)
+        return scaled_log_of_gaussian.mean()
+
+    def compare_groups(self, df, groupby, reference_channel, data_channel):
+        # score every row at once, then average within groups; no per-group python calls
+        scaled_log_of_gaussian = self._scaled_log_likelihoods_for(df=df, reference_channel=reference_channel,
+                                                                  data_channel=data_channel)
+        scores = pd.Series(scaled_log_of_gaussian, index=df.index)
+        return scores.groupby([df[column] for column in groupby]).mean()
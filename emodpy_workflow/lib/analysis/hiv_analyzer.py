@@ -1,3 +1,5 @@
+import hashlib
+import io
 import logging
 import numpy as np
 import os
@@ -6,6 +8,7 @@ import pandas as pd
 from idmtools_calibra.analyzers.base_calibration_analyzer import BaseCalibrationAnalyzer
 
 from emodpy_workflow.lib.utils.analysis import model_population_in_year
+from emodpy_workflow.lib.utils.result_cache import ResultCache
 
 from emodpy_workflow.lib.analysis.age_bin import AgeBin
 from emodpy_workflow.lib.analysis.base_distribution import BaseDistribution
@@ -21,6 +24,10 @@ class HIVAnalyzer(BaseCalibrationAnalyzer):
     class InvalidSiteException(Exception): pass # noqa: E701
 
     SIM_RESULT_CHANNEL = 'Result'
+    LOG_LIKELIHOOD_CHANNEL = 'log_likelihood'
+    STRATUM_LIKELIHOODS_PREFIX = 'stratum_likelihoods_'
+    # column present only in placeholder post-process output of simulations ended early by dtk_in_process.py
+    EARLY_TERMINATION_CHANNEL = 'EarlyTermination'
     log_float_tiny = np.log(np.finfo(float).tiny)
 
     AGGREGATED_NODE_MAP = {PopulationObs.AGGREGATED_NODE: PopulationObs.AGGREGATED_PROVINCE}
@@ -89,6 +96,40 @@ class HIVAnalyzer(BaseCalibrationAnalyzer):
             raise self.MissingDataException(f"Missing reference data in ingest form for channel: {channel}, "
                                             f"provinciality: {provinciality}, ang_bins:  {age_bins_str}.")
 
+        # mapped results are only reusable for identical reference data and site scaling/node information
+        self.reference_hash = self._compute_reference_hash()
+        self.result_cache = None
+
+    def _compute_reference_hash(self):
+        reference_hash = hashlib.sha1()
+        row_hashes = pd.util.hash_pandas_object(self.reference._dataframe.sort_index(axis=1), index=False)
+        reference_hash.update(row_hashes.to_numpy().tobytes())
+        site_info = (sorted(self.site.node_map.items(), key=str), self.site.reference_population,
+                     self.site.reference_year, str(self.site.reference_age_bin), self.channel.type, self.filenames)
+        reference_hash.update(repr(site_info).encode('utf-8'))
+        return reference_hash.hexdigest()
+
+    def enable_result_cache(self, directory, max_size_mb=1000):
+        """
+        Turns on on-disk caching of map() results, keyed by simulation id, analyzer uid, and reference data hash. Files
+        of simulations with cached results are not parsed again, e.g. when resuming an interrupted analysis.
+        :param directory: directory of the on-disk cache; may be shared by multiple analyzers
+        :param max_size_mb: size, in MB, the cache is pruned to after each reduce()
+        :return: nothing
+        """
+        self.result_cache = ResultCache(directory=directory, max_size_mb=max_size_mb)
+        # raw file contents are parsed in map() and only on cache misses
+        self.parse = False
+
+    def _result_cache_key(self, item):
+        return str(item.id), self.uid, self.reference_hash
+
+    @staticmethod
+    def _as_dataframe(file_data):
+        if isinstance(file_data, pd.DataFrame):
+            return file_data
+        return pd.read_csv(io.BytesIO(file_data))
+
     def _trim_df(self, df):
         # keep only provincial or non-provincial/agg data, not both, depending on request
         if self.provinciality == PopulationObs.PROVINCIAL:
@@ -105,16 +146,43 @@ class HIVAnalyzer(BaseCalibrationAnalyzer):
             trimmed_df = trimmed_df.loc[trimmed_df['AgeBin'].isin(age_bin_strs)]
         return trimmed_df
 
+    def cached_result(self, item):
+        """
+        The cached map() result of a simulation, without reading its files.
+        :param item: the simulation
+        :return: the cached result, or None if the simulation has none or result caching is not enabled
+        """
+        if self.result_cache is None:
+            return None
+        return self.result_cache.get(key=self._result_cache_key(item=item))
+
     def map(self, data, item):
+        use_cache = self.result_cache is not None and item is not None
+        if use_cache:
+            result = self.result_cache.get(key=self._result_cache_key(item=item))
+            if result is not None:
+                return result
+
+        result = self._map(data=data)
+        if use_cache:
+            self.result_cache.put(key=self._result_cache_key(item=item), value=result)
+        return result
+
+    def _map(self, data):
         # Separated out to facilitate unit testing
 
+        sim = self._as_dataframe(data[self.filenames[0]])
+        if self.EARLY_TERMINATION_CHANNEL in sim.columns:
+            # the simulation grossly violated checkpoint bounds and was ended early; there is nothing to compare
+            return {'early_terminated': True}
+
         # rename nodes according to the node map
-        sim = data[self.filenames[0]].set_index('Node').rename(self.site.node_map).reset_index().rename(columns={'Node': 'Province'})
+        sim = sim.set_index('Node').rename(self.site.node_map).reset_index().rename(columns={'Node': 'Province'})
         sim = self._trim_df(df=sim)
 
         if self.channel.needs_pop_scaling:
             # drop non-provincial/agg data to prevent double counts with with provincial data
-            pop_data = data[self.filenames[1]]
+            pop_data = self._as_dataframe(data[self.filenames[1]])
             pop_data = pop_data.loc[pop_data['Node'] != PopulationObs.AGGREGATED_NODE]
             pop_scaling_factor = self.compute_pop_scaling_factor(pop_data)
             sim[self.SIM_RESULT_CHANNEL] *= pop_scaling_factor
@@ -145,15 +213,14 @@ class HIVAnalyzer(BaseCalibrationAnalyzer):
 
     @staticmethod
     def _compute_normalized_reference_weights(sample, stratifiers):
-        reference_weights = sample.set_index(stratifiers).groupby(stratifiers).apply(lambda df: df.loc[df.index[0], PopulationObs.WEIGHT_CHANNEL])
+        reference_weights = sample.groupby(stratifiers)[PopulationObs.WEIGHT_CHANNEL].first()
         normalized_reference_weights = reference_weights / reference_weights.sum()
         return normalized_reference_weights
 
     @staticmethod
     def _compute_log_likelihood_values(sample, stratifiers, distribution, reference_channel, data_channel):
-        log_likelihood = sample.set_index(stratifiers).groupby(stratifiers).apply(
-            distribution.compare, reference_channel=reference_channel, data_channel=data_channel
-        )
+        log_likelihood = distribution.compare_groups(df=sample, groupby=stratifiers,
+                                                     reference_channel=reference_channel, data_channel=data_channel)
         return log_likelihood
 
     @classmethod
@@ -177,23 +244,112 @@ class HIVAnalyzer(BaseCalibrationAnalyzer):
     def compare(self, sample, stratifiers, distribution, reference_channel, data_channel):
         return self._compare(sample, stratifiers, distribution, reference_channel, data_channel, weight=self.weight)
 
+    @classmethod
+    def _compute_stratum_likelihoods(cls, data, stratifiers, distribution, reference_channel, data_channel):
+        """
+        Scores all samples x strata in one distribution call. The result holds everything needed to compute sample
+        likelihoods under any analyzer or reference weighting, see combine_stratum_likelihoods().
+        """
+        data = data.reset_index()
+        groupby = ['Sample', *stratifiers]
+        log_likelihood = cls._compute_log_likelihood_values(sample=data,
+                                                            stratifiers=groupby,
+                                                            distribution=distribution,
+                                                            reference_channel=reference_channel,
+                                                            data_channel=data_channel)
+
+        # grab the weight for each stratified group (arbitrarily grabbing it off the first replicate)
+        reference_weights = data.groupby(groupby)[PopulationObs.WEIGHT_CHANNEL].first()
+        return pd.DataFrame({cls.LOG_LIKELIHOOD_CHANNEL: log_likelihood,
+                             PopulationObs.WEIGHT_CHANNEL: reference_weights})
+
+    @classmethod
+    def combine_stratum_likelihoods(cls, stratum_likelihoods, weight, reference_weights=None):
+        """
+        Computes weighted sample likelihoods from unweighted per-sample, per-stratum log likelihoods.
+        :param stratum_likelihoods: a DataFrame as returned by _compute_stratum_likelihoods() (or a saved copy of one)
+        :param weight: the analyzer weight
+        :param reference_weights: optional per-row replacement for the weight column of stratum_likelihoods
+        :return: a Series of weighted sample likelihoods indexed by Sample
+        """
+        samples = stratum_likelihoods.index.get_level_values('Sample')
+        if reference_weights is None:
+            reference_weights = stratum_likelihoods[PopulationObs.WEIGHT_CHANNEL]
+
+        # normalize the reference weights of the stratified groups within each sample
+        reference_weights = pd.Series(np.asarray(reference_weights, dtype=float), index=stratum_likelihoods.index)
+        normalized_reference_weights = reference_weights / reference_weights.groupby(samples).transform('sum')
+
+        weighted = stratum_likelihoods[cls.LOG_LIKELIHOOD_CHANNEL] * normalized_reference_weights
+        return weighted.groupby(samples).sum() * weight
+
+    @classmethod
+    def _compare_samples(cls, data, stratifiers, distribution, reference_channel, data_channel, weight):
+        """
+        Vectorized equivalent of calling _compare() on each sample in data.
+        """
+        stratum_likelihoods = cls._compute_stratum_likelihoods(data=data, stratifiers=stratifiers,
+                                                               distribution=distribution,
+                                                               reference_channel=reference_channel,
+                                                               data_channel=data_channel)
+        return cls.combine_stratum_likelihoods(stratum_likelihoods=stratum_likelihoods, weight=weight)
+
+    def _terminated_stratum_likelihoods(self, samples):
+        """
+        Stratum likelihoods of early-terminated samples: every reference stratum at the likelihood floor, with its
+        reference weight, so that combine_stratum_likelihoods() scores the samples at the (weighted) floor.
+        """
+        stratifiers = self.reference.stratifiers
+        reference_weights = self.reference._dataframe.groupby(stratifiers)[PopulationObs.WEIGHT_CHANNEL].first()
+        index = pd.MultiIndex.from_tuples([(sample, *stratum) for sample in samples
+                                           for stratum in reference_weights.index],
+                                          names=['Sample', *stratifiers])
+        return pd.DataFrame({self.LOG_LIKELIHOOD_CHANNEL: self.log_float_tiny,
+                             PopulationObs.WEIGHT_CHANNEL: np.tile(reference_weights.to_numpy(), len(samples))},
+                            index=index)
+
+    def _write_stratum_likelihoods(self, stratum_likelihoods):
+        # keep the unweighted likelihoods so the analysis can be re-weighted later without re-reading sim data
+        if self.working_dir is not None:
+            os.makedirs(self.working_dir, exist_ok=True)
+            stratum_likelihoods.to_csv(os.path.join(self.working_dir,
+                                                    self.construct_stratum_likelihoods_filename(uid=self.uid)))
+
+    @classmethod
+    def construct_stratum_likelihoods_filename(cls, uid):
+        return f'{cls.STRATUM_LIKELIHOODS_PREFIX}{uid}.csv'
+
     def reduce(self, all_data):
         """
         Combine the simulation data into a single table for all analyzed simulations.
         """
         data = {}
+        terminated_samples = set()
 
         # Create the data and key it with (sample,id)
         stratifiers = None
         reference_channel = None
         data_channel = None
         for simulation, mapping_dict in all_data.items():
-            key = (int(simulation.tags.get("__sample_index__")), simulation.id)
+            sample_index = int(simulation.tags.get("__sample_index__"))
+            if mapping_dict.get('early_terminated', False):
+                terminated_samples.add(sample_index)
+                continue
+            key = (sample_index, simulation.id)
             data[key] = mapping_dict['df']
             stratifiers = stratifiers or mapping_dict['stratifiers'] # only needs to be set once; they're identical
             reference_channel = reference_channel or mapping_dict['reference_channel']
             data_channel = data_channel or mapping_dict['data_channel']
 
+        # samples with any early-terminated replicate are scored at the (weighted) likelihood floor
+        data = {key: df for key, df in data.items() if key[0] not in terminated_samples}
+        terminated_results = pd.Series(self.log_float_tiny * self.weight, dtype=float,
+                                       index=pd.Index(sorted(terminated_samples), name='Sample'))
+        terminated_stratum_likelihoods = self._terminated_stratum_likelihoods(samples=sorted(terminated_samples))
+        if len(data) == 0:
+            self._write_stratum_likelihoods(stratum_likelihoods=terminated_stratum_likelihoods)
+            return terminated_results
+
         data = pd.concat(list(data.values()), axis=0,
                          keys=list(data.keys()),
                          names=['Sample', 'Sim_Id'])
@@ -206,15 +362,24 @@ class HIVAnalyzer(BaseCalibrationAnalyzer):
             data.sort_index(axis=1).to_csv(results_path)
 
         # compare sim data to reference data and determine a match likelihood
-        results = data.reset_index().groupby(['Sample']).apply(self.compare,
-                                                               stratifiers=stratifiers, distribution=self.distribution,
-                                                               reference_channel=reference_channel, data_channel=data_channel)
+        stratum_likelihoods = self._compute_stratum_likelihoods(data=data, stratifiers=stratifiers,
+                                                                distribution=self.distribution,
+                                                                reference_channel=reference_channel,
+                                                                data_channel=data_channel)
+        results = self.combine_stratum_likelihoods(stratum_likelihoods=stratum_likelihoods, weight=self.weight)
+        if len(terminated_samples) > 0:
+            results = pd.concat([results, terminated_results]).sort_index()
+            stratum_likelihoods = pd.concat([stratum_likelihoods, terminated_stratum_likelihoods]).sort_index()
+        self._write_stratum_likelihoods(stratum_likelihoods=stratum_likelihoods)
 
         if self.debug:
             results_path = os.path.join(self.output_dir, f"results_{self.uid}.csv")
             print(f'--> Writing to {results_path}')
             results.to_csv(results_path)
 
+        if self.result_cache is not None:
+            self.result_cache.prune()
+
         return results
 
     def compute_pop_scaling_factor(self, pop_df):
@@ -50,6 +50,16 @@ class HIVCalibSite(CalibSite):
 
         super().__init__(self.site_data['site_name'])
 
+    def enable_result_cache(self, directory, max_size_mb=1000):
+        """
+        Turns on on-disk caching of simulation analysis results for all analyzers of this site.
+        :param directory: directory of the on-disk cache
+        :param max_size_mb: maximum size, in MB, of the cache
+        :return: nothing
+        """
+        for analyzer in self.analyzers:
+            analyzer.enable_result_cache(directory=directory, max_size_mb=max_size_mb)
+
     def get_setup_functions(self):
         return []
 
@@ -77,6 +77,17 @@ class PopulationObs(DataFrameWrapper):
         self.derived_items += new_channels
         return new_channels
 
+    def add_percentile_values_batch(self, channel, distribution, ps):
+        """
+        Computes the inverse distribution of 'value' at each of the specified probability thresholds in one pass.
+        :param channel: the channel/column to compute percentiles with.
+        :param ps: probability thresholds, floats, 0-1
+        :return: a list of the newly added channels, one per threshold, in the order of ps.
+        """
+        new_channels = distribution.add_percentile_values_batch(dfw=self, channel=channel, ps=ps)
+        self.derived_items += new_channels
+        return new_channels
+
     def find_missing_tuples(self,
                             target: object,
                             value_column_base: str,
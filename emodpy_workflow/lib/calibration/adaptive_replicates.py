@@ -0,0 +1,160 @@
+import os
+from logging import getLogger
+
+import pandas as pd
+from idmtools.analysis.analyze_manager import AnalyzeManager
+from idmtools.builders import SimulationBuilder
+from idmtools.core import ItemType
+from idmtools_calibra.calib_manager import CalibManager
+from idmtools_calibra.iteration_state import IterationState
+from idmtools_calibra.utilities.mod_fn import ModFn
+
+logger = getLogger(__name__)
+
+
+class AdaptiveReplicateIterationState(IterationState):
+    """
+    An IterationState that runs a single replicate of each sample first, scores those, and then adds the remaining
+    replicates to the iteration's experiment only for samples whose likelihood is within a margin of the best sample.
+    The regular end-of-iteration analysis then scores every sample over however many replicates it has.
+    """
+
+    SCREENING_DIRECTORY = 'screening'
+
+    def __init__(self, **kwargs):
+        self.max_replicates = kwargs.pop('max_replicates', 1)
+        self.margin = kwargs.pop('margin', None)
+        self.followup_experiment_builder_function = kwargs.pop('followup_experiment_builder_function', None)
+        self.followup_commissioned = False
+        self.commissioned_samples = None
+        super().__init__(**kwargs)
+
+    @classmethod
+    def from_iteration_state(cls, state, max_replicates, margin, followup_experiment_builder_function):
+        # IterationState.__init__ has side effects (directory creation, status parsing), so copy a fully-initialized
+        # state rather than re-running it with the same arguments.
+        adaptive_state = cls.__new__(cls)
+        adaptive_state.__dict__.update(state.__dict__)
+        adaptive_state.max_replicates = max_replicates
+        adaptive_state.margin = margin
+        adaptive_state.followup_experiment_builder_function = followup_experiment_builder_function
+        adaptive_state.followup_commissioned = False
+        adaptive_state.commissioned_samples = None
+        return adaptive_state
+
+    @staticmethod
+    def select_samples(likelihoods, margin):
+        """
+        Selects the samples that deserve more replicates.
+        Args:
+            likelihoods: a Series of sample likelihoods indexed by sample index
+            margin: samples with a likelihood no more than this below the best likelihood are selected
+
+        Returns: a sorted list of selected sample indices
+        """
+        best = likelihoods.max()
+        return sorted(int(index) for index in likelihoods.index[likelihoods >= best - margin])
+
+    def screen(self):
+        """
+        Scores the single-replicate screening simulations of this iteration.
+
+        Returns: a Series of total (summed over analyzers) likelihood indexed by sample index
+        """
+        working_dir = os.path.join(self.iteration_directory, self.SCREENING_DIRECTORY)
+        os.makedirs(working_dir, exist_ok=True)
+        analyze_manager = AnalyzeManager(ids=[(self.experiment_id, ItemType.EXPERIMENT)],
+                                         analyzers=self.analyzer_list,
+                                         working_dir=working_dir,
+                                         verbose=False,
+                                         platform=self.platform,
+                                         force_manager_working_directory=True)
+        if not analyze_manager.analyze():
+            print("Error encountered during replicate screening analysis... Exiting")
+            exit()
+        results = pd.DataFrame({analyzer.uid: analyzer.results for analyzer in analyze_manager.analyzers})
+        results.index = results.index.astype(int)
+        return results.sum(axis=1)
+
+    def commission_followup(self, sample_indices):
+        """
+        Adds the remaining replicates of the given samples to this iteration's experiment and runs them.
+        Args:
+            sample_indices: indices of the samples to add replicates for
+
+        Returns: None
+        """
+        from idmtools.entities.templated_simulation import TemplatedSimulations
+
+        samples = {index: self.commissioned_samples[index] for index in sample_indices}
+        builder = self.followup_experiment_builder_function(samples, n_replicates=self.max_replicates - 1)
+        ts = TemplatedSimulations(base_task=self.task)
+        ts.add_builder(builder)
+
+        experiment = self.platform.get_item(self.experiment_id, ItemType.EXPERIMENT)
+        experiment.add_simulations(ts)
+        experiment.run(regather_common_assets=False)
+
+        self.simulations = {sim.id: sim.tags for sim in experiment.simulations}
+        self.followup_commissioned = True
+        logger.debug('Commissioned follow-up replicates for experiment id: %s' % self.experiment_id)
+        self.save()
+
+    def commission_iteration(self, next_params):
+        # keep the samples as commissioned (before any serialization) for building follow-up replicates
+        self.commissioned_samples = list(next_params)
+        super().commission_iteration(next_params)
+
+    def wait_for_finished(self, init_sleep=1.0, sleep_time=30):
+        super().wait_for_finished(init_sleep=init_sleep, sleep_time=sleep_time)
+        if self.followup_commissioned or self.max_replicates <= 1 or self.commissioned_samples is None:
+            # nothing to add, or resumed after commissioning; the iteration keeps its screening replicates only
+            return
+
+        likelihoods = self.screen()
+        selected = self.select_samples(likelihoods=likelihoods, margin=self.margin)
+        print(f'Replicate screening: {len(selected)} of {len(likelihoods)} samples are within {self.margin} of the '
+              f'best likelihood ({likelihoods.max()}) and will receive {self.max_replicates - 1} more replicate(s).')
+        self.commission_followup(sample_indices=selected)
+        super().wait_for_finished(init_sleep=init_sleep, sleep_time=sleep_time)
+
+
+class AdaptiveReplicateCalibManager(CalibManager):
+    """
+    A CalibManager that allocates replicates adaptively. See AdaptiveReplicateIterationState.
+    """
+
+    def __init__(self, *args, max_replicates=1, margin=10.0, **kwargs):
+        kwargs['sim_runs_per_param_set'] = 1  # the first, screening replicate
+        super().__init__(*args, **kwargs)
+        self.max_replicates = max_replicates
+        self.margin = margin
+
+    def followup_experiment_builder_function(self, samples, n_replicates):
+        """
+        Builds the additional replicates (numbered from 2) of selected samples, keeping their original sample indices.
+        Args:
+            samples: a dict of sample index: sample
+            n_replicates: the number of replicates to add per sample
+
+        Returns: a SimulationBuilder
+        """
+        sweeps = [[ModFn(site.setup_fn) for site in self.sites],
+                  [ModFn(self.map_replicates_callback, value=i + 2) for i in range(n_replicates)],
+                  [ModFn(self.map_sample_to_model_input_fn, index, sample.copy()) for index, sample in samples.items()]]
+
+        builder = SimulationBuilder()
+        count = 1
+        for sweep in sweeps:
+            builder.sweeps.append(sweep)
+            count *= len(sweep)
+        builder.count = count
+        return builder
+
+    def create_iteration_state(self, iteration):
+        state = super().create_iteration_state(iteration=iteration)
+        if not isinstance(state, AdaptiveReplicateIterationState):
+            state = AdaptiveReplicateIterationState.from_iteration_state(
+                state=state, max_replicates=self.max_replicates, margin=self.margin,
+                followup_experiment_builder_function=self.followup_experiment_builder_function)
+        return state
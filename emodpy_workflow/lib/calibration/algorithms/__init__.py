@@ -14,5 +14,9 @@
 #  defined dict of parameters for modifying, model is an object with references to input builders, sample constrainers,
 #  etc.
 #
+# def plotters() (optional)
+#  This returns a list of idmtools_calibra plotters compatible with the algorithm's state. If not defined, the
+#  LikelihoodPlotter and OptimToolPlotter are used.
+#
 
-available = ['optim_tool']
+available = ['optim_tool', 'gp_emulator', 'multi_start_optim_tool']
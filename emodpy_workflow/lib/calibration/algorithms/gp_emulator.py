@@ -0,0 +1,69 @@
+import os
+
+from emodpy_workflow.lib.utils.wrappers import constrain_sample_wrapper
+
+DEFAULTS = {
+    'n_candidates': 5000,
+    'exploration': 0.01,
+    'clip_percentile': 20.0,
+    'max_training_points': 1000,
+    'seed': None
+}
+
+ALGORITHM_NAME, _ = os.path.splitext(os.path.basename(__file__))
+
+
+def set_arguments(subparsers, entry_point):
+    parser = subparsers.add_parser(ALGORITHM_NAME,
+                                   help='Use a Gaussian process emulator (surrogate model) next point algorithm.')
+    parser.add_argument('--candidates',
+                        dest='n_candidates',
+                        type=int,
+                        default=DEFAULTS['n_candidates'],
+                        help=f"Number of candidate points scored by the emulator per iteration "
+                             f"(Default: {DEFAULTS['n_candidates']})")
+    parser.add_argument('--exploration',
+                        dest='exploration',
+                        type=float,
+                        default=DEFAULTS['exploration'],
+                        help=f"Improvement over the best likelihood (in emulator standard deviations) required before "
+                             f"a point is considered an improvement; larger values explore more "
+                             f"(Default: {DEFAULTS['exploration']})")
+    parser.add_argument('--clip-percentile',
+                        dest='clip_percentile',
+                        type=float,
+                        default=DEFAULTS['clip_percentile'],
+                        help=f"Likelihoods below this percentile are raised to it before fitting the emulator "
+                             f"(Default: {DEFAULTS['clip_percentile']})")
+    parser.add_argument('--max-training-points',
+                        dest='max_training_points',
+                        type=int,
+                        default=DEFAULTS['max_training_points'],
+                        help=f"Maximum number of (best) results to fit the emulator to "
+                             f"(Default: {DEFAULTS['max_training_points']})")
+    parser.add_argument('--seed',
+                        dest='seed',
+                        type=int,
+                        default=DEFAULTS['seed'],
+                        help="Random seed for sample selection (Default: unseeded)")
+    parser.set_defaults(func=entry_point)
+
+
+def initialize(args, params, frame):
+    from emodpy_workflow.lib.calibration.gp_emulator import GPEmulator
+
+    return GPEmulator(
+        params,
+        constrain_sample_wrapper(custom_sample_constrainer=frame.custom_sample_constrainer),
+        samples_per_iteration=args.n_samples,
+        n_candidates=args.n_candidates,
+        exploration=args.exploration,
+        clip_percentile=args.clip_percentile,
+        max_training_points=args.max_training_points,
+        seed=args.seed
+    )
+
+
+def plotters():
+    from idmtools_calibra.plotters.likelihood_plotter import LikelihoodPlotter
+    return [LikelihoodPlotter()]
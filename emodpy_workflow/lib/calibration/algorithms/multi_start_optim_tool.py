@@ -0,0 +1,78 @@
+import os
+
+from emodpy_workflow.lib.utils.wrappers import constrain_sample_wrapper
+
+DEFAULTS = {
+    'n_starts': 4,
+    'volume_fraction': 0.01,
+    'r_squared_threshold': 0.81,
+    'seed': None
+}
+
+ALGORITHM_NAME, _ = os.path.splitext(os.path.basename(__file__))
+
+
+def set_arguments(subparsers, entry_point):
+    parser = subparsers.add_parser(ALGORITHM_NAME,
+                                   help='Use several independent optim_tool searches at once, each from its own '
+                                        'starting point. Samples per iteration (-n) are divided evenly among them.')
+    parser.add_argument('-s', '--starts',
+                        dest='n_starts',
+                        type=int,
+                        default=DEFAULTS['n_starts'],
+                        help=f"Number of independent optim_tool searches (Default: {DEFAULTS['n_starts']})")
+    parser.add_argument('-v', '--volume-fraction',
+                        dest='volume_fraction',
+                        type=float,
+                        default=DEFAULTS['volume_fraction'],
+                        help=f"Fraction of parameter space to explore per iteration, per search "
+                             f"(Default: {DEFAULTS['volume_fraction']})")
+    parser.add_argument('-R', '--rsq-threshold',
+                        dest='r_squared_threshold',
+                        type=float,
+                        default=DEFAULTS['r_squared_threshold'],
+                        help=f"Variance threshold above which OptimTool selects next point by linear approximation "
+                             f"(Default: {DEFAULTS['r_squared_threshold']})")
+    parser.add_argument('--seed',
+                        dest='seed',
+                        type=int,
+                        default=DEFAULTS['seed'],
+                        help="Random seed for choosing starting points (Default: unseeded)")
+    parser.set_defaults(func=entry_point)
+
+
+def initialize(args, params, frame):
+    from idmtools_calibra.algorithms.optim_tool import OptimTool
+    from emodpy_workflow.lib.calibration.multi_start_optim_tool import MultiStartOptimTool
+
+    parameter_count = len([p for p in params if p['Dynamic']])
+    if parameter_count == 0:
+        warning_note = \
+            "/!\\ WARNING /!\\ OptimTool requires at least one of params with Dynamic set to True. Exiting..."
+        print(warning_note)
+        exit()
+
+    samples_per_start = args.n_samples // args.n_starts
+    if samples_per_start <= args.n_center_repeats:
+        print(f"/!\\ WARNING /!\\ {args.n_samples} samples per iteration over {args.n_starts} starts leaves "
+              f"{samples_per_start} samples per start, which must exceed center repeats ({args.n_center_repeats}). "
+              f"Exiting...")
+        exit()
+
+    r = OptimTool.get_r(parameter_count, args.volume_fraction)
+    return MultiStartOptimTool(
+        params,
+        constrain_sample_wrapper(custom_sample_constrainer=frame.custom_sample_constrainer),
+        n_starts=args.n_starts,
+        mu_r=r,
+        sigma_r=r / 10.,
+        center_repeats=args.n_center_repeats,
+        samples_per_start=samples_per_start,
+        rsquared_thresh=args.r_squared_threshold,
+        seed=args.seed
+    )
+
+
+def plotters():
+    from idmtools_calibra.plotters.likelihood_plotter import LikelihoodPlotter
+    return [LikelihoodPlotter()]
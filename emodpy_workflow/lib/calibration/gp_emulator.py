@@ -0,0 +1,261 @@
+import logging
+
+import numpy as np
+import pandas as pd
+from scipy.linalg import cho_factor, cho_solve
+from scipy.optimize import minimize
+from scipy.stats import norm, qmc
+
+from idmtools_calibra.algorithms.next_point_algorithm import NextPointAlgorithm
+
+logger = logging.getLogger(__name__)
+
+
+class GaussianProcess:
+    """
+    A minimal Gaussian process regressor with a squared-exponential kernel and one length scale per input dimension.
+    Inputs are expected to be scaled to the unit hypercube; outputs are standardized internally. Kernel
+    hyperparameters are fit by maximizing the log marginal likelihood.
+    """
+
+    MIN_LOG_LENGTH_SCALE = np.log(1e-2)
+    MAX_LOG_LENGTH_SCALE = np.log(1e1)
+    MIN_LOG_NOISE = np.log(1e-6)
+    MAX_LOG_NOISE = np.log(1.0)
+
+    def __init__(self, n_restarts=3, seed=None):
+        self.n_restarts = n_restarts
+        self.rng = np.random.default_rng(seed)
+        self.x = None
+        self.y_mean = 0.0
+        self.y_std = 1.0
+        self.log_length_scales = None
+        self.log_noise = np.log(1e-2)
+        self._y_standardized = None
+        self._cholesky = None
+        self._alpha = None
+
+    @staticmethod
+    def _kernel(x1, x2, length_scales):
+        scaled_distance = (x1[:, np.newaxis, :] - x2[np.newaxis, :, :]) / length_scales
+        return np.exp(-0.5 * np.sum(scaled_distance ** 2, axis=-1))
+
+    def _negative_log_marginal_likelihood(self, theta, x, y):
+        length_scales, noise = np.exp(theta[:-1]), np.exp(theta[-1])
+        k = self._kernel(x, x, length_scales) + noise * np.eye(len(x))
+        try:
+            cholesky = cho_factor(k, lower=True)
+        except np.linalg.LinAlgError:
+            return np.inf
+        alpha = cho_solve(cholesky, y)
+        return 0.5 * y @ alpha + np.sum(np.log(np.diag(cholesky[0]))) + 0.5 * len(x) * np.log(2 * np.pi)
+
+    def fit(self, x, y):
+        """
+        Fits the process to observations.
+        Args:
+            x: (n, d) array of inputs in the unit hypercube
+            y: (n,) array of observed outputs
+
+        Returns: self
+        """
+        self.x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self.y_mean = y.mean()
+        self.y_std = y.std() if y.std() > 0 else 1.0
+        y_standardized = (y - self.y_mean) / self.y_std
+
+        n_dimensions = self.x.shape[1]
+        bounds = [(self.MIN_LOG_LENGTH_SCALE, self.MAX_LOG_LENGTH_SCALE)] * n_dimensions + \
+                 [(self.MIN_LOG_NOISE, self.MAX_LOG_NOISE)]
+        starts = [np.append(np.full(n_dimensions, np.log(0.3)), np.log(1e-2))]
+        starts += [self.rng.uniform(*np.array(bounds).T) for _ in range(self.n_restarts)]
+
+        best = None
+        for start in starts:
+            result = minimize(self._negative_log_marginal_likelihood, start, args=(self.x, y_standardized),
+                              method='L-BFGS-B', bounds=bounds)
+            if np.isfinite(result.fun) and (best is None or result.fun < best.fun):
+                best = result
+        theta = starts[0] if best is None else best.x
+        self.log_length_scales, self.log_noise = theta[:-1], theta[-1]
+        self._condition(y_standardized=y_standardized)
+        return self
+
+    def _condition(self, y_standardized):
+        self._y_standardized = y_standardized
+        k = self._kernel(self.x, self.x, np.exp(self.log_length_scales)) + np.exp(self.log_noise) * np.eye(len(self.x))
+        self._cholesky = cho_factor(k, lower=True)
+        self._alpha = cho_solve(self._cholesky, y_standardized)
+
+    def condition_on(self, x, y):
+        """
+        Adds observations without re-fitting kernel hyperparameters.
+        Args:
+            x: (m, d) array of inputs in the unit hypercube
+            y: (m,) array of (possibly assumed) outputs
+
+        Returns: self
+        """
+        y_standardized = np.append(self._y_standardized, (np.asarray(y, dtype=float) - self.y_mean) / self.y_std)
+        self.x = np.vstack([self.x, np.asarray(x, dtype=float)])
+        self._condition(y_standardized=y_standardized)
+        return self
+
+    def predict(self, x):
+        """
+        Predicts outputs at new inputs.
+        Args:
+            x: (m, d) array of inputs in the unit hypercube
+
+        Returns: a tuple of (mean, standard deviation) arrays of shape (m,)
+        """
+        x = np.asarray(x, dtype=float)
+        k_star = self._kernel(x, self.x, np.exp(self.log_length_scales))
+        mean = k_star @ self._alpha
+        v = cho_solve(self._cholesky, k_star.T)
+        variance = np.clip(1.0 - np.sum(k_star * v.T, axis=1), 1e-12, None)
+        return mean * self.y_std + self.y_mean, np.sqrt(variance) * self.y_std
+
+
+class GPEmulator(NextPointAlgorithm):
+    """
+    Surrogate-model calibration. A Gaussian process emulator is fit to all (parameters, likelihood) results so far and
+    each iteration's batch of samples is chosen by maximizing expected improvement over the best result, one sample at
+    a time, assuming each chosen sample returns its predicted likelihood ("kriging believer") so the batch spreads out.
+    Iteration 0 is a Latin hypercube design over the dynamic parameters.
+    """
+
+    def __init__(self, params, constrain_sample_fn=lambda s: s, samples_per_iteration=32, n_candidates=5000,
+                 exploration=0.01, clip_percentile=20.0, max_training_points=1000, seed=None):
+        super().__init__()
+        self.params = params
+        self.constrain_sample_fn = constrain_sample_fn
+        self.samples_per_iteration = int(samples_per_iteration)
+        self.n_candidates = int(n_candidates)
+        self.exploration = exploration
+        self.clip_percentile = clip_percentile
+        self.max_training_points = int(max_training_points)
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+
+        self.dynamic_names = [p['Name'] for p in self.params if p['Dynamic']]
+        if len(self.dynamic_names) == 0:
+            raise ValueError('GPEmulator requires at least one parameter with Dynamic set to True.')
+        self.x_min = np.array([p['Min'] for p in self.params if p['Dynamic']], dtype=float)
+        self.x_max = np.array([p['Max'] for p in self.params if p['Dynamic']], dtype=float)
+
+        self.data = pd.DataFrame(columns=['Iteration', '__sample_index__', 'Results', *self.get_param_names()])
+
+    def cleanup(self):
+        pass
+
+    def get_param_names(self):
+        return [p['Name'] for p in self.params]
+
+    def _to_unit(self, x):
+        return (np.asarray(x, dtype=float) - self.x_min) / (self.x_max - self.x_min)
+
+    def _from_unit(self, u):
+        return self.x_min + np.asarray(u, dtype=float) * (self.x_max - self.x_min)
+
+    def _samples_from_unit(self, u):
+        samples = pd.DataFrame({p['Name']: p['Guess'] for p in self.params}, index=range(len(u)))
+        samples[self.dynamic_names] = self._from_unit(u)
+        return samples.apply(self.constrain_sample_fn, axis=1)
+
+    def _initial_design(self):
+        u = qmc.LatinHypercube(d=len(self.dynamic_names), rng=self.rng).random(n=self.samples_per_iteration)
+        # always evaluate the user-provided guess
+        u[0] = np.clip(self._to_unit([p['Guess'] for p in self.params if p['Dynamic']]), 0, 1)
+        return u
+
+    def training_data(self):
+        """
+        Returns: a tuple of (unit hypercube inputs, clipped outputs) of all scored samples for fitting the emulator
+        """
+        scored = self.data.dropna(subset=['Results'])
+        scored = scored.sort_values(by='Results', ascending=False).head(self.max_training_points)
+        y = scored['Results'].to_numpy(dtype=float)
+        # very poor fits are all equally uninformative about the optimum; clip them so they don't dominate the fit
+        y = np.maximum(y, np.percentile(y, self.clip_percentile))
+        return self._to_unit(scored[self.dynamic_names].to_numpy(dtype=float)), y
+
+    @staticmethod
+    def expected_improvement(mean, std, best, exploration):
+        z = (mean - best - exploration) / std
+        return (mean - best - exploration) * norm.cdf(z) + std * norm.pdf(z)
+
+    def _candidates(self, x_train, y_train):
+        n_dimensions = len(self.dynamic_names)
+        n_local = self.n_candidates // 2
+        # half the candidates globally, half as perturbations of the best few points
+        u_global = self.rng.uniform(size=(self.n_candidates - n_local, n_dimensions))
+        best = x_train[np.argsort(y_train)[::-1][:max(1, min(10, len(y_train)))]]
+        centers = best[self.rng.integers(len(best), size=n_local)]
+        u_local = np.clip(centers + self.rng.normal(scale=0.05, size=(n_local, n_dimensions)), 0, 1)
+        return np.vstack([u_global, u_local])
+
+    def _select_batch(self):
+        x_train, y_train = self.training_data()
+        gp = GaussianProcess(seed=self.rng.integers(2 ** 32)).fit(x_train, y_train)
+        scale = gp.y_std
+        best = y_train.max()
+
+        candidates = self._candidates(x_train=x_train, y_train=y_train)
+        chosen = []
+        for _ in range(self.samples_per_iteration):
+            mean, std = gp.predict(candidates)
+            ei = self.expected_improvement(mean=mean, std=std, best=best, exploration=self.exploration * scale)
+            index = int(np.argmax(ei))
+            chosen.append(candidates[index])
+            gp.condition_on(x=candidates[[index]], y=mean[[index]])
+            candidates = np.delete(candidates, index, axis=0)
+        return np.array(chosen)
+
+    def get_samples_for_iteration(self, iteration):
+        if iteration == 0 or self.data['Results'].dropna().empty:
+            u = self._initial_design()
+        else:
+            u = self._select_batch()
+        samples = self._samples_from_unit(u=u)
+        self.add_samples(samples=samples, iteration=iteration)
+        return self.generate_samples_from_df(samples.reset_index(drop=True))
+
+    def add_samples(self, samples, iteration):
+        samples = samples.copy()
+        samples['Iteration'] = iteration
+        samples['__sample_index__'] = range(len(samples))
+        samples['Results'] = np.nan
+        previous = self.data[self.data['Iteration'] < iteration]
+        self.data = pd.concat([df for df in [previous, samples] if not df.empty], ignore_index=True)
+        self.data['Iteration'] = self.data['Iteration'].astype(int)
+
+    def set_results_for_iteration(self, iteration, results):
+        logger.info('%s: Setting results for iteration %d', self.__class__.__name__, iteration)
+        in_iteration = self.data['Iteration'] == iteration
+        self.data.loc[in_iteration, 'Results'] = results['total'].to_numpy(dtype=float)
+
+    def end_condition(self):
+        return False
+
+    def get_final_samples(self):
+        best = self.data.dropna(subset=['Results']).sort_values(by='Results', ascending=False).head(1)
+        final_samples = best[self.get_param_names()].reset_index(drop=True)
+        dtypes = {name: str(data.dtype) for name, data in final_samples.items()}
+        return {'final_samples': self.prep_for_dict(final_samples), 'final_samples_dtypes': dtypes}
+
+    def get_state(self):
+        return dict(params=self.params,
+                    samples_per_iteration=self.samples_per_iteration,
+                    n_candidates=self.n_candidates,
+                    exploration=self.exploration,
+                    clip_percentile=self.clip_percentile,
+                    max_training_points=self.max_training_points,
+                    data=self.prep_for_dict(self.data),
+                    data_dtypes={name: str(data.dtype) for name, data in self.data.items()})
+
+    def set_state(self, state, iteration):
+        self.data = pd.DataFrame.from_dict(state['data'], orient='columns')
+        for column, dtype in state['data_dtypes'].items():
+            self.data[column] = self.data[column].astype(dtype)
@@ -0,0 +1,123 @@
+import copy
+import logging
+
+import numpy as np
+import pandas as pd
+from scipy.stats import qmc
+
+from idmtools_calibra.algorithms.next_point_algorithm import NextPointAlgorithm
+from idmtools_calibra.algorithms.optim_tool import OptimTool
+
+logger = logging.getLogger(__name__)
+
+
+class MultiStartOptimTool(NextPointAlgorithm):
+    """
+    Runs several independent OptimTool hypersphere walks ("starts") side by side, each from its own center, and
+    commissions all of their samples together in each iteration. The first start begins at the parameter guesses and
+    the others at points of a Latin hypercube design over the dynamic parameters. Samples of an iteration are ordered
+    by start: start 0 has samples 0 to samples_per_start - 1, start 1 the next samples_per_start, and so on.
+    """
+
+    def __init__(self, params, constrain_sample_fn=lambda s: s, n_starts=4, mu_r=0.1, sigma_r=0.02,
+                 center_repeats=2, samples_per_start=10, rsquared_thresh=0.5, seed=None):
+        super().__init__()
+        self.params = params
+        self.n_starts = int(n_starts)
+        self.samples_per_start = int(samples_per_start)
+        if self.n_starts < 1:
+            raise ValueError('MultiStartOptimTool requires at least one start.')
+
+        self.start_params = self.choose_start_params(params=params, n_starts=self.n_starts, seed=seed)
+        self.starts = [OptimTool(start_params, constrain_sample_fn, mu_r=mu_r, sigma_r=sigma_r,
+                                 center_repeats=center_repeats, samples_per_iteration=self.samples_per_start,
+                                 rsquared_thresh=rsquared_thresh)
+                       for start_params in self.start_params]
+
+    @staticmethod
+    def choose_start_params(params, n_starts, seed=None):
+        """
+        Creates a copy of the calibration parameters per start, differing only in the Guess of dynamic parameters.
+        Args:
+            params: calibration parameters (dicts with Name, Dynamic, Guess, Min, Max, ...)
+            n_starts: number of starts to create parameters for
+            seed: random seed for the Latin hypercube design
+
+        Returns: a list of n_starts parameter lists
+        """
+        dynamic = [p for p in params if p['Dynamic']]
+        design = qmc.LatinHypercube(d=max(1, len(dynamic)), rng=np.random.default_rng(seed)).random(n=n_starts)
+        start_params = []
+        for index in range(n_starts):
+            start = copy.deepcopy(params)
+            if index > 0:
+                # the first start keeps the user guess
+                dynamic_index = 0
+                for p in start:
+                    if p['Dynamic']:
+                        p['Guess'] = p['Min'] + design[index][dynamic_index] * (p['Max'] - p['Min'])
+                        dynamic_index += 1
+            start_params.append(start)
+        return start_params
+
+    def cleanup(self):
+        for start in self.starts:
+            start.cleanup()
+
+    def get_param_names(self):
+        return [p['Name'] for p in self.params]
+
+    def get_samples_for_iteration(self, iteration):
+        samples = []
+        for start in self.starts:
+            samples += start.get_samples_for_iteration(iteration=iteration)
+        return samples
+
+    def set_results_for_iteration(self, iteration, results):
+        results = results.reset_index(drop=True)
+        for index, start in enumerate(self.starts):
+            first = index * self.samples_per_start
+            start_results = results.iloc[first:first + self.samples_per_start].reset_index(drop=True)
+            start.set_results_for_iteration(iteration=iteration, results=start_results)
+        logger.info('Best result by start and iteration:\n%s', self.summarize_starts())
+
+    def best_start(self):
+        """
+        Returns: the index of the start with the best result of its most recent scored iteration
+        """
+        best_results = []
+        for start in self.starts:
+            scored = start.data.dropna(subset=['Results'])
+            if scored.empty:
+                best_results.append(-np.inf)
+            else:
+                last_iteration = scored['Iteration'].max()
+                best_results.append(scored.loc[scored['Iteration'] == last_iteration, 'Results'].max())
+        return int(np.argmax(best_results))
+
+    def end_condition(self):
+        return False
+
+    def get_final_samples(self):
+        return self.starts[self.best_start()].get_final_samples()
+
+    def get_state(self):
+        return dict(n_starts=self.n_starts,
+                    samples_per_start=self.samples_per_start,
+                    start_params=self.start_params,
+                    starts=[start.get_state() for start in self.starts])
+
+    def set_state(self, state, iteration):
+        if state['n_starts'] != self.n_starts or state['samples_per_start'] != self.samples_per_start:
+            raise ValueError(f"Cannot change the number of starts ({state['n_starts']}) or samples per start "
+                             f"({state['samples_per_start']}) of an existing calibration.")
+        for start, start_state in zip(self.starts, state['starts']):
+            start.set_state(state=start_state, iteration=iteration)
+
+    def summarize_starts(self):
+        """
+        Returns: a DataFrame of the best result of each start by iteration, for monitoring progress
+        """
+        summaries = {index: start.data.groupby('Iteration')['Results'].max()
+                     for index, start in enumerate(self.starts)}
+        return pd.DataFrame(summaries).rename_axis(columns='start')
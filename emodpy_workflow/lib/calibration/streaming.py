@@ -0,0 +1,186 @@
+import time
+from datetime import datetime
+from logging import getLogger
+
+import pandas as pd
+from idmtools.core import EntityStatus, ItemType
+from idmtools.registry.functions import FunctionPluginManager
+from idmtools_calibra.calib_manager import CalibManager
+from idmtools_calibra.iteration_state import IterationState
+from idmtools_calibra.utilities.display import verbose_timedelta
+
+logger = getLogger(__name__)
+
+
+class StreamingIterationState(IterationState):
+    """
+    An IterationState that analyzes simulations as they complete instead of after the whole iteration is done. While
+    waiting on the iteration, each newly succeeded simulation has its files retrieved and run through the map() of
+    every analyzer. Analyzers must have their on-disk result cache enabled (HIVAnalyzer.enable_result_cache()); the
+    end-of-iteration analysis reduces from these cached results, retrieving files only for simulations missing from
+    the caches (e.g. when resuming an interrupted iteration).
+    """
+
+    class ResultCacheRequiredException(Exception):
+        pass
+
+    DEFAULT_POLL_INTERVAL = 30
+
+    def __init__(self, **kwargs):
+        self.poll_interval = kwargs.pop('poll_interval', self.DEFAULT_POLL_INTERVAL)
+        self.streamed_simulation_ids = set()
+        super().__init__(**kwargs)
+
+    @classmethod
+    def from_iteration_state(cls, state, poll_interval=DEFAULT_POLL_INTERVAL):
+        # IterationState.__init__ has side effects (directory creation, status parsing), so copy a fully-initialized
+        # state rather than re-running it with the same arguments.
+        streaming_state = cls.__new__(cls)
+        streaming_state.__dict__.update(state.__dict__)
+        streaming_state.poll_interval = poll_interval
+        streaming_state.streamed_simulation_ids = set()
+        return streaming_state
+
+    def _verify_result_caches(self):
+        uncached = [analyzer.uid for analyzer in self.analyzer_list if getattr(analyzer, 'result_cache', None) is None]
+        if len(uncached) > 0:
+            raise self.ResultCacheRequiredException(f'Streaming analysis requires result caching to be enabled for '
+                                                    f'all analyzers. Not enabled for: {", ".join(uncached)}')
+
+    def stream_completed_simulations(self, experiment):
+        """
+        Maps every succeeded simulation of the experiment that has not been mapped yet, storing the results in the
+        analyzer result caches.
+        Args:
+            experiment: the (status-refreshed) experiment of this iteration
+
+        Returns: the number of simulations newly mapped
+        """
+        filenames = sorted({filename for analyzer in self.analyzer_list for filename in analyzer.filenames})
+        n_mapped = 0
+        for simulation in experiment.simulations:
+            if simulation.status != EntityStatus.SUCCEEDED or simulation.id in self.streamed_simulation_ids:
+                continue
+            data = self.platform.get_files(simulation, filenames)
+            for analyzer in self.analyzer_list:
+                analyzer.map(data={filename: data[filename] for filename in analyzer.filenames}, item=simulation)
+            self.streamed_simulation_ids.add(simulation.id)
+            n_mapped += 1
+        return n_mapped
+
+    def collect_map_results(self, experiment):
+        """
+        Gathers the map() results of every succeeded simulation of the experiment, from the analyzer result caches
+        where possible. Files are only retrieved for simulations missing from a cache, once per simulation.
+        Args:
+            experiment: the (done) experiment of this iteration
+
+        Returns: a dict of analyzer uid: {simulation: map() result}
+        """
+        all_data = {analyzer.uid: {} for analyzer in self.analyzer_list}
+        for simulation in experiment.simulations:
+            if simulation.status != EntityStatus.SUCCEEDED:
+                continue
+            uncached = []
+            for analyzer in self.analyzer_list:
+                result = analyzer.cached_result(item=simulation)
+                if result is None:
+                    uncached.append(analyzer)
+                else:
+                    all_data[analyzer.uid][simulation] = result
+            if len(uncached) > 0:
+                filenames = sorted({filename for analyzer in uncached for filename in analyzer.filenames})
+                data = self.platform.get_files(simulation, filenames)
+                for analyzer in uncached:
+                    all_data[analyzer.uid][simulation] = analyzer.map(
+                        data={filename: data[filename] for filename in analyzer.filenames}, item=simulation)
+        return all_data
+
+    def analyze_iteration(self):
+        """
+        Analyzes the iteration as IterationState.analyze_iteration() does, but reduces from the map() results cached
+        while streaming instead of re-running the whole analysis.
+        """
+        if self.results:
+            logger.info('Reloading results from cached iteration state.')
+            return self.results['total']
+
+        self._verify_result_caches()
+        for analyzer in self.analyzer_list:
+            analyzer.working_dir = self.iteration_directory
+            analyzer.initialize()
+
+        experiment = self.platform.get_item(self.experiment_id, ItemType.EXPERIMENT)
+        all_data = self.collect_map_results(experiment=experiment)
+        for analyzer in self.analyzer_list:
+            # make sure each results index is sorted in correct order (ascending)
+            results = analyzer.reduce(all_data[analyzer.uid])
+            results.index = results.index.astype(int)
+            analyzer.results = results.sort_index(ascending=True)
+            analyzer.destroy()
+
+        self.analyzers = {analyzer.uid: analyzer.cache() if callable(getattr(analyzer, 'cache', None)) else {}
+                          for analyzer in self.analyzer_list}
+        results = pd.DataFrame({analyzer.uid: analyzer.results for analyzer in self.analyzer_list})
+        self.results = self.next_point_algo.get_results_to_cache(results)
+        self.next_point_algo.set_results_for_iteration(self.iteration, results)
+
+        self.all_results, self.summary_table = self.next_point_algo.update_summary_table(self, self.all_results)
+        top_columns = ['iteration', 'total']
+        self.all_results = self.all_results.reindex(
+            columns=(top_columns + [column for column in self.all_results.columns if column not in top_columns]))
+
+        logger.info(self.summary_table)
+        print(self.summary_table)
+
+    def wait_for_finished(self, init_sleep=1.0, sleep_time=None):
+        self._verify_result_caches()
+        sleep_time = self.poll_interval if sleep_time is None else sleep_time
+        logger.debug('Waiting for iteration %s simulations to complete, analyzing as they do' % self.iteration)
+
+        experiment = self.platform.get_item(self.experiment_id, ItemType.EXPERIMENT)
+        time.sleep(init_sleep)
+        while True:
+            self.platform.refresh_status(experiment)
+
+            # overlap analysis with the simulations still running
+            n_mapped = self.stream_completed_simulations(experiment=experiment)
+            iteration_time_elapsed = datetime.now() - self.iteration_start
+            logger.info('Iteration %s: analyzed %d of %d simulations (%d new) after %s' %
+                        (self.iteration, len(self.streamed_simulation_ids), len(experiment.simulations), n_mapped,
+                         verbose_timedelta(iteration_time_elapsed)))
+
+            if experiment.any_failed and not experiment.done:
+                print("\nOne or more simulations failed. Calibration cannot continue. Exiting...")
+                FunctionPluginManager.instance().hook.idmtools_runnable_on_failure(item=experiment)
+                self.cancel()
+                exit()
+
+            if experiment.done:
+                FunctionPluginManager.instance().hook.idmtools_runnable_on_done(item=experiment)
+                break
+
+            time.sleep(sleep_time)
+
+        if not experiment.succeeded:
+            print("\nexperiment failed")
+            exit()
+        FunctionPluginManager.instance().hook.idmtools_runnable_on_succeeded(item=experiment)
+        logger.info("Iteration %s done (took %s)" % (self.iteration,
+                                                     verbose_timedelta(datetime.now() - self.iteration_start)))
+
+
+class StreamingCalibManager(CalibManager):
+    """
+    A CalibManager whose iterations analyze simulations as they complete. See StreamingIterationState.
+    """
+
+    def __init__(self, *args, poll_interval=StreamingIterationState.DEFAULT_POLL_INTERVAL, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.poll_interval = poll_interval
+
+    def create_iteration_state(self, iteration):
+        state = super().create_iteration_state(iteration=iteration)
+        if not isinstance(state, StreamingIterationState):
+            state = StreamingIterationState.from_iteration_state(state=state, poll_interval=self.poll_interval)
+        return state
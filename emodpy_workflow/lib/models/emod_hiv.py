@@ -3,15 +3,22 @@ from idmtools.entities.itask import ITask
 
 from emodpy_workflow.lib.models.iemod_model import IEMODModel
 from emodpy_workflow.lib.utils.project_data import get_ingest_information
-from emodpy_workflow.lib.utils.runtime import add_post_channel_config_as_asset, get_embedded_python_paths
+from emodpy_workflow.lib.utils.runtime import add_post_channel_config_as_asset, add_checkpoint_bounds_as_asset, \
+    add_extraction_spec_as_asset, get_embedded_python_paths
 
 
 class EMOD_HIV(IEMODModel):
+    DEFAULT_EARLY_TERMINATION_TOLERANCE = 3.0
 
     def __init__(self, ingest_form_path=None, **kwargs):
         self.ingest_form_path = ingest_form_path
+        manifest = kwargs.get('manifest', None)
+        extraction_spec_path = getattr(manifest, 'extraction_spec_path', None)
         if self.ingest_form_path is None:
-            embedded_python_paths, self.post_processing_config_file_setter = self._handle_python_processing()
+            # without an ingest form there are no channels to post-process, but report extracts may be requested
+            post_processing_path = None if extraction_spec_path is None else manifest.post_processing_path
+            embedded_python_paths, self.post_processing_config_file_setter = self._handle_python_processing(post_processing_path=post_processing_path,
+                                                                                                            extraction_spec_path=extraction_spec_path)
             calibration_parameters = None
             site = None
         else:
@@ -22,17 +29,32 @@ class EMOD_HIV(IEMODModel):
                                                                                                             site_info=ingest_info['site_info'],
                                                                                                             pre_processing_path=kwargs['manifest'].pre_processing_path,
                                                                                                             in_processing_path=kwargs['manifest'].in_processing_path,
-                                                                                                            post_processing_path=kwargs['manifest'].post_processing_path)
+                                                                                                            post_processing_path=kwargs['manifest'].post_processing_path,
+                                                                                                            early_termination_tolerance=getattr(kwargs['manifest'], 'early_termination_tolerance',
+                                                                                                                                                self.DEFAULT_EARLY_TERMINATION_TOLERANCE),
+                                                                                                            extraction_spec_path=extraction_spec_path)
         super().__init__(embedded_python_scripts_paths=embedded_python_paths, calibration_parameters=calibration_parameters,
                          site=site, **kwargs)
 
     @staticmethod
     def _handle_python_processing(channels=None, reference_data=None, site_info=None,
-                                  pre_processing_path=None, in_processing_path=None, post_processing_path=None):
+                                  pre_processing_path=None, in_processing_path=None, post_processing_path=None,
+                                  early_termination_tolerance=DEFAULT_EARLY_TERMINATION_TOLERANCE,
+                                  extraction_spec_path=None):
         # generate channel config as an asset if requested and add post processing to match
-        if channels and reference_data and site_info:
-            def post_processing_config_file_setter(task):
-                add_post_channel_config_as_asset(task=task, channels=channels, reference_data=reference_data, site_info=site_info)
+        with_channels = bool(channels and reference_data and site_info)
+        # the standard post-processor also writes compact report extracts, for downloading instead of reports
+        with_extracts = post_processing_path is not None and extraction_spec_path is not None
+        if with_channels or with_extracts:
+            def post_processing_config_file_setter(task, early_termination=False):
+                if with_channels:
+                    add_post_channel_config_as_asset(task=task, channels=channels, reference_data=reference_data, site_info=site_info)
+                    # the standard in-processor ends simulations that grossly violate these reference-based bounds
+                    if early_termination and in_processing_path is not None:
+                        add_checkpoint_bounds_as_asset(task=task, reference_data=reference_data,
+                                                       tolerance=early_termination_tolerance)
+                if with_extracts:
+                    add_extraction_spec_as_asset(task=task, spec_path=extraction_spec_path)
 
             embedded_python_paths = get_embedded_python_paths(pre_processing_path=pre_processing_path,
                                                               in_processing_path=in_processing_path,
@@ -56,12 +78,12 @@ class EMOD_HIV(IEMODModel):
         task.common_assets.add_asset(Asset(path))
         return task
 
-    def initialize_task(self):
-        task = super().initialize_task()
+    def initialize_task(self, early_termination=False):
+        task = super().initialize_task(early_termination=early_termination)
 
         # add the post processor config file if post-processing is requested
         if self.post_processing_config_file_setter:
-            self.post_processing_config_file_setter(task=task)
+            self.post_processing_config_file_setter(task=task, early_termination=early_termination)
         if self.ingest_form_path is not None:
             self.add_ingest_form_to_assets(task, self.ingest_form_path)
         return task
@@ -75,7 +75,7 @@ class IEMODModel(IModel):
         }
         return parameters
 
-    def initialize_task(self):
+    def initialize_task(self, early_termination=False):
         # initializing with no config, demographics, or campaign.
         # These will get built later per-simulation.
         return EMODTask.from_defaults(schema_path=self.manifest.schema_path,
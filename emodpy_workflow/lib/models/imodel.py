@@ -11,7 +11,9 @@ class IModel(ABC):
         pass
 
     @abstractmethod
-    def initialize_task(self) -> ITask:
+    def initialize_task(self, early_termination: bool = False) -> ITask:
+        # early_termination: whether simulations of the task may be ended early when they are hopeless, for
+        # calibration. Scenario simulations always run to completion.
         pass
 
     @abstractmethod
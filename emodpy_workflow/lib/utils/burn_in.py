@@ -0,0 +1,186 @@
+import os
+from typing import Callable, Dict, List
+
+from idmtools.assets import Asset
+from idmtools.core import ItemType
+from idmtools.entities.experiment import Experiment
+from idmtools.entities.iplatform import IPlatform
+from idmtools.entities.simulation import Simulation
+
+from emodpy_workflow.lib.utils.frames import timestep_from_year
+
+# A burn-in simulation runs a sample up to the burn-in year and serializes its population there. Forked (scenario)
+# simulations of the same sample load that population and only simulate from the burn-in year onward. Sweep overrides
+# therefore only apply from the burn-in year onward (see validate_fork_overrides).
+
+SAMPLE_INDEX_TAG = '__sample_index__'
+BURN_IN_YEAR_TAG = 'Burn_In_Year'
+BURN_IN_FILENAME_TAG = 'Burn_In_Serialized_Filename'
+
+# each fork receives only its own sample's population, as a transient asset in its working directory
+SERIALIZED_POPULATION_PATH = '.'
+
+# the local directory (within the run output directory) burn-in populations are downloaded to, per burn-in experiment
+BURN_IN_POPULATIONS_DIRECTORY = 'burn_in_populations'
+
+# parameters only used when a simulation starts from scratch; forks start from a burn-in population instead
+INITIALIZATION_PARAMETERS = ['Base_Year', 'Demographics_Filenames', 'Run_Number', 'Start_Time', 'x_Base_Population']
+
+
+class BurnInFailedException(Exception):
+    pass
+
+
+def _set_parameters(simulation: Simulation, parameters: Dict) -> None:
+    for name, value in parameters.items():
+        simulation.task.set_parameter(name, value)
+
+
+def serialization_timestep(burn_in_year: float, base_year: float, simulation_timestep: float) -> int:
+    """
+    Determines the (integer) simulation timestep at which to serialize a burn-in population.
+
+    Args:
+        burn_in_year: the year to serialize the population at
+        base_year: the year the simulation starts in
+        simulation_timestep: the length of a simulation timestep (days)
+
+    Returns: the number of timesteps from the start of the simulation to the burn-in year
+    """
+    timestep = int(round(timestep_from_year(year=burn_in_year, base_year=base_year) / simulation_timestep))
+    if timestep <= 0:
+        raise ValueError(f'Burn-in year {burn_in_year} must be after the simulation base year {base_year} .')
+    return timestep
+
+
+def serialized_population_filename(timestep: int) -> str:
+    # the (single-core) filename EMOD writes a serialized population to, in the simulation output directory
+    return 'state-%05d.dtk' % timestep
+
+
+def burn_in_asset_filename(sample_index: int) -> str:
+    # the name a burn-in population is shared under (in forked simulation Assets); one per sample
+    return 'burn_in_sample_%d.dtk' % sample_index
+
+
+def configure_burn_in(simulation: Simulation, burn_in_year: float) -> Dict:
+    """
+    Sets up a built simulation to serialize its population at the burn-in year and end there.
+
+    Args:
+        simulation: a simulation with a built config
+        burn_in_year: the year to serialize the population at
+
+    Returns: a dict of simulation tag names/values
+    """
+    parameters = simulation.task.config.parameters
+    timestep = serialization_timestep(burn_in_year=burn_in_year, base_year=parameters.Base_Year,
+                                      simulation_timestep=parameters.Simulation_Timestep)
+    _set_parameters(simulation=simulation, parameters={'Serialization_Type': 'TIMESTEP',
+                                                       'Serialization_Time_Steps': [timestep],
+                                                       'Simulation_Duration': timestep * parameters.Simulation_Timestep})
+    return {BURN_IN_YEAR_TAG: burn_in_year, BURN_IN_FILENAME_TAG: serialized_population_filename(timestep=timestep)}
+
+
+def configure_fork(simulation: Simulation, burn_in_year: float, sample_index: int) -> Dict:
+    """
+    Sets up a built simulation to start from the burn-in population of its sample, shortening it accordingly. The
+    burn-in population must be a transient asset of the simulation (see fork_builder).
+
+    Args:
+        simulation: a simulation with a built config
+        burn_in_year: the year the burn-in population was serialized at
+        sample_index: the index of the sample the simulation (and its burn-in) was built from
+
+    Returns: a dict of simulation tag names/values
+    """
+    parameters = simulation.task.config.parameters
+    timestep = serialization_timestep(burn_in_year=burn_in_year, base_year=parameters.Base_Year,
+                                      simulation_timestep=parameters.Simulation_Timestep)
+    burn_in_duration = timestep * parameters.Simulation_Timestep
+    if burn_in_duration >= parameters.Simulation_Duration:
+        raise ValueError(f'Burn-in year {burn_in_year} is not before the end of the simulation.')
+    _set_parameters(simulation=simulation, parameters={
+        'Serialized_Population_Path': SERIALIZED_POPULATION_PATH,
+        'Serialized_Population_Filenames': [burn_in_asset_filename(sample_index=sample_index)],
+        'Start_Time': parameters.Start_Time + burn_in_duration,
+        'Simulation_Duration': parameters.Simulation_Duration - burn_in_duration
+    })
+    return {BURN_IN_YEAR_TAG: burn_in_year}
+
+
+def burn_in_builder(simulation: Simulation, inputs_builder: Callable, burn_in_year: float, **kwargs) -> Dict:
+    # builds the simulation inputs as usual, then turns the simulation into a burn-in
+    tags = inputs_builder(simulation, **kwargs)
+    tags.update(configure_burn_in(simulation=simulation, burn_in_year=burn_in_year))
+    return tags
+
+
+def fork_builder(simulation: Simulation, inputs_builder: Callable, burn_in_year: float, idx: int,
+                 burn_in_populations: Dict[int, str], **kwargs) -> Dict:
+    # builds the simulation inputs as usual, then starts the simulation from its sample's burn-in population
+    tags = inputs_builder(simulation, idx=idx, **kwargs)
+    tags.update(configure_fork(simulation=simulation, burn_in_year=burn_in_year, sample_index=idx))
+    simulation.task.transient_assets.add_asset(Asset(absolute_path=burn_in_populations[idx],
+                                                     filename=burn_in_asset_filename(sample_index=idx)))
+    return tags
+
+
+def validate_fork_overrides(overrides: Dict, burn_in_year: float) -> List[str]:
+    """
+    Checks the sweep overrides of forked simulations. Forks share the history of their sample up to the burn-in year,
+    so overrides of parameters used only to initialize a simulation are rejected, and overrides that look like years
+    before the burn-in year (e.g. the start year of an intervention) are reported, as they cannot take effect then.
+
+    Args:
+        overrides: a dict of swept parameter name: value
+        burn_in_year: the year forks start from
+
+    Returns: a list of warnings, one per override that may act before the burn-in year
+    """
+    initialization = [name for name in overrides if name in INITIALIZATION_PARAMETERS]
+    if len(initialization) > 0:
+        raise ValueError(f'Sweep overrides of parameters: {", ".join(initialization)} have no effect on simulations '
+                         f'forked from burn-in year {burn_in_year}, as they only initialize a simulation.')
+    return [f'Sweep override {name}: {value} is before burn-in year {burn_in_year}; forked simulations only apply '
+            f'it from the burn-in year onward.'
+            for name, value in overrides.items()
+            if 'year' in name.lower() and isinstance(value, (int, float)) and not isinstance(value, bool)
+            and value < burn_in_year]
+
+
+def collect_burn_in_populations(platform: IPlatform, experiment: Experiment, directory: str,
+                                sample_indices: List[int] = None) -> Dict[int, str]:
+    """
+    Downloads the serialized population of simulations of a completed burn-in experiment, one file at a time.
+    Populations already in the directory (e.g. from the original run, when resuming) are not downloaded again.
+
+    Args:
+        platform: the platform the burn-in experiment ran on
+        experiment: the burn-in experiment, or its id
+        directory: the directory to download the populations to, named via burn_in_asset_filename()
+        sample_indices: the samples to collect populations of. Default: all.
+
+    Returns: a dict of sample index: serialized population file path
+    """
+    experiment_id = getattr(experiment, 'id', experiment)
+    experiment = platform.get_item(experiment_id, item_type=ItemType.EXPERIMENT, force=True)
+    if not experiment.succeeded:
+        raise BurnInFailedException(f'Burn-in experiment {experiment.id} did not succeed. Forked simulations require '
+                                    f'the serialized population of every burn-in simulation.')
+
+    os.makedirs(directory, exist_ok=True)
+    populations = {}
+    for simulation in platform.get_children(experiment.id, item_type=ItemType.EXPERIMENT, force=True):
+        sample_index = int(simulation.tags[SAMPLE_INDEX_TAG])
+        if sample_indices is not None and sample_index not in sample_indices:
+            continue
+        path = os.path.join(directory, burn_in_asset_filename(sample_index=sample_index))
+        if not os.path.exists(path):
+            source = f"output/{simulation.tags[BURN_IN_FILENAME_TAG]}"
+            partial_path = f'{path}.partial'
+            with open(partial_path, 'wb') as f:
+                f.write(platform.get_files(simulation, [source])[source])
+            os.replace(partial_path, path)
+        populations[sample_index] = path
+    return populations
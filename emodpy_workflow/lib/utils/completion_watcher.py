@@ -0,0 +1,138 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Union
+
+from idmtools.core import EntityStatus, ItemType
+from idmtools.entities.experiment import Experiment
+from idmtools.entities.iplatform import IPlatform
+
+DONE_STATUSES = [EntityStatus.SUCCEEDED, EntityStatus.FAILED]
+
+
+@dataclass
+class ExperimentProgress:
+    experiment: Experiment
+    n_simulations: int
+    n_succeeded: int
+    n_failed: int
+    n_done: int  # simulations in any of DONE_STATUSES
+
+    @property
+    def done(self) -> bool:
+        return self.n_done == self.n_simulations
+
+    def __str__(self):
+        failed = f' ({self.n_failed} failed)' if self.n_failed > 0 else ''
+        return f'Experiment {self.experiment.name} ({self.experiment.id}): ' \
+               f'{self.n_done}/{self.n_simulations} simulations done{failed}'
+
+
+class CompletionWatcher:
+    """
+    Waits on many experiments at once. Experiment statuses are refreshed concurrently, each on its own adaptive
+    interval: an experiment is polled again after min_interval_s when its simulations progressed since the previous
+    poll, and after a growing interval (up to max_interval_s) while they do not. This keeps polling responsive for
+    experiments that are finishing without hammering the platform for ones that are queued or long-running.
+    """
+
+    def __init__(self, platform: IPlatform, min_interval_s: float = 5, max_interval_s: float = 120,
+                 growth: float = 2.0, max_workers: int = 8, timeout_s: float = 60 * 60 * 24,
+                 on_progress: Callable[[ExperimentProgress], None] = print,
+                 sleep: Callable[[float], None] = time.sleep, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            platform: the platform the experiments run on
+            min_interval_s: the polling interval of an experiment whose simulations are progressing
+            max_interval_s: the longest polling interval of an experiment whose simulations are not progressing
+            growth: the factor the polling interval of an experiment grows by each poll it does not progress
+            max_workers: the maximum number of concurrent status refreshes
+            timeout_s: the time to wait for all experiments before raising a TimeoutError
+            on_progress: called with each progress update (e.g. to display it), or None
+            sleep: the function to wait with
+            clock: the (monotonic) clock to schedule polls with
+        """
+        self.platform = platform
+        self.min_interval_s = min_interval_s
+        self.max_interval_s = max_interval_s
+        self.growth = growth
+        self.max_workers = max_workers
+        self.timeout_s = timeout_s
+        self.on_progress = on_progress
+        self.sleep = sleep
+        self.clock = clock
+
+    def _poll(self, experiment: Experiment) -> ExperimentProgress:
+        self.platform.refresh_status(experiment)
+        statuses = [simulation.status for simulation in experiment.simulations]
+        return ExperimentProgress(experiment=experiment, n_simulations=len(statuses),
+                                  n_succeeded=statuses.count(EntityStatus.SUCCEEDED),
+                                  n_failed=statuses.count(EntityStatus.FAILED),
+                                  n_done=sum(status in DONE_STATUSES for status in statuses))
+
+    def progress(self, experiments: List[Union[Experiment, str]]) -> Iterator[ExperimentProgress]:
+        """
+        A stream of progress updates of the given experiments, until all of them are done. An update is yielded
+        whenever the number of done simulations of an experiment changes (and after its first poll). Each
+        experiment's last update is the one with done == True.
+
+        Args:
+            experiments: experiments or experiment ids to watch
+
+        Returns: an iterator of ExperimentProgress
+        """
+        experiments = [self.platform.get_item(experiment, item_type=ItemType.EXPERIMENT)
+                       if isinstance(experiment, str) else experiment for experiment in experiments]
+        start = self.clock()
+        intervals = {id(experiment): self.min_interval_s for experiment in experiments}
+        next_polls = {id(experiment): start for experiment in experiments}
+        last = {}  # id(experiment): the last yielded progress
+        pending = list(experiments)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while len(pending) > 0:
+                now = self.clock()
+                if now - start > self.timeout_s:
+                    raise TimeoutError(f'Timeout of {self.timeout_s} seconds exceeded waiting on '
+                                       f'{len(pending)} experiments')
+                due = [experiment for experiment in pending if next_polls[id(experiment)] <= now]
+                for experiment, progress in zip(due, executor.map(self._poll, due)):
+                    key = id(experiment)
+                    previous = last.get(key)
+                    if previous is not None and progress.n_done == previous.n_done:
+                        intervals[key] = min(intervals[key] * self.growth, self.max_interval_s)
+                    else:
+                        intervals[key] = self.min_interval_s
+                        last[key] = progress
+                        if self.on_progress is not None:
+                            self.on_progress(progress)
+                        yield progress
+                    if progress.done:
+                        pending.remove(experiment)
+                    next_polls[key] = now + intervals[key]
+                if len(pending) > 0:
+                    self.sleep(max(0.0, min(next_polls[id(experiment)] for experiment in pending) - self.clock()))
+
+    def completed(self, experiments: List[Union[Experiment, str]]) -> Iterator[Experiment]:
+        """
+        Yields the given experiments in the order they are done (all their simulations succeeded or failed).
+
+        Args:
+            experiments: experiments or experiment ids to wait on
+
+        Returns: an iterator of Experiment
+        """
+        for progress in self.progress(experiments=experiments):
+            if progress.done:
+                yield progress.experiment
+
+    def wait(self, experiments: List[Union[Experiment, str]]) -> Dict[str, ExperimentProgress]:
+        """
+        Waits until all given experiments are done.
+
+        Args:
+            experiments: experiments or experiment ids to wait on
+
+        Returns: a dict of experiment id: final ExperimentProgress
+        """
+        return {str(progress.experiment.id): progress for progress in self.progress(experiments=experiments)
+                if progress.done}
@@ -0,0 +1,317 @@
+import csv
+import hashlib
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from idmtools.core import EntityStatus, ItemType
+from idmtools.entities.iplatform import IPlatform
+from idmtools.entities.simulation import Simulation
+
+from emodpy_workflow.lib.analysis.download_analyzer_by_experiment import DownloadAnalyzerByExperiment
+from emodpy_workflow.lib.utils.completion_watcher import CompletionWatcher
+
+
+# written by the standard in-processor (dtk_in_process.py) of simulations it ends early, which then skip
+# post-processing (and so have no post-processor output, e.g. report extracts)
+EARLY_TERMINATION_PATH = 'output/early_termination.json'
+
+
+class _EarlyTerminatedException(Exception):
+    pass
+
+
+class DownloadFailedException(Exception):
+    pass
+
+
+class DownloadManifest:
+    """
+    A record of completely downloaded files, by destination path, with their size and sha256 checksum. Entries are
+    appended (and flushed) as each file is written, so an interrupted download can be resumed without re-fetching
+    the files it already completed.
+    """
+
+    FILENAME = 'download_manifest.csv'
+    COLUMNS = ['path', 'size', 'sha256', 'simulation_id', 'source']
+
+    def __init__(self, path: str):
+        self.path = path
+        self.completed = {}  # destination path: (size, sha256)
+        if os.path.exists(path):
+            with open(path, newline='') as f:
+                for row in csv.DictReader(f):
+                    self.completed[row['path']] = (int(row['size']), row['sha256'])  # later entries win
+        self._lock = Lock()
+
+    @staticmethod
+    def checksum(content: bytes) -> str:
+        return hashlib.sha256(content).hexdigest()
+
+    def is_complete(self, path: str, verify_checksum: bool = False) -> bool:
+        """
+        Determines whether a destination file was completely downloaded and is still intact on disk.
+
+        Args:
+            path: the destination file path
+            verify_checksum: if True, the file checksum is verified as well as its size (slower)
+
+        Returns: True if the file does not need to be downloaded again
+        """
+        if path not in self.completed or not os.path.isfile(path):
+            return False
+        size, sha256 = self.completed[path]
+        if os.path.getsize(path) != size:
+            return False
+        if verify_checksum:
+            with open(path, 'rb') as f:
+                return self.checksum(f.read()) == sha256
+        return True
+
+    def record(self, path: str, simulation_id: str, source: str) -> None:
+        # the written file is recorded, as a target may store it in a different form than it was downloaded in
+        with open(path, 'rb') as f:
+            content = f.read()
+        entry = {'path': path, 'size': len(content), 'sha256': self.checksum(content),
+                 'simulation_id': simulation_id, 'source': source}
+        with self._lock:
+            write_header = not os.path.exists(self.path)
+            with open(self.path, 'a', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=self.COLUMNS)
+                if write_header:
+                    writer.writeheader()
+                writer.writerow(entry)
+            self.completed[path] = (entry['size'], entry['sha256'])
+
+
+def write_file(path: str, content: bytes) -> None:
+    # written to a temporary file and moved into place, so an interrupted download never leaves a partial file
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class DownloadCache:
+    """
+    A persistent local cache of downloaded simulation files, keyed by simulation id and simulation file path. It is
+    shared by downloads to any output directory, so simulation files downloaded once (e.g. for plotting one channel)
+    are not fetched from the platform again (e.g. for plotting another channel of the same simulations).
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def path(self, simulation_id: str, source_filename: str) -> str:
+        parts = [part for part in source_filename.replace('\\', '/').split('/') if part not in ['', '.']]
+        return os.path.join(self.directory, str(simulation_id), *parts)
+
+    def get(self, simulation_id: str, source_filename: str) -> Optional[bytes]:
+        path = self.path(simulation_id=simulation_id, source_filename=source_filename)
+        if not os.path.isfile(path):
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def put(self, simulation_id: str, source_filename: str, content: bytes) -> None:
+        path = self.path(simulation_id=simulation_id, source_filename=source_filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_file(path=path, content=content)
+
+
+class FileTarget:
+    """
+    Writes each downloaded simulation file as a loose file, named by the analyzer (see
+    DownloadAnalyzerByExperiment.destination_paths()).
+    """
+
+    def __init__(self, analyzer: DownloadAnalyzerByExperiment):
+        self.analyzer = analyzer
+
+    def destinations(self, item: Simulation, source_filename: str) -> List[Tuple[str, str, Dict]]:
+        # the destination paths of a simulation file, with the (experiment) directory and simulation tags it is for
+        return [(path, directory, tags) for path, (directory, tags) in zip(
+            self.analyzer.destination_paths(item=item, source_filename=source_filename),
+            self.analyzer.destinations(item=item))]
+
+    def write(self, path: str, content: bytes, item: Simulation, tags: Dict, source_filename: str) -> None:
+        write_file(path=path, content=content)
+
+    def is_complete(self, path: str) -> bool:
+        # written files stay where they were written, so the download manifest alone tracks them
+        return False
+
+    def finalize(self) -> None:
+        # nothing to do once downloading is done
+        pass
+
+    def final_path(self, path: str) -> str:
+        return path
+
+
+class DownloadEngine:
+    """
+    Downloads the simulation files an analyzer (DownloadAnalyzerByExperiment or a subclass) selects to a target (by
+    default, loose files named by the analyzer), using a bounded pool of worker threads. Each file fetch is retried
+    with exponential backoff, files already recorded as complete in the download manifest (and intact) are skipped,
+    and all experiments are waited on at once, the files of each starting to download as soon as it is done.
+    """
+
+    def __init__(self, platform: IPlatform, analyzer: DownloadAnalyzerByExperiment, max_workers: int = 16,
+                 max_attempts: int = 5, backoff_s: float = 1.0, verify_checksum: bool = False, target=None,
+                 watcher: CompletionWatcher = None, cache: DownloadCache = None, skip_early_terminated: bool = False):
+        """
+        Args:
+            platform: the platform to download from
+            analyzer: determines which simulations and files to download (filter(), filenames) and where to
+                (destinations())
+            max_workers: the maximum number of concurrent file fetches
+            max_attempts: the number of times to try fetching each file
+            backoff_s: the wait before the first retry, doubled for each further retry
+            verify_checksum: if True, previously downloaded files are only skipped if their checksum is intact
+            target: where to write downloaded files to, e.g. a ParquetDatasetTarget. Default: a FileTarget.
+            watcher: waits on the experiments to download from. Default: a CompletionWatcher with default polling.
+            cache: a cache to take simulation files from instead of fetching them, and to add fetched files to.
+                Default: no cache.
+            skip_early_terminated: if True, files that cannot be fetched from simulations ended early by the standard
+                in-processor (see EARLY_TERMINATION_PATH) are skipped, without retrying, instead of failing the
+                download, e.g. for post-processor output.
+        """
+        self.platform = platform
+        self.analyzer = analyzer
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.backoff_s = backoff_s
+        self.verify_checksum = verify_checksum
+        self.target = FileTarget(analyzer=analyzer) if target is None else target
+        self.watcher = CompletionWatcher(platform=platform) if watcher is None else watcher
+        self.cache = cache
+        self.skip_early_terminated = skip_early_terminated
+        self.manifest = DownloadManifest(path=os.path.join(analyzer.output_path, DownloadManifest.FILENAME))
+        self.n_downloaded = 0
+        self.n_skipped = 0
+        self.n_early_terminated = 0  # files skipped as their simulation was ended early
+        self._early_terminated_ids = {}  # simulation id: whether it was ended early, checked once per simulation
+        self.files = []  # a record (see ResultsCatalog.add_files) of each file downloaded (or present)
+        self._count_lock = Lock()
+
+    def _fetch(self, item: Simulation, source_filename: str) -> bytes:
+        if self.cache is not None:
+            content = self.cache.get(simulation_id=item.id, source_filename=source_filename)
+            if content is not None:
+                return content
+        for attempt in range(self.max_attempts):
+            try:
+                content = self.platform.get_files(item, [source_filename])[source_filename]
+                break
+            except Exception:
+                # files missing as the simulation was ended early are not retried
+                if self.skip_early_terminated and self._early_terminated(item=item):
+                    raise _EarlyTerminatedException(item.id)
+                if attempt == self.max_attempts - 1:
+                    raise
+                time.sleep(self.backoff_s * 2 ** attempt)
+        if self.cache is not None:
+            self.cache.put(simulation_id=item.id, source_filename=source_filename, content=content)
+        return content
+
+    def _early_terminated(self, item: Simulation) -> bool:
+        if item.id not in self._early_terminated_ids:
+            try:
+                self.platform.get_files(item, [EARLY_TERMINATION_PATH])
+                self._early_terminated_ids[item.id] = True
+            except Exception:
+                self._early_terminated_ids[item.id] = False
+        return self._early_terminated_ids[item.id]
+
+    def _file_record(self, path: str, directory: str, item: Simulation, tags: Dict, source_filename: str) -> Dict:
+        size, sha256 = self.manifest.completed[path]
+        sample_index, run_number = tags.get(self.analyzer.sample_tag), tags.get(self.analyzer.run_number)
+        return {'path': path, 'directory': directory, 'sim_id': str(item.id),
+                'sample_index': None if sample_index is None else int(sample_index),
+                'run_number': None if run_number is None else int(run_number),
+                'source': source_filename, 'channel': os.path.splitext(os.path.basename(source_filename))[0],
+                'size': size, 'sha256': sha256}
+
+    def _download(self, item: Simulation, source_filename: str,
+                  destinations: List[Tuple[str, str, Dict]]) -> List[str]:
+        pending = [(path, tags) for path, _, tags in destinations
+                   if not (self.target.is_complete(path=path)
+                           or self.manifest.is_complete(path=path, verify_checksum=self.verify_checksum))]
+        if len(pending) > 0:
+            try:
+                content = self._fetch(item=item, source_filename=source_filename)
+            except _EarlyTerminatedException:
+                with self._count_lock:
+                    self.n_early_terminated += 1
+                return []
+            for path, tags in pending:
+                self.target.write(path=path, content=content, item=item, tags=tags, source_filename=source_filename)
+                self.manifest.record(path=path, simulation_id=str(item.id), source=source_filename)
+        files = [self._file_record(path=path, directory=directory, item=item, tags=tags,
+                                   source_filename=source_filename) for path, directory, tags in destinations]
+        with self._count_lock:
+            self.n_downloaded += len(pending)
+            self.n_skipped += len(destinations) - len(pending)
+            self.files.extend(files)
+        return [path for path, _, _ in destinations]
+
+    def _simulations(self, experiment_ids: List[str], simulation_ids: List[str]):
+        # experiments are yielded from as each completes; only succeeded simulations have files to download
+        for experiment in self.watcher.completed(experiments=[str(experiment_id) for experiment_id in experiment_ids]):
+            yield from self.platform.get_children(experiment.id, item_type=ItemType.EXPERIMENT, force=True)
+        for simulation_id in simulation_ids:
+            yield self.platform.get_item(simulation_id, item_type=ItemType.SIMULATION, force=True)
+
+    def download(self, experiment_ids: List[str], simulation_ids: List[str] = None) -> List[str]:
+        """
+        Downloads the files of all (selected) succeeded simulations of the given experiments and of the given
+        individual simulations.
+
+        Args:
+            experiment_ids: ids of experiments to download simulation files of (waited on until done)
+            simulation_ids: ids of individual (completed) simulations to download files of
+
+        Returns: a list of all destination file paths (where the target finally put them, once), including those
+            skipped as already downloaded
+        """
+        simulation_ids = [] if simulation_ids is None else simulation_ids
+        futures = []  # tuples of (simulation id, source filename, future)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for item in self._simulations(experiment_ids=experiment_ids, simulation_ids=simulation_ids):
+                if item.status != EntityStatus.SUCCEEDED or not self.analyzer.filter(item):
+                    continue
+                for source_filename in self.analyzer.filenames:
+                    destinations = self.target.destinations(item=item, source_filename=source_filename)
+                    futures.append((item.id, source_filename,
+                                    executor.submit(self._download, item, source_filename, destinations)))
+
+        file_paths, failures = [], []
+        for simulation_id, source_filename, future in futures:
+            try:
+                file_paths.extend(future.result())
+            except Exception as e:
+                failures.append((simulation_id, source_filename, e))
+        # e.g. compaction; files written before any failure are finalized too, so a re-run only adds the rest
+        self.target.finalize()
+        file_paths = list(dict.fromkeys(self.target.final_path(path=path) for path in file_paths))
+        for record in self.files:
+            record['path'] = self.target.final_path(path=record['path'])
+        print(f'Downloaded {self.n_downloaded} files, skipped {self.n_skipped} previously downloaded files.')
+        if self.n_early_terminated > 0:
+            print(f'Skipped {self.n_early_terminated} files of simulations that were ended early.')
+        if len(failures) > 0:
+            details = '\n'.join(f'- {source_filename} of simulation {simulation_id}: {e}'
+                                for simulation_id, source_filename, e in failures[:10])
+            raise DownloadFailedException(f'Could not download {len(failures)} files after {self.max_attempts} '
+                                          f'attempts each (first {min(len(failures), 10)} listed). Re-running the '
+                                          f'download resumes from the completed files.\n{details}')
+        return file_paths
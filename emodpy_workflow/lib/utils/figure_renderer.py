@@ -0,0 +1,100 @@
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+FIGURE_FORMATS = ['png', 'svg']
+
+
+def new_figure(nrows: int, ncols: int, figsize: Tuple[float, float], **kwargs):
+    """
+    Creates a figure that is drawn without a display (Agg) and is not tracked by pyplot, so its memory is released as
+    soon as it is no longer referenced.
+
+    Args:
+        nrows: the number of subplot rows
+        ncols: the number of subplot columns
+        figsize: the figure (width, height) in inches
+        **kwargs: further arguments of Figure.subplots(), e.g. sharex
+
+    Returns: a tuple of (figure, axes), as pyplot.subplots()
+    """
+    figure = Figure(figsize=figsize)
+    FigureCanvasAgg(figure)
+    return figure, figure.subplots(nrows, ncols, **kwargs)
+
+
+def _render(figure_data: bytes, paths: List[str], savefig_kwargs: dict) -> List[str]:
+    figure = pickle.loads(figure_data)
+    FigureCanvasAgg(figure)
+    for path in paths:
+        figure.savefig(path, **savefig_kwargs)
+    figure.clear()
+    return paths
+
+
+class FigureRenderer:
+    """
+    Writes figures to image files without a display, in a pool of worker processes. Each submitted figure is pickled
+    and cleared right away, so figures do not accumulate in the submitting process while they are rendered.
+    """
+
+    def __init__(self, formats: List[str] = None, max_workers: int = None, **savefig_kwargs):
+        """
+        Args:
+            formats: the image formats to write each figure in (FIGURE_FORMATS). Default: ['png']
+            max_workers: the number of rendering processes. Default: the number of CPUs.
+            **savefig_kwargs: further arguments of Figure.savefig(), e.g. bbox_inches='tight'
+        """
+        formats = ['png'] if formats is None else formats
+        unknown = [image_format for image_format in formats if image_format not in FIGURE_FORMATS]
+        if len(unknown) > 0:
+            raise ValueError(f'Unsupported figure formats: {", ".join(unknown)} . '
+                             f'Supported formats: {", ".join(FIGURE_FORMATS)}')
+        self.formats = formats
+        self.savefig_kwargs = savefig_kwargs
+        self.paths = []  # the written image file paths, once close()d
+        self._executor = ProcessPoolExecutor(max_workers=max_workers)
+        self._futures = []
+
+    def submit(self, figure: Figure, path: str) -> None:
+        """
+        Writes a figure in each of the formats, in the background. The figure is cleared.
+
+        Args:
+            figure: the figure to write
+            path: the image file path to write, without extension (added per format)
+
+        Returns: None
+        """
+        figure_data = pickle.dumps(figure)
+        figure.clear()
+        paths = [f'{path}.{image_format}' for image_format in self.formats]
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._futures.append(self._executor.submit(_render, figure_data, paths, self.savefig_kwargs))
+
+    def close(self) -> List[str]:
+        """
+        Waits for all submitted figures to be written.
+
+        Returns: the written image file paths
+        """
+        try:
+            for future in self._futures:
+                self.paths.extend(future.result())
+        finally:
+            self._executor.shutdown()
+            self._futures = []
+        return self.paths
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._executor.shutdown(cancel_futures=True)
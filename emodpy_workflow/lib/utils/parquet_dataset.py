@@ -0,0 +1,252 @@
+import importlib.util
+import io
+import os
+import tempfile
+from threading import Lock
+from typing import Dict, List, Tuple
+
+import pandas as pd
+from idmtools.entities.simulation import Simulation
+
+from emodpy_workflow.lib.analysis.download_analyzer_by_experiment import DownloadAnalyzerByExperiment
+
+# A partitioned (hive-style) Parquet dataset of downloaded simulation CSV files:
+#   DATASET_DIRECTORY/experiment=EXPERIMENT/channel=CHANNEL/COMPACTED_FILENAME
+# where EXPERIMENT is the name of the directory loose files would be downloaded to and CHANNEL is the name of the
+# downloaded file (without extension). Every row is labeled with the simulation it came from. Files are downloaded
+# into one part file per simulation in STAGING_DIRECTORY (so downloads can be resumed and run concurrently), which
+# are compacted into a single file per experiment and channel once downloading is done. Directories and files
+# starting with '_' are not part of the dataset when it is read.
+
+DATASET_DIRECTORY = 'dataset'
+STAGING_DIRECTORY = '_staging'
+SCHEMA_DIRECTORY = '_schemas'  # the pinned schema of each channel, as an empty CHANNEL.parquet file
+COMPACTED_RECORD_FILENAME = '_compacted.csv'  # the staged part files already compacted, relative to the dataset
+COMPACTED_FILENAME = 'part-00000.parquet'
+ROW_GROUP_SIZE = 1000000  # rows per row group of compacted files
+
+SAMPLE_INDEX_COLUMN = 'sample_index'
+RUN_NUMBER_COLUMN = 'run_number'
+SIMULATION_ID_COLUMN = 'sim_id'
+# present only in the placeholder post-process output of simulations ended early by dtk_in_process.py
+EARLY_TERMINATION_COLUMN = 'EarlyTermination'
+
+
+def _require_pyarrow():
+    if importlib.util.find_spec('pyarrow') is None:
+        raise ImportError('Parquet datasets require pyarrow. Install it with: pip install emodpy-workflow[parquet]')
+
+
+class ParquetDatasetTarget:
+    """
+    A DownloadEngine target that writes each downloaded simulation CSV file into a Parquet dataset partitioned by
+    experiment and channel. Each simulation file is staged as its own part file and compacted into one file per
+    experiment and channel by finalize().
+
+    All files of a channel are written with the same, pinned schema: the columns of the first file downloaded for the
+    channel, numeric ones as float64 (so integer and fractional values mix) and others as strings, followed by the
+    simulation label columns. Files with other columns are rejected. Placeholder output of simulations ended early
+    (with an EarlyTermination column) holds no simulated data and contributes no rows.
+    """
+
+    LABEL_FIELDS = [(SAMPLE_INDEX_COLUMN, 'int64'), (RUN_NUMBER_COLUMN, 'int64'), (SIMULATION_ID_COLUMN, 'string')]
+
+    def __init__(self, analyzer: DownloadAnalyzerByExperiment, dataset_path: str = None, schemas: Dict = None):
+        """
+        Args:
+            analyzer: determines the experiment (directory) and tags of each downloaded simulation
+            dataset_path: the dataset directory. Default: DATASET_DIRECTORY within the analyzer output path.
+            schemas: a dict of channel: pyarrow.Schema to write the channel with, including the label columns.
+                Default: pinned from the first file downloaded for each channel (and kept for later downloads).
+        """
+        not_csv = [filename for filename in analyzer.filenames if os.path.splitext(filename)[1].lower() != '.csv']
+        if len(not_csv) > 0:
+            raise ValueError(f'Only CSV files can be downloaded into a Parquet dataset, not: {", ".join(not_csv)}')
+        _require_pyarrow()
+        self.analyzer = analyzer
+        self.dataset_path = os.path.join(analyzer.output_path, DATASET_DIRECTORY) if dataset_path is None \
+            else dataset_path
+        self.schemas = {} if schemas is None else dict(schemas)
+        self._lock = Lock()
+        self.compacted = set()  # staged part file paths, relative to the dataset, already compacted
+        record_path = os.path.join(self.dataset_path, COMPACTED_RECORD_FILENAME)
+        if os.path.exists(record_path):
+            self.compacted = set(pd.read_csv(record_path)['path'])
+
+    @staticmethod
+    def channel(source_filename: str) -> str:
+        return os.path.splitext(os.path.basename(source_filename))[0]
+
+    def destinations(self, item: Simulation, source_filename: str) -> List[Tuple[str, str, Dict]]:
+        destinations = []
+        for directory, tags in self.analyzer.destinations(item=item):
+            partition = os.path.join(self.dataset_path, STAGING_DIRECTORY, f'experiment={os.path.basename(directory)}',
+                                     f'channel={self.channel(source_filename=source_filename)}')
+            os.makedirs(partition, exist_ok=True)
+            filename = os.path.splitext(os.path.basename(self.analyzer._construct_filename(
+                simulation_tags=tags, filename=f'{item.id}.csv')))[0] + '.parquet'
+            destinations.append((os.path.join(partition, filename), directory, tags))
+        return destinations
+
+    def is_complete(self, path: str) -> bool:
+        # a staged part file that was compacted (and removed) does not need to be downloaded again
+        return os.path.relpath(path, self.dataset_path) in self.compacted
+
+    def schema(self, channel: str, df: pd.DataFrame = None):
+        """
+        Returns: the schema of a channel: given, pinned by an earlier download, or pinned from the given dataframe
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        with self._lock:
+            if channel not in self.schemas:
+                path = os.path.join(self.dataset_path, SCHEMA_DIRECTORY, f'{channel}.parquet')
+                if os.path.exists(path):
+                    self.schemas[channel] = pq.read_schema(path)
+                elif df is not None:
+                    labels = [name for name, _ in self.LABEL_FIELDS]
+                    fields = [pa.field(column, pa.float64() if pd.api.types.is_numeric_dtype(df[column])
+                                       and not pd.api.types.is_bool_dtype(df[column]) else pa.string())
+                              for column in df.columns if column not in labels]
+                    schema = pa.schema(fields + [pa.field(name, type_name) for name, type_name in self.LABEL_FIELDS])
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    pq.write_table(schema.empty_table(), path)
+                    self.schemas[channel] = schema
+            return self.schemas.get(channel)
+
+    def _table(self, df: pd.DataFrame, channel: str):
+        import pyarrow as pa
+        schema = self.schema(channel=channel, df=df)
+        unknown = [column for column in df.columns if column not in schema.names]
+        if len(unknown) > 0:
+            raise ValueError(f'Columns {", ".join(unknown)} are not in the schema of channel {channel}: '
+                             f'{", ".join(schema.names)}')
+        df = df.reindex(columns=schema.names)
+        arrays = []
+        for field in schema:
+            column = df[field.name]
+            if pa.types.is_string(field.type):
+                arrays.append(pa.array([str(value) if pd.notna(value) else None for value in column], type=field.type))
+            else:
+                arrays.append(pa.array(column, type=field.type, from_pandas=True))
+        return pa.Table.from_arrays(arrays, schema=schema)
+
+    def write(self, path: str, content: bytes, item: Simulation, tags: Dict, source_filename: str) -> None:
+        import pyarrow.parquet as pq
+        df = pd.read_csv(io.BytesIO(content))
+        if EARLY_TERMINATION_COLUMN in df.columns:
+            # placeholder output; the simulation was ended early and has no simulated data
+            df = df.drop(columns=EARLY_TERMINATION_COLUMN).iloc[0:0]
+        df[SAMPLE_INDEX_COLUMN] = int(tags[self.analyzer.sample_tag])
+        df[RUN_NUMBER_COLUMN] = int(tags[self.analyzer.run_number])
+        df[SIMULATION_ID_COLUMN] = str(item.id)
+        table = self._table(df=df, channel=self.channel(source_filename=source_filename))
+        # written to a temporary file and moved into place, so readers never see a partial part file
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        os.close(fd)
+        try:
+            pq.write_table(table, temp_path)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def _compact_partition(self, staged_partition: str, partition: str, channel: str) -> List[str]:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+        staged = sorted(os.path.join(staged_partition, filename) for filename in os.listdir(staged_partition)
+                        if filename.endswith('.parquet'))
+        if len(staged) == 0:
+            return []
+        os.makedirs(partition, exist_ok=True)
+        path = os.path.join(partition, COMPACTED_FILENAME)
+        sources = ([path] if os.path.exists(path) else []) + staged
+        schema = self.schema(channel=channel) or pq.read_schema(staged[0])
+        # rows of staged simulations already in the compacted file (from an interrupted compaction) are replaced
+        staged_ids = pa.concat_arrays([pq.read_table(source, columns=[SIMULATION_ID_COLUMN])[SIMULATION_ID_COLUMN]
+                                       .combine_chunks() for source in staged])
+        fd, temp_path = tempfile.mkstemp(dir=partition, suffix='.tmp')
+        os.close(fd)
+        try:
+            # sources are streamed one at a time, buffering up to a row group's worth of rows
+            with pq.ParquetWriter(temp_path, schema=schema) as writer:
+                buffered, n_buffered = [], 0
+                for source in sources:
+                    table = pq.read_table(source, schema=schema)
+                    if source == path:
+                        table = table.filter(pc.invert(pc.is_in(table[SIMULATION_ID_COLUMN], value_set=staged_ids)))
+                    buffered.append(table)
+                    n_buffered += table.num_rows
+                    if n_buffered >= ROW_GROUP_SIZE:
+                        writer.write_table(pa.concat_tables(buffered), row_group_size=ROW_GROUP_SIZE)
+                        buffered, n_buffered = [], 0
+                if len(buffered) > 0:
+                    writer.write_table(pa.concat_tables(buffered), row_group_size=ROW_GROUP_SIZE)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return staged
+
+    def final_path(self, path: str) -> str:
+        """
+        Returns: the compacted file a staged part file was compacted into, or the part file if not yet compacted
+        """
+        relative_path = os.path.relpath(path, self.dataset_path)
+        if relative_path not in self.compacted:
+            return path
+        _, experiment, channel, _ = relative_path.split(os.sep)
+        return os.path.join(self.dataset_path, experiment, channel, COMPACTED_FILENAME)
+
+    def finalize(self) -> None:
+        """
+        Compacts the staged part files of each experiment and channel (with those compacted by earlier downloads) into
+        a single file with large row groups, and removes them.
+
+        Returns: None
+        """
+        staging = os.path.join(self.dataset_path, STAGING_DIRECTORY)
+        if not os.path.isdir(staging):
+            return
+        record_path = os.path.join(self.dataset_path, COMPACTED_RECORD_FILENAME)
+        for experiment in sorted(os.listdir(staging)):
+            for channel in sorted(os.listdir(os.path.join(staging, experiment))):
+                staged = self._compact_partition(staged_partition=os.path.join(staging, experiment, channel),
+                                                 partition=os.path.join(self.dataset_path, experiment, channel),
+                                                 channel=channel.split('=', 1)[1])
+                if len(staged) == 0:
+                    continue
+                relative_paths = [os.path.relpath(path, self.dataset_path) for path in staged]
+                pd.DataFrame({'path': relative_paths}).to_csv(record_path, mode='a', index=False,
+                                                              header=not os.path.exists(record_path))
+                self.compacted.update(relative_paths)
+                for path in staged:
+                    os.remove(path)
+
+
+def read_dataset(dataset_path: str, channel: str, experiments: List[str] = None, filters: List[Tuple] = None,
+                 columns: List[str] = None) -> pd.DataFrame:
+    """
+    Reads (a subset of) one channel of a Parquet dataset of downloaded simulation files. Only the matching partitions
+    are opened and filters are pushed down into the Parquet reader.
+
+    Args:
+        dataset_path: the dataset directory
+        channel: the channel (downloaded file name without extension) to read, e.g. 'ReportHIVByAgeAndGender'
+        experiments: names of the experiments to read. Default: all.
+        filters: additional row filters in pyarrow form, e.g. [('Year', '>=', 2000), ('sample_index', 'in', [0, 3])]
+        columns: the columns to read. Default: all.
+
+    Returns: a dataframe with an 'experiment' column plus the requested columns (by default, all columns of the
+        downloaded files and the simulation label columns)
+    """
+    _require_pyarrow()
+    partition_filters = [('channel', '==', channel)]
+    if experiments is not None:
+        partition_filters.append(('experiment', 'in', list(experiments)))
+    columns = None if columns is None else ['experiment'] + [column for column in columns if column != 'experiment']
+    df = pd.read_parquet(dataset_path, filters=partition_filters + list(filters or []), columns=columns)
+    return df.drop(columns='channel', errors='ignore')
@@ -0,0 +1,243 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from idmtools.core import EntityStatus, ItemType
+from idmtools.entities.iplatform import IPlatform
+from idmtools.entities.simulation import Simulation
+
+# written by the standard post-processor (dtk_post_process.py) of every simulation that uses it
+RESOURCE_USAGE_FILENAME = 'output/resource_usage.json'
+
+
+@dataclass
+class ResourceRequest:
+    memory_mb: int
+    walltime_s: int
+
+    @property
+    def slurm_time(self) -> str:
+        minutes, seconds = divmod(self.walltime_s, 60)
+        hours, minutes = divmod(minutes, 60)
+        days, hours = divmod(hours, 24)
+        return '%d-%02d:%02d:%02d' % (days, hours, minutes, seconds)
+
+    def maximum(self, other: 'ResourceRequest') -> 'ResourceRequest':
+        return ResourceRequest(memory_mb=max(self.memory_mb, other.memory_mb),
+                               walltime_s=max(self.walltime_s, other.walltime_s))
+
+
+def _asset_bytes(asset) -> bytes:
+    if asset.absolute_path:
+        with open(asset.absolute_path, 'rb') as f:
+            return f.read()
+    return asset.bytes
+
+
+def _asset_key(asset) -> str:
+    # identifies asset contents without parsing them. Not by file path: emodpy writes the demographics of each
+    # simulation to its own randomly named temporary file.
+    return hashlib.md5(_asset_bytes(asset)).hexdigest()
+
+
+def simulation_size(simulation: Simulation, populations: Dict = None) -> Tuple[Optional[float], float]:
+    """
+    Determines the size of a built simulation for resource prediction.
+
+    Args:
+        simulation: a simulation with its inputs built
+        populations: a cache of demographics content hash: initial population, filled as demographics are parsed,
+            so simulations with identical demographics parse them once. Default: no caching.
+
+    Returns: a tuple of (initial population, or None if it cannot be determined; simulation duration in days)
+    """
+    parameters = simulation.task.config.parameters
+    duration = float(parameters.Simulation_Duration)
+    demographics_filenames = list(getattr(parameters, 'Demographics_Filenames', []) or [])
+    if len(demographics_filenames) == 0:
+        return None, duration
+
+    # the first demographics file is the base layer defining the nodes and their populations
+    assets = [asset for assets in [simulation.task.transient_assets, simulation.task.common_assets]
+              for asset in assets if asset.filename == os.path.basename(demographics_filenames[0])]
+    if len(assets) == 0:
+        return None, duration
+    key = _asset_key(assets[0])
+    if populations is None or key not in populations:
+        demographics = json.loads(_asset_bytes(assets[0]))
+        initial_population = sum(node.get('NodeAttributes', {}).get('InitialPopulation', 0)
+                                 for node in demographics.get('Nodes', []))
+        if populations is None:
+            populations = {}
+        populations[key] = initial_population
+    initial_population = populations[key]
+    return initial_population * float(getattr(parameters, 'x_Base_Population', 1.0)), duration
+
+
+class ResourceProfile:
+    """
+    A local record of the peak memory and walltime of finished simulations, by frame, used to predict the resources
+    of new simulations of the same frame. Peak memory is modeled as linear in the initial population and walltime as
+    linear in population x duration, with a margin above the largest under-prediction seen in the record.
+
+    Simulations are recorded as they are commissioned and measured once they have succeeded (see update()).
+    """
+
+    COLUMNS = ['frame', 'experiment_id', 'simulation_id', 'population', 'duration', 'peak_rss_mb', 'walltime_s']
+    MIN_MEASUREMENTS = 5
+    HEADROOM = 1.1  # multiplies predictions (after adding the largest under-prediction seen)
+    MIN_WALLTIME_S = 600
+
+    def __init__(self, path: str, max_workers: int = 8):
+        """
+        Args:
+            path: the profile csv file, read if it exists
+            max_workers: the maximum number of concurrent resource usage downloads in update()
+        """
+        self.path = path
+        self.max_workers = max_workers
+        self._populations = {}  # demographics content hash: initial population, see simulation_size()
+        if os.path.exists(path):
+            self.profile = pd.read_csv(path, dtype={'frame': str, 'experiment_id': str, 'simulation_id': str})
+        else:
+            self.profile = pd.DataFrame(columns=self.COLUMNS)
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.profile.to_csv(self.path, index=False)
+
+    def add(self, frame: str, experiment_id: str, simulations: List[Simulation]) -> None:
+        rows = []
+        for simulation in simulations:
+            population, duration = simulation_size(simulation=simulation, populations=self._populations)
+            rows.append([frame, str(experiment_id), str(simulation.id), population, duration, np.nan, np.nan])
+        added = pd.DataFrame(rows, columns=self.COLUMNS)
+        self.profile = pd.concat([df for df in [self.profile, added] if not df.empty], ignore_index=True)
+
+    @staticmethod
+    def _usage(platform: IPlatform, simulation: Simulation) -> Optional[Dict]:
+        try:
+            return json.loads(platform.get_files(simulation, [RESOURCE_USAGE_FILENAME])[RESOURCE_USAGE_FILENAME])
+        except Exception:
+            return None  # not post-processed with the standard post-processor
+
+    def update(self, platform: IPlatform) -> int:
+        """
+        Measures recorded simulations of done experiments, downloading their resource usage concurrently. Simulations
+        that did not succeed, or that do not report their resource usage, are removed from the record. Simulations of
+        experiments that cannot be retrieved (e.g. platform outage) are kept, to be measured by a later update.
+
+        Args:
+            platform: the platform the recorded experiments are on
+
+        Returns: the number of simulations measured
+        """
+        unmeasured = self.profile[self.profile['peak_rss_mb'].isna()]
+        dropped, to_measure = [], []  # to_measure: (row index, simulation) pairs
+        for experiment_id, rows in unmeasured.groupby('experiment_id'):
+            try:
+                simulations = {str(simulation.id): simulation for simulation in
+                               platform.get_children(experiment_id, item_type=ItemType.EXPERIMENT, force=True)}
+            except Exception:
+                continue  # the experiment cannot be retrieved now, try again next update
+            if any(simulation.status in [EntityStatus.CREATED, EntityStatus.RUNNING]
+                   for simulation in simulations.values()):
+                continue  # measure once the whole experiment is done
+            for row_index, simulation_id in rows['simulation_id'].items():
+                simulation = simulations.get(simulation_id)
+                if simulation is not None and simulation.status == EntityStatus.SUCCEEDED:
+                    to_measure.append((row_index, simulation))
+                else:
+                    dropped.append(row_index)
+
+        n_measured = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            usages = executor.map(lambda simulation: self._usage(platform=platform, simulation=simulation),
+                                  [simulation for _, simulation in to_measure])
+            for (row_index, _), usage in zip(to_measure, usages):
+                if usage is None:
+                    dropped.append(row_index)
+                else:
+                    self.profile.loc[row_index, ['peak_rss_mb', 'walltime_s']] = [usage['peak_rss_mb'],
+                                                                                  usage['walltime_s']]
+                    n_measured += 1
+        self.profile = self.profile.drop(index=dropped)
+        return n_measured
+
+    @classmethod
+    def _fit(cls, x: np.ndarray, y: np.ndarray):
+        design = np.column_stack([np.ones_like(x), x])
+        coefficients, _, _, _ = np.linalg.lstsq(design, y, rcond=None)
+        margin = max(0.0, np.max(y - design @ coefficients))
+        return lambda new_x: (coefficients[0] + coefficients[1] * new_x + margin) * cls.HEADROOM
+
+    def predict(self, frame: str, population: Optional[float], duration: float) -> Optional[ResourceRequest]:
+        """
+        Predicts the resources a simulation of the given frame and size needs.
+
+        Args:
+            frame: the frame of the simulation
+            population: the initial population of the simulation
+            duration: the duration of the simulation, in days
+
+        Returns: a ResourceRequest, or None if the frame has too few measured simulations (or the size is unknown)
+        """
+        measured = self.profile[(self.profile['frame'] == frame) & self.profile['peak_rss_mb'].notna()
+                                & self.profile['population'].notna()]
+        if population is None or len(measured) < self.MIN_MEASUREMENTS:
+            return None
+        populations = measured['population'].to_numpy(dtype=float)
+        memory = self._fit(x=populations, y=measured['peak_rss_mb'].to_numpy(dtype=float))(population)
+        person_days = populations * measured['duration'].to_numpy(dtype=float)
+        walltime = self._fit(x=person_days, y=measured['walltime_s'].to_numpy(dtype=float))(population * duration)
+        memory_mb = int(np.ceil(memory))
+        return ResourceRequest(memory_mb=memory_mb,
+                               walltime_s=int(max(self.MIN_WALLTIME_S, np.ceil(walltime))))
+
+    def request_for(self, frame: str, simulations: List[Simulation]) -> Optional[ResourceRequest]:
+        """
+        Returns: the ResourceRequest covering all given simulations of a frame, or None if any cannot be predicted
+        """
+        request = None
+        for simulation in simulations:
+            population, duration = simulation_size(simulation=simulation, populations=self._populations)
+            simulation_request = self.predict(frame=frame, population=population, duration=duration)
+            if simulation_request is None:
+                return None
+            request = simulation_request if request is None else request.maximum(simulation_request)
+        return request
+
+
+# the per-job resource requests of platforms that take them from platform attributes at job creation (Slurm)
+RESOURCE_ATTRIBUTES = ['mem', 'mem_per_cpu', 'time']
+
+
+def platform_resources(platform: IPlatform) -> Dict:
+    """
+    Returns: a dict of the current resource request attributes of a platform (empty if it has none)
+    """
+    return {attribute: getattr(platform, attribute) for attribute in RESOURCE_ATTRIBUTES if hasattr(platform, attribute)}
+
+
+def apply_resource_request(platform: IPlatform, request: ResourceRequest) -> Dict:
+    """
+    Sets a resource request on a platform, for the experiments it creates next. Only platforms with per-job memory
+    and time requests (Slurm) are supported. Cores are not set, as EMOD is run single-core.
+
+    Args:
+        platform: the platform to set the request on
+        request: the resources to request
+
+    Returns: a dict of the platform attributes set
+    """
+    requested = {}
+    if all(hasattr(platform, attribute) for attribute in RESOURCE_ATTRIBUTES):
+        requested = {'mem': request.memory_mb, 'mem_per_cpu': None, 'time': request.slurm_time}
+    for attribute, value in requested.items():
+        setattr(platform, attribute, value)
+    return requested
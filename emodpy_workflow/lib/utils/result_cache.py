@@ -0,0 +1,120 @@
+import hashlib
+import os
+import pickle
+import tempfile
+from typing import Any, Hashable, List
+
+
+class ResultCache:
+    """
+    A simple, size-bounded on-disk cache of picklable python objects. Each entry is stored in its own file, named by
+    a hash of its key, so the cache is safe to share between the worker processes of an analysis. Entries are evicted
+    least-recently-used first when prune() is called and the cache is larger than its maximum size.
+    """
+
+    EXTENSION = '.pkl'
+
+    def __init__(self, directory: str, max_size_mb: float = 1000):
+        """
+        Args:
+            directory: directory to store cache entries in. Created if it does not exist.
+            max_size_mb: maximum total size of the cache, in MB, enforced by prune()
+        """
+        self.directory = os.path.abspath(directory)
+        self.max_size_mb = max_size_mb
+        os.makedirs(self.directory, exist_ok=True)
+
+    @classmethod
+    def hash_key(cls, key: Hashable) -> str:
+        """
+        Converts a cache key (e.g. a tuple of strings) into a stable, filename-safe digest.
+        Args:
+            key: the key to digest. Its repr() must be stable across python sessions.
+
+        Returns: a hex digest string
+        """
+        return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+    def _path_for(self, key: Hashable) -> str:
+        return os.path.join(self.directory, self.hash_key(key=key) + self.EXTENSION)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Retrieves a cached object.
+        Args:
+            key: key of the object to retrieve
+            default: value to return if the key is not in the cache (or its entry is unreadable)
+
+        Returns: the cached object or default
+        """
+        path = self._path_for(key=key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return default
+        # mark the entry as recently used for eviction purposes
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Stores an object in the cache, replacing any existing entry for the key. The entry is written to a temporary
+        file first and moved into place so readers never see a partial entry.
+        Args:
+            key: key to store the object under
+            value: a picklable object to store
+
+        Returns: None
+        """
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self._path_for(key=key))
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def __contains__(self, key: Hashable) -> bool:
+        return os.path.exists(self._path_for(key=key))
+
+    def _entries(self) -> List[os.DirEntry]:
+        return [entry for entry in os.scandir(self.directory)
+                if entry.is_file() and entry.name.endswith(self.EXTENSION)]
+
+    @property
+    def size_mb(self) -> float:
+        return sum(entry.stat().st_size for entry in self._entries()) / 1e6
+
+    def prune(self) -> int:
+        """
+        Evicts least-recently-used entries until the cache is no larger than max_size_mb.
+
+        Returns: the number of entries evicted
+        """
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime)
+        total_bytes = sum(entry.stat().st_size for entry in entries)
+        max_bytes = self.max_size_mb * 1e6
+        n_evicted = 0
+        for entry in entries:
+            if total_bytes <= max_bytes:
+                break
+            total_bytes -= entry.stat().st_size
+            try:
+                os.remove(entry.path)
+                n_evicted += 1
+            except FileNotFoundError:
+                pass  # another process got to it first
+        return n_evicted
+
+    def clear(self) -> None:
+        """
+        Removes all entries from the cache.
+        """
+        for entry in self._entries():
+            os.remove(entry.path)
@@ -0,0 +1,186 @@
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+import pandas as pd
+
+from emodpy_workflow.lib.analysis.download_analyzer_by_experiment_receipt import DownloadAnalyzerByExperimentReceipt
+
+# receipt columns that describe an experiment rather than being sweep overrides
+RECEIPT_COLUMNS = ['frame', 'experiment_id', 'experiment_name', 'experiment_directory', 'burn_in_experiment_id',
+                   'resumed_simulations']
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS experiments (
+    directory TEXT PRIMARY KEY,
+    experiment_id TEXT,
+    experiment_name TEXT,
+    frame TEXT,
+    suite_id TEXT,
+    suite_name TEXT,
+    receipt_path TEXT,
+    receipt_index INTEGER,
+    overrides TEXT
+);
+CREATE INDEX IF NOT EXISTS experiments_by_id ON experiments (experiment_id);
+CREATE INDEX IF NOT EXISTS experiments_by_name ON experiments (experiment_name);
+CREATE INDEX IF NOT EXISTS experiments_by_suite ON experiments (suite_id);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    directory TEXT,
+    sim_id TEXT,
+    sample_index INTEGER,
+    run_number INTEGER,
+    source TEXT,
+    channel TEXT,
+    size INTEGER,
+    sha256 TEXT
+);
+CREATE INDEX IF NOT EXISTS files_by_experiment ON files (directory, channel, sample_index);
+CREATE INDEX IF NOT EXISTS files_by_sim ON files (sim_id);
+'''
+
+EXPERIMENT_COLUMNS = ['directory', 'experiment_id', 'experiment_name', 'frame', 'suite_id', 'suite_name',
+                      'receipt_path', 'receipt_index', 'overrides']
+FILE_COLUMNS = ['path', 'directory', 'sim_id', 'sample_index', 'run_number', 'source', 'channel', 'size', 'sha256']
+
+
+class ResultsCatalog:
+    """
+    A local SQLite database of run experiments (with their suite and sweep overrides) and of the simulation files
+    downloaded from them (with their sample index, run number, simulation id, size and checksum). Experiments are
+    identified by the directory their files are downloaded to, which files are joined to them by. Recording the same
+    experiment or file again updates it, keeping previously known values that are not provided again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # commits (or rolls back) and closes the connection when done
+        connection = sqlite3.connect(self.path)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _upsert(table: str, key: str, columns: List[str]) -> str:
+        updates = ', '.join(f'{column} = COALESCE(excluded.{column}, {column})' for column in columns if column != key)
+        return f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))}) ' \
+               f'ON CONFLICT({key}) DO UPDATE SET {updates}'
+
+    def add_experiments(self, experiments: List[Dict]) -> None:
+        """
+        Records experiments.
+
+        Args:
+            experiments: dicts with a 'directory' (the directory files of the experiment are downloaded to) and any of
+                the other experiment columns (EXPERIMENT_COLUMNS). 'overrides' is a dict of sweep overrides.
+
+        Returns: None
+        """
+        rows = []
+        for experiment in experiments:
+            experiment = dict(experiment, directory=os.path.abspath(experiment['directory']))
+            if experiment.get('overrides') is not None:
+                experiment['overrides'] = json.dumps(experiment['overrides'], sort_keys=True)
+            rows.append([experiment.get(column) for column in EXPERIMENT_COLUMNS])
+        with self._connect() as connection:
+            connection.executemany(self._upsert(table='experiments', key='directory', columns=EXPERIMENT_COLUMNS),
+                                   rows)
+
+    def add_receipt(self, receipt_path: str, suite_id: str = None, suite_name: str = None) -> None:
+        """
+        Records the experiments of a run.py receipt.
+
+        Args:
+            receipt_path: the path of the receipt
+            suite_id: the id of the suite the receipt experiments belong to, if known
+            suite_name: the name of that suite, if known
+
+        Returns: None
+        """
+        receipt = pd.read_csv(receipt_path, index_col='index')
+        output_path = os.path.dirname(os.path.abspath(receipt_path))
+        experiments = []
+        for receipt_index, row in receipt.iterrows():
+            overrides = {column: value for column, value in row.items()
+                         if column not in RECEIPT_COLUMNS and not pd.isna(value)}
+            experiments.append({
+                'directory': os.path.join(output_path, DownloadAnalyzerByExperimentReceipt._directory_name(
+                    experiment_name=row['experiment_name'], sample_index=receipt_index)),
+                'experiment_id': None if pd.isna(row['experiment_id']) else str(row['experiment_id']),
+                'experiment_name': row['experiment_name'],
+                'frame': row['frame'],
+                'suite_id': None if suite_id is None else str(suite_id),
+                'suite_name': suite_name,
+                'receipt_path': os.path.abspath(receipt_path),
+                'receipt_index': int(receipt_index),
+                'overrides': {key: value.item() if hasattr(value, 'item') else value
+                              for key, value in overrides.items()}
+            })
+        self.add_experiments(experiments=experiments)
+
+    def add_files(self, files: List[Dict]) -> None:
+        """
+        Records downloaded files.
+
+        Args:
+            files: dicts with the file columns (FILE_COLUMNS), e.g. DownloadEngine.files
+
+        Returns: None
+        """
+        rows = [[os.path.abspath(file[column]) if column in ['path', 'directory'] else file.get(column)
+                 for column in FILE_COLUMNS] for file in files]
+        with self._connect() as connection:
+            connection.executemany(self._upsert(table='files', key='path', columns=FILE_COLUMNS), rows)
+
+    def find_files(self, channel: str = None, experiment_name: str = None, suite_id: str = None,
+                   suite_name: str = None, frame: str = None, sample_indices: List[int] = None,
+                   overrides: Dict = None) -> pd.DataFrame:
+        """
+        Finds downloaded files by the experiments they belong to and the samples they are of.
+
+        Args:
+            channel: the downloaded file name, without extension (e.g. 'Prevalence')
+            experiment_name: the name of the experiment (sweep arm)
+            suite_id: the id of the suite
+            suite_name: the name of the suite
+            frame: the model frame
+            sample_indices: the sample indices
+            overrides: a dict of sweep override name: value that the experiment must have been run with
+
+        Returns: a dataframe of matching files with their experiment columns, ordered by experiment and sample index
+        """
+        conditions, parameters = [], []
+        for column, value in [('f.channel', channel), ('e.experiment_name', experiment_name),
+                              ('e.suite_id', suite_id), ('e.suite_name', suite_name), ('e.frame', frame)]:
+            if value is not None:
+                conditions.append(f'{column} = ?')
+                parameters.append(value)
+        if sample_indices is not None:
+            sample_indices = [int(index) for index in sample_indices]
+            conditions.append(f'f.sample_index IN ({", ".join("?" * len(sample_indices))})')
+            parameters.extend(sample_indices)
+        for name, value in (overrides or {}).items():
+            conditions.append('json_extract(e.overrides, ?) = ?')
+            parameters.extend([f'$."{name}"', value])
+        where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+        query = f'SELECT f.*, {", ".join(f"e.{column}" for column in EXPERIMENT_COLUMNS if column != "directory")} ' \
+                f'FROM files f LEFT JOIN experiments e ON f.directory = e.directory {where} ' \
+                f'ORDER BY e.suite_name, e.receipt_index, f.directory, f.sample_index, f.run_number, f.channel'
+        with self._connect() as connection:
+            return pd.read_sql_query(query, connection, params=parameters)
+
+    def experiments(self) -> pd.DataFrame:
+        with self._connect() as connection:
+            return pd.read_sql_query('SELECT * FROM experiments ORDER BY suite_name, receipt_index, directory',
+                                     connection)
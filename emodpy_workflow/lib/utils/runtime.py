@@ -85,6 +85,104 @@ def add_post_channel_config_as_asset(task: ITask, channels: List[Channel], refer
     task.common_assets.add_asset(asset, fail_on_duplicate=False)
 
 
+def build_checkpoint_bounds(reference_data: PopulationObs, tolerance: float,
+                            channels: Iterable[str] = ('Prevalence',)) -> Dict[str, List[dict]]:
+    """
+    Builds early-termination checkpoint bounds from national (non-provincial) reference data. A simulation is
+    considered hopeless if its value for a checkpoint is more than a factor of tolerance away from the reference value.
+
+    Args:
+        reference_data: reference data from an ingest form (with years already adjusted as for post-processing)
+        tolerance: multiplicative tolerance (> 1) around each reference value, e.g. 3 allows a third to 3x the value
+        channels: reference data channels to build bounds for. Must be fraction-valued (e.g. Prevalence).
+
+    Returns: a dict of channel name: list of checkpoints (dicts with Year, Gender, AgeBin, Lower, and Upper keys)
+    """
+    if tolerance <= 1:
+        raise ValueError(f'Checkpoint bound tolerance must be greater than 1, not: {tolerance}')
+    df = reference_data._dataframe
+    df = df.loc[df['Province'] == PopulationObs.AGGREGATED_PROVINCE]
+    bounds = {}
+    for channel in channels:
+        if channel not in df.columns:
+            continue
+        checkpoints = []
+        for _, row in df.loc[df[channel].notnull()].sort_values(by='Year').iterrows():
+            value = float(row[channel])
+            checkpoints.append({'Year': float(row['Year']),
+                                'Gender': row['Gender'],
+                                'AgeBin': AgeBin.from_string(row['AgeBin']).to_tuple(),
+                                'Lower': value / tolerance,
+                                'Upper': min(1.0, value * tolerance)})
+        bounds[channel] = checkpoints
+    return bounds
+
+
+def add_checkpoint_bounds_as_asset(task: ITask, reference_data: PopulationObs, tolerance: float) -> None:
+    """
+    Construct an early_termination_bounds.json file to configure the standard EMOD in-processor (dtk_in_process.py)
+    to end hopeless simulations early, and ensure it is added to Task assets
+
+    Args:
+        task: Task object to add file as an asset to
+        reference_data: reference data from an ingest form to build checkpoint bounds from
+        tolerance: multiplicative tolerance around reference values, see build_checkpoint_bounds()
+
+    Returns: None
+    """
+    bounds = build_checkpoint_bounds(reference_data=reference_data, tolerance=tolerance)
+    asset = Asset(filename='early_termination_bounds.json', content=json.dumps(bounds, sort_keys=True))
+    task.common_assets.add_asset(asset, fail_on_duplicate=False)
+
+
+EXTRACTION_SPEC_KEYS = {'source', 'years', 'ages', 'filters', 'columns', 'group_by', 'aggregation'}
+EXTRACTION_AGGREGATIONS = ['sum', 'mean', 'min', 'max']
+
+
+def validate_extraction_spec(spec: dict) -> None:
+    """
+    Checks an extraction spec for the standard EMOD post-processor (dtk_post_process.py), a dict of extract name:
+    extract definition. See dtk_post_process.extract() for the definition keys.
+
+    Args:
+        spec: the extraction spec to check
+
+    Returns: None
+    """
+    for name, extract in spec.items():
+        unknown = set(extract.keys()) - EXTRACTION_SPEC_KEYS
+        if len(unknown) > 0:
+            raise ValueError(f"Unknown key(s) in extract {name}: {', '.join(sorted(unknown))} . "
+                             f"Allowed: {', '.join(sorted(EXTRACTION_SPEC_KEYS))}")
+        if 'source' not in extract:
+            raise ValueError(f'Extract {name} has no source (report file) to extract from.')
+        for key in ['years', 'ages']:
+            if key in extract and (len(extract[key]) != 2 or extract[key][0] > extract[key][1]):
+                raise ValueError(f'Extract {name} {key} must be a [start, end] range, not: {extract[key]}')
+        if extract.get('aggregation', 'sum') not in EXTRACTION_AGGREGATIONS:
+            raise ValueError(f"Extract {name} aggregation must be one of: {', '.join(EXTRACTION_AGGREGATIONS)}")
+        if 'aggregation' in extract and not extract.get('group_by'):
+            raise ValueError(f'Extract {name} has an aggregation but no group_by columns to aggregate by.')
+
+
+def add_extraction_spec_as_asset(task: ITask, spec_path: str) -> None:
+    """
+    Adds an extraction spec (json) file as the extraction_spec.json asset, configuring the standard EMOD post-processor
+    (dtk_post_process.py) to write compact extracts of simulation reports to output/extract/NAME.csv .
+
+    Args:
+        task: Task object to add file as an asset to
+        spec_path: path of the extraction spec json file
+
+    Returns: None
+    """
+    with open(spec_path, 'r') as f:
+        spec = json.load(f)
+    validate_extraction_spec(spec=spec)
+    asset = Asset(filename='extraction_spec.json', content=json.dumps(spec, sort_keys=True))
+    task.common_assets.add_asset(asset, fail_on_duplicate=False)
+
+
 def compute_num_cores(max_memory_mb: int) -> int:
     """
     Computes the number of cores to request for a simulation based on an assumption of one core per 8GB of requested
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+from typing import Dict, Iterator, List, Tuple
+
+import pandas as pd
+from idmtools.assets import Asset
+from idmtools.core import EntityStatus, ItemType
+from idmtools.entities.iplatform import IPlatform
+from idmtools.entities.simulation import Simulation
+
+# Simulations of a suite that are not re-run because an identical, completed simulation already exists are listed in
+# this file (next to the run receipt) so that downloads can include them.
+LINKED_SIMULATIONS_FILENAME = 'linked_simulations.csv'
+
+SAMPLE_INDEX_TAG = '__sample_index__'
+
+# checksums of input files by (path, size, modification time), so files shared by many simulations (the executable,
+# common assets) are read once rather than once per simulation
+_file_checksums = {}
+
+
+def _file_checksum(path: str) -> str:
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _file_checksums:
+        _file_checksums[key] = Asset(absolute_path=path).calculate_checksum()
+    return _file_checksums[key]
+
+
+def _asset_checksum(asset: Asset) -> str:
+    return _file_checksum(asset.absolute_path) if asset.absolute_path else asset.calculate_checksum()
+
+
+def _demographics_roles(task) -> Dict[str, str]:
+    # emodpy writes demographics built for each simulation to randomly named temporary files and points
+    # Demographics_Filenames at them, so they are identified by their position in that list instead of by name
+    filenames = task.config.get('parameters', {}).get('Demographics_Filenames') or []
+    asset_filenames = {asset.filename for assets in [task.transient_assets, task.common_assets] for asset in assets}
+    return {filename: f'demographics{index}' for index, filename in enumerate(filenames)
+            if filename in asset_filenames}
+
+
+def _demographics_checksum(asset: Asset) -> str:
+    # demographics files are stamped with their creation date, which does not affect the simulation
+    demographics = json.loads(asset.bytes)
+    demographics.get('Metadata', {}).pop('DateCreated', None)
+    return hashlib.md5(json.dumps(demographics, sort_keys=True).encode()).hexdigest()
+
+
+def _simulation_inputs(simulation: Simulation) -> Iterator[Tuple[str, bytes]]:
+    task = simulation.task
+    roles = _demographics_roles(task=task)
+    config = json.loads(json.dumps(task.config, default=str))
+    if len(roles) > 0:
+        parameters = config['parameters']
+        parameters['Demographics_Filenames'] = [roles.get(filename, filename)
+                                                for filename in parameters['Demographics_Filenames']]
+    yield 'config', json.dumps(config, sort_keys=True).encode()
+    if task.campaign:
+        yield 'campaign', task.campaign.json.encode()
+    if task.reporters.builtin_reporters:
+        yield 'reporters', task.reporters.json.encode()
+    if task.eradication_path:
+        yield 'executable', _file_checksum(task.eradication_path).encode()
+    if getattr(task, 'sif_path', None):
+        yield 'sif', str(task.sif_path).encode()
+    # everything else shipped with the simulation: built demographics, embedded python, ingest form, ...
+    for kind, assets in [('transient', task.transient_assets), ('common', task.common_assets)]:
+        for asset in assets:
+            if asset.filename in roles:
+                yield f'{kind}:{roles[asset.filename]}', _demographics_checksum(asset).encode()
+            else:
+                yield f'{kind}:{asset.relative_path}/{asset.filename}', _asset_checksum(asset).encode()
+
+
+def simulation_input_hash(simulation: Simulation) -> str:
+    """
+    Computes a hash of everything that determines the output of a built simulation: its config (including
+    Run_Number), campaign, reports, executable, and input files. Demographics files are hashed by content and
+    position in Demographics_Filenames, not by their (temporary) file names.
+
+    Args:
+        simulation: a simulation with its inputs built
+
+    Returns: a hex digest that is identical for simulations with identical inputs
+    """
+    digest = hashlib.sha256()
+    for name, content in sorted(_simulation_inputs(simulation=simulation)):
+        digest.update(name.encode())
+        digest.update(hashlib.sha256(content).digest())
+    return digest.hexdigest()
+
+
+class SimulationIndex:
+    """
+    A local index of commissioned simulations by the hash of their inputs (see simulation_input_hash), per platform.
+    Simulations are recorded when commissioned. Whether an indexed simulation has completed is checked on the
+    platform when it is looked up, and simulations that turn out to have failed are dropped from the index.
+    """
+
+    COLUMNS = ['hash', 'platform', 'experiment_id', 'simulation_id']
+
+    def __init__(self, path: str):
+        self.path = path
+        if os.path.exists(path):
+            self.index = pd.read_csv(path, dtype=str)
+        else:
+            self.index = pd.DataFrame(columns=self.COLUMNS, dtype=str)
+        self._statuses = {}  # experiment id: {simulation id: status}, fetched once per experiment
+        self._rows_by_key = None  # (hash, platform): index rows, rebuilt after the index changes
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.index.to_csv(self.path, index=False)
+
+    def add(self, input_hash: str, platform_name: str, experiment_id: str, simulation_id: str) -> None:
+        row = pd.DataFrame([[input_hash, platform_name, str(experiment_id), str(simulation_id)]], columns=self.COLUMNS)
+        self.index = pd.concat([df for df in [self.index, row] if not df.empty], ignore_index=True)
+        self._rows_by_key = None
+
+    def _candidate_rows(self, input_hash: str, platform_name: str) -> pd.DataFrame:
+        if self._rows_by_key is None:
+            self._rows_by_key = self.index.groupby(['hash', 'platform']).groups
+        return self.index.loc[self._rows_by_key.get((input_hash, platform_name), [])]
+
+    def _simulation_statuses(self, platform: IPlatform, experiment_id: str) -> Dict[str, EntityStatus]:
+        if experiment_id not in self._statuses:
+            try:
+                simulations = platform.get_children(experiment_id, item_type=ItemType.EXPERIMENT, force=True)
+                self._statuses[experiment_id] = {str(simulation.id): simulation.status for simulation in simulations}
+            except Exception:
+                # the experiment no longer exists (deleted, or a different platform instance); nothing to link to
+                self._statuses[experiment_id] = {}
+        return self._statuses[experiment_id]
+
+    def find_completed(self, input_hash: str, platform: IPlatform, platform_name: str) -> str:
+        """
+        Finds a successfully completed simulation with the given input hash.
+
+        Args:
+            input_hash: the input hash of the simulation to find
+            platform: the platform to check simulation status on
+            platform_name: the name of the platform, as indexed
+
+        Returns: the id of a completed simulation, or None if there is none
+        """
+        candidates = self._candidate_rows(input_hash=input_hash, platform_name=platform_name)
+        dropped = []
+        completed_id = None
+        for row_index, row in candidates[::-1].iterrows():  # most recent first
+            status = self._simulation_statuses(platform=platform, experiment_id=row['experiment_id']).get(
+                row['simulation_id'], EntityStatus.FAILED)
+            if status == EntityStatus.SUCCEEDED:
+                completed_id = row['simulation_id']
+                break
+            elif status == EntityStatus.FAILED:
+                dropped.append(row_index)
+        if dropped:
+            self.index = self.index.drop(index=dropped)
+            self._rows_by_key = None
+        return completed_id
+
+    def partition(self, simulations: List[Simulation], platform: IPlatform,
+                  platform_name: str) -> Tuple[List[Simulation], List[str], Dict[int, str]]:
+        """
+        Splits built simulations into those that need to run and those with an identical completed simulation.
+
+        Args:
+            simulations: simulations with their inputs built
+            platform: the platform to check simulation status on
+            platform_name: the name of the platform, as indexed
+
+        Returns: a tuple of (simulations to run, their input hashes (for recording them once created), a dict of
+            sample index: completed simulation id for the others)
+        """
+        to_run, hashes, linked = [], [], {}
+        for simulation in simulations:
+            input_hash = simulation_input_hash(simulation=simulation)
+            completed_id = self.find_completed(input_hash=input_hash, platform=platform, platform_name=platform_name)
+            if completed_id is None:
+                to_run.append(simulation)
+                hashes.append(input_hash)
+            else:
+                linked[int(simulation.tags[SAMPLE_INDEX_TAG])] = completed_id
+        return to_run, hashes, linked
@@ -1,3 +1,7 @@
+import os
+
+from emodpy_workflow.lib.calibration.adaptive_replicates import AdaptiveReplicateCalibManager
+from emodpy_workflow.lib.calibration.streaming import StreamingCalibManager
 from emodpy_workflow.lib.utils.runtime import load_frame, load_algorithm, available_algorithms
 
 from idmtools.core.platform_factory import Platform
@@ -8,8 +12,22 @@ from idmtools_calibra.plotters.optim_tool_plotter import OptimToolPlotter
 
 
 def initialize_calib_manager(task, site, calibration_name, directory,
-                             n_replicates, n_iterations, next_point_object, sample_mapping_function):
-    calib_manager = CalibManager(
+                             n_replicates, n_iterations, next_point_object, sample_mapping_function,
+                             streaming_analysis=False, poll_interval=30, plotters=None,
+                             replicate_margin=None):
+    if plotters is None:
+        plotters = [LikelihoodPlotter(), OptimToolPlotter()]
+    if streaming_analysis and replicate_margin is not None:
+        raise ValueError('Streaming analysis and adaptive replicates cannot be used together.')
+    if streaming_analysis:
+        calib_manager_class, manager_kwargs = StreamingCalibManager, {'poll_interval': poll_interval}
+    elif replicate_margin is not None:
+        # n_replicates becomes the maximum number of replicates of any sample
+        calib_manager_class = AdaptiveReplicateCalibManager
+        manager_kwargs = {'max_replicates': n_replicates, 'margin': replicate_margin}
+    else:
+        calib_manager_class, manager_kwargs = CalibManager, {}
+    calib_manager = calib_manager_class(
         name=calibration_name,
         directory=directory,
         task=task,
@@ -18,7 +36,8 @@ def initialize_calib_manager(task, site, calibration_name, directory,
         next_point=next_point_object,
         sim_runs_per_param_set=n_replicates,
         max_iterations=n_iterations,
-        plotters=[LikelihoodPlotter(), OptimToolPlotter()]  # TODO: add a way for user/model/manifest/something to specify these
+        plotters=plotters,
+        **manager_kwargs
     )
     calib_manager.map_sample_to_model_input_fn = sample_mapping_function
     return calib_manager
@@ -27,13 +46,21 @@ def initialize_calib_manager(task, site, calibration_name, directory,
 def main(args):
     # setup model frame binary, task, and inputs builder
     args.frame.initialize_executable()
-    task = args.frame.initialize_task()
+    # only calibration simulations may be ended early; their scores do not need complete outputs
+    task = args.frame.initialize_task(early_termination=True)
     inputs_builder = args.frame.inputs_builder(random_run_number=True)
 
     # setup the selected next point algorithm for use
     next_point_object = args.algorithm_initializer(args=args, params=args.frame.calibration_parameters,
                                                    frame=args.frame)
 
+    # cache per-simulation analysis results so resumed/re-run analyses only process what is new
+    if args.streaming_analysis and args.cache_size_mb <= 0:
+        raise ValueError('Streaming analysis requires the analysis result cache; specify a --cache-size above 0.')
+    if args.cache_size_mb > 0:
+        cache_dir = os.path.join(args.output, args.calibration_name, 'analysis_cache')
+        args.frame.site.enable_result_cache(directory=cache_dir, max_size_mb=args.cache_size_mb)
+
     calib_manager = initialize_calib_manager(task=task,
                                              site=args.frame.site,
                                              calibration_name=args.calibration_name,
@@ -41,7 +68,11 @@ def main(args):
                                              n_replicates=args.n_replicates,
                                              n_iterations=args.n_iterations,
                                              next_point_object=next_point_object,
-                                             sample_mapping_function=inputs_builder)
+                                             sample_mapping_function=inputs_builder,
+                                             streaming_analysis=args.streaming_analysis,
+                                             poll_interval=args.poll_interval,
+                                             plotters=args.algorithm_plotters,
+                                             replicate_margin=args.replicate_margin)
     calib_manager.platform = Platform(args.platform, max_running_jobs=1000000, array_batch_size=1000000) # doesn't work for now, num_cores=args.frame.num_cores)
 
     # if a runtime environment container reference file is specified, make sure the task knows about it
@@ -57,7 +88,9 @@ DEFAULTS = {
     'n_iterations': 2,
     'n_replicates': 1,
     'n_samples': 3,
-    'n_center_repeats': 2
+    'n_center_repeats': 2,
+    'cache_size_mb': 0,
+    'poll_interval': 30
 }
 
 
@@ -82,6 +115,20 @@ def parse_args():
                         help=f"Directory to put calibration directory inside of (Default: {DEFAULTS['output']})")
     parser.add_argument('-p', '--platform', dest='platform', type=str, required=True,
                         help="Platform to run calibration on (Required).")
+    parser.add_argument('--cache-size', dest='cache_size_mb', type=float, default=DEFAULTS['cache_size_mb'],
+                        help=f"Maximum size (MB) of an on-disk cache of per-simulation analysis results, so resumed "
+                             f"analyses only process new simulations. 0 to disable "
+                             f"(Default: {DEFAULTS['cache_size_mb']}, disabled)")
+    parser.add_argument('--streaming-analysis', dest='streaming_analysis', action='store_true', default=False,
+                        help="Analyze simulations as they complete instead of after each iteration finishes. Requires "
+                             "the analysis result cache (Default: analyze after each iteration finishes)")
+    parser.add_argument('--poll-interval', dest='poll_interval', type=float, default=DEFAULTS['poll_interval'],
+                        help=f"Seconds between simulation status checks with --streaming-analysis "
+                             f"(Default: {DEFAULTS['poll_interval']})")
+    parser.add_argument('--adaptive-replicates', dest='replicate_margin', type=float, default=None,
+                        help="Run one replicate per sample first, then run the remaining replicates (up to "
+                             "--replicates) only for samples whose likelihood is within this margin of the best "
+                             "sample of the iteration (Default: all samples get all replicates)")
 
     # and now the subparsers for the available next-point algorithms
     subparsers = parser.add_subparsers(dest='selected_algorithm')
@@ -98,6 +145,8 @@ def parse_args():
 
     # set algorithm initializer
     args.algorithm_initializer = algorithm_modules[args.selected_algorithm].initialize
+    plotters_function = getattr(algorithm_modules[args.selected_algorithm], 'plotters', None)
+    args.algorithm_plotters = plotters_function() if plotters_function is not None else None
 
     return args
 
@@ -0,0 +1,108 @@
+import json
+import os
+
+import pandas as pd
+
+from emodpy_workflow.lib.utils.results_catalog import ResultsCatalog
+
+
+def parse_sample_indices(samples_str):
+    # e.g. '0-99,150' -> [0, 1, ..., 99, 150]
+    indices = []
+    for entry in samples_str.strip().split(','):
+        try:
+            if '-' in entry:
+                first, last = entry.split('-', 1)
+                indices.extend(range(int(first), int(last) + 1))
+            else:
+                indices.append(int(entry))
+        except ValueError:
+            raise ValueError(f'Invalid sample index range: {entry} . Expected format: 0-99,150')
+    return indices
+
+
+def parse_overrides(override_strs):
+    # e.g. ['Condom_Usage=0.5', 'Scenario=baseline'] -> {'Condom_Usage': 0.5, 'Scenario': 'baseline'}
+    overrides = {}
+    for entry in override_strs:
+        try:
+            name, value = entry.split('=', 1)
+        except ValueError:
+            raise ValueError(f'Invalid sweep override: {entry} . Expected format: NAME=VALUE')
+        try:
+            overrides[name.strip()] = json.loads(value)
+        except json.JSONDecodeError:
+            overrides[name.strip()] = value
+    return overrides
+
+
+def main(args):
+    if not os.path.exists(args.catalog):
+        raise FileNotFoundError(f'No results catalog at: {args.catalog}')
+    catalog = ResultsCatalog(path=args.catalog)
+    if args.list_experiments:
+        results = catalog.experiments()
+    else:
+        results = catalog.find_files(channel=args.channel, experiment_name=args.experiment_name,
+                                     suite_id=args.suite_id, suite_name=args.suite_name, frame=args.frame,
+                                     sample_indices=args.sample_indices, overrides=args.overrides)
+
+    if args.output_file is None:
+        with pd.option_context('display.max_rows', 50, 'display.width', 200):
+            print(results)
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output_file)), exist_ok=True)
+        results.to_csv(args.output_file, index=False)
+        print(f'Wrote {len(results)} catalog entries to: {args.output_file}')
+    return results
+
+
+DEFAULTS = {
+    'channel': None,
+    'experiment_name': None,
+    'suite_id': None,
+    'suite_name': None,
+    'frame': None,
+    'samples': None,
+    'overrides': [],
+    'output_file': None
+}
+
+
+def parse_args():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('-c', '--catalog', dest='catalog', type=str, required=True,
+                        help='Results catalog database written by run and download (Required).')
+    parser.add_argument('-e', '--experiments', dest='list_experiments', action='store_true', default=False,
+                        help='List the cataloged experiments instead of files (Default: list files).')
+    parser.add_argument('-d', '--channel', dest='channel', type=str, default=DEFAULTS['channel'],
+                        help='Downloaded file name without extension, e.g. Prevalence (Default: all).')
+    parser.add_argument('-n', '--experiment-name', dest='experiment_name', type=str,
+                        default=DEFAULTS['experiment_name'], help='Experiment (sweep arm) name (Default: all).')
+    parser.add_argument('--suite-id', dest='suite_id', type=str, default=DEFAULTS['suite_id'],
+                        help='Suite id (Default: all).')
+    parser.add_argument('-N', '--suite-name', dest='suite_name', type=str, default=DEFAULTS['suite_name'],
+                        help='Suite name (Default: all).')
+    parser.add_argument('-f', '--frame', dest='frame', type=str, default=DEFAULTS['frame'],
+                        help='Model frame (Default: all).')
+    parser.add_argument('-s', '--samples', dest='samples', type=str, default=DEFAULTS['samples'],
+                        help='Comma-separated sample indices and/or ranges, e.g. 0-99,150 (Default: all).')
+    parser.add_argument('-w', '--override', dest='overrides', type=str, action='append',
+                        default=list(DEFAULTS['overrides']),
+                        help='NAME=VALUE sweep override the experiment must have been run with. Can be given '
+                             'multiple times (Default: no override constraints).')
+    parser.add_argument('-o', '--output-file', dest='output_file', type=str, default=DEFAULTS['output_file'],
+                        help='csv file to write the results to (Default: print them).')
+
+    args = parser.parse_args()
+    args.sample_indices = None if args.samples is None else parse_sample_indices(samples_str=args.samples)
+    args.overrides = parse_overrides(override_strs=args.overrides)
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    main(args)
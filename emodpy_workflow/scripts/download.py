@@ -5,31 +5,42 @@ from emodpy_workflow.lib.analysis.download_analyzer_by_experiment import Downloa
 from emodpy_workflow.lib.analysis.download_analyzer_by_experiment_filter_simulations import \
     DownloadAnalyzerByExperimentFilterSimulations
 from emodpy_workflow.lib.analysis.download_analyzer_by_experiment_receipt import DownloadAnalyzerByExperimentReceipt
+from emodpy_workflow.lib.utils.download_engine import DownloadCache, DownloadEngine
+from emodpy_workflow.lib.utils.parquet_dataset import ParquetDatasetTarget
+from emodpy_workflow.lib.utils.results_catalog import ResultsCatalog
 
-from idmtools.analysis.analyze_manager import AnalyzeManager
 from idmtools.core import ItemType
 from idmtools.core.platform_factory import Platform
 
 
-def download_experiments(analyzer, experiment_ids, platform):
-    am = AnalyzeManager(ids=[(exp_id, ItemType.EXPERIMENT) for exp_id in experiment_ids],
-                        analyzers=[analyzer],
-                        verbose=False,
-                        platform=platform)
-    am.analyze()
-    return analyzer.results  # downloaded file list
+def download_experiments(analyzer, experiment_ids, platform, simulation_ids=None, workers=None, retries=None,
+                         verify=False, parquet=False, catalog=None, cache_dir=None, skip_early_terminated=False):
+    workers = DEFAULTS['workers'] if workers is None else workers
+    retries = DEFAULTS['retries'] if retries is None else retries
+    target = ParquetDatasetTarget(analyzer=analyzer) if parquet else None
+    cache = None if cache_dir is None else DownloadCache(directory=cache_dir)
+    engine = DownloadEngine(platform=platform, analyzer=analyzer, max_workers=workers, max_attempts=retries + 1,
+                            verify_checksum=verify, target=target, cache=cache,
+                            skip_early_terminated=skip_early_terminated)
+    try:
+        return engine.download(experiment_ids=experiment_ids, simulation_ids=simulation_ids)  # downloaded file list
+    finally:
+        if catalog is not None:
+            # files downloaded before any failure are cataloged as well
+            catalog.add_files(files=engine.files)
 
 
 def main(args):
     validate_args(args)
     platform = Platform(args.platform)
+    simulation_ids = None
     if args.receipt_file:
         # using a receipt file to identify experiments to download
         receipt = pd.read_csv(args.receipt_file, index_col='index')
-        experiment_ids = receipt['experiment_id'].unique()
-        experiments = [platform.get_item(item_id=experiment_id, item_type=ItemType.EXPERIMENT)
-                       for experiment_id in experiment_ids]
+        # experiments consisting entirely of linked simulations were never created
+        experiment_ids = receipt['experiment_id'].dropna().unique()
         analyzer = DownloadAnalyzerByExperimentReceipt(filenames=args.files, receipt_file=args.receipt_file)
+        simulation_ids = analyzer.linked_simulation_ids
     elif args.suite_id:
         # using a suite id to identify experiments for download
         experiments = platform.get_children(item_id=args.suite_id, item_type=ItemType.SUITE)
@@ -37,23 +48,36 @@ def main(args):
         analyzer = DownloadAnalyzerByExperiment(filenames=args.files, output_path=args.output_dir)
     elif args.experiment_id:
         # using an experiment id to identify a single experiment for download
-        experiments = [platform.get_item(item_id=args.experiment_id, item_type=ItemType.EXPERIMENT)]
-        experiment_ids = [experiment.id for experiment in experiments]
+        experiment_ids = [args.experiment_id]
         analyzer = DownloadAnalyzerByExperiment(filenames=args.files, output_path=args.output_dir)
     else:
         # using a samples file to identify specific simulations (in experiments) to download (not full experiments)
         samples_df = pd.read_csv(args.samples_file)
         experiment_ids = {platform.get_parent(item_id=sim_id, item_type=ItemType.SIMULATION).id for sim_id in
                           samples_df['sim_id']}
-        experiments = [platform.get_item(item_id=experiment_id, item_type=ItemType.EXPERIMENT)
-                       for experiment_id in experiment_ids]
         analyzer = DownloadAnalyzerByExperimentFilterSimulations(filenames=args.files,
                                                                  simulation_ids=list(samples_df['sim_id']),
                                                                  output_path=args.output_dir)
 
-    for experiment in experiments:
-        platform.wait_till_done(item=experiment)
-    downloaded_filepaths = download_experiments(analyzer=analyzer, experiment_ids=experiment_ids, platform=platform)
+    catalog = None
+    if args.catalog:
+        # record the downloaded experiments and (below) files for lookups across downloads
+        catalog = ResultsCatalog(path=args.catalog)
+        if args.receipt_file:
+            catalog.add_receipt(receipt_path=args.receipt_file)
+        else:
+            catalog.add_experiments(experiments=[
+                {'directory': analyzer._directory_for_experiment(experiment_id=str(experiment_id)),
+                 'experiment_id': str(experiment_id), 'suite_id': args.suite_id}
+                for experiment_id in experiment_ids])
+
+    # all experiments are waited on at once, the files of each downloading as soon as it is done
+    downloaded_filepaths = download_experiments(analyzer=analyzer, experiment_ids=experiment_ids, platform=platform,
+                                                simulation_ids=simulation_ids, workers=args.workers,
+                                                retries=args.retries, verify=args.verify, parquet=args.parquet,
+                                                catalog=catalog, cache_dir=args.cache_dir,
+                                                # simulations ended early are not post-processed, so have no extracts
+                                                skip_early_terminated=bool(args.extracts))
     print(f'Done downloading files to: {analyzer.output_path}')
     return downloaded_filepaths
 
@@ -64,9 +88,19 @@ DEFAULTS = {
     'samples_file': None,
     'suite_id': None,
     'experiment_id': None,
-    'output_dir': None
+    'output_dir': None,
+    'workers': 16,
+    'retries': 4,
+    'verify': False,
+    'parquet': False,
+    'catalog': None,
+    'cache_dir': None,
+    'extracts': None
 }
 
+# where the standard post-processor (dtk_post_process.py) writes report extracts defined by an extraction spec
+EXTRACT_PATH = os.path.join('output', 'extract')
+
 
 usage_str = 'Either set -r OR (--suite-id and -o) OR (--exp-id and -o) OR (-s and -o)'
 
@@ -79,6 +113,10 @@ def parse_args():
                         help=f"Comma-separated list of simulation directory relative file paths to download "
                              f"(Default: {DEFAULTS['files']})")
 
+    parser.add_argument('-x', '--extracts', dest='extracts', type=str, default=DEFAULTS['extracts'],
+                        help='Comma-separated list of report extract names (of the extraction spec of the frame) to '
+                             'download instead of the -d files (Default: download the -d files).')
+
     parser.add_argument('-r', '--receipt', dest='receipt_file', type=str, default=DEFAULTS['receipt_file'],
                         help=f'Commissioning receipt file path. {usage_str}.')
     parser.add_argument('-s', '--samples', dest='samples_file', type=str, default=DEFAULTS['samples_file'],
@@ -92,9 +130,31 @@ def parse_args():
                         help=f'Directory to write output into. {usage_str}.')
     parser.add_argument('-p', '--platform', dest='platform', type=str, required=True,
                         help="Platform to download from (Required).")
+    parser.add_argument('--workers', dest='workers', type=int, default=DEFAULTS['workers'],
+                        help=f"Maximum number of files to download concurrently (Default: {DEFAULTS['workers']}).")
+    parser.add_argument('--retries', dest='retries', type=int, default=DEFAULTS['retries'],
+                        help=f"Number of times to retry a failed file download, with exponential backoff "
+                             f"(Default: {DEFAULTS['retries']}).")
+    parser.add_argument('--verify', dest='verify', action='store_true', default=DEFAULTS['verify'],
+                        help='Verify the checksum (not only the size) of previously downloaded files before '
+                             'skipping them (Default: check size only).')
+    parser.add_argument('--parquet', dest='parquet', action='store_true', default=DEFAULTS['parquet'],
+                        help='Write the downloaded CSV files into a Parquet dataset (in the dataset subdirectory of '
+                             'the output directory) partitioned by experiment and channel, instead of as separate '
+                             'files. Requires pyarrow (Default: separate files).')
+    parser.add_argument('-c', '--catalog', dest='catalog', type=str, default=DEFAULTS['catalog'],
+                        help='Results catalog database to record the downloaded experiments and files in (created if '
+                             'needed). See the catalog command for querying it (Default: no catalog).')
+    parser.add_argument('--cache-dir', dest='cache_dir', type=str, default=DEFAULTS['cache_dir'],
+                        help='Directory of a local cache of simulation files (by simulation id and file path) to '
+                             'reuse files downloaded by earlier downloads from instead of fetching them again, e.g. '
+                             'into a different output directory (Default: no cache).')
 
     args = parser.parse_args()
-    args.files = args.files.strip().split(',')
+    if args.extracts:
+        args.files = [os.path.join(EXTRACT_PATH, f'{name}.csv') for name in args.extracts.strip().split(',')]
+    else:
+        args.files = args.files.strip().split(',')
     return args
 
 
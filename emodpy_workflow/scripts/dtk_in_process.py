@@ -0,0 +1,140 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Ends hopeless simulations early. Checkpoint bounds (early_termination_bounds.json, built from ingest form reference
+# data) are checked as soon as the report data for their year has been written. If any is violated, placeholder
+# post-process output marked with an EarlyTermination column is written, so HIVAnalyzer scores the simulation at the
+# likelihood floor, and the simulation exits.
+
+by_age_and_gender_filename = "ReportHIVByAgeAndGender.csv"
+
+OUTPUT_DIRECTORY = 'output'
+POST_PROCESS_DIRECTORY = 'post_process'
+EARLY_TERMINATION_CHANNEL = 'EarlyTermination'
+EARLY_TERMINATION_FILENAME = 'early_termination.json'
+
+# the report is only checked at most this often (in timesteps) and only if it has grown; only its new rows are read
+CHECK_INTERVAL = 30
+REPORT_COLUMNS = ['Year', 'Gender', 'Age', 'Infected', 'Population']
+
+GENDER_MAP = {'Male': 0, 'Female': 1}
+
+
+def load_asset(filename):
+    for directory in [os.path.join("..", "Assets"), "Assets"]:  # cluster-style, then COMPS-style
+        path = os.path.join(directory, filename)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                return json.load(f)
+    return None
+
+
+bounds = load_asset("early_termination_bounds.json") or {}
+post_channel_config = load_asset("post_channel_config.json") or {}
+checkpoints = [dict(checkpoint, Channel=channel) for channel, channel_checkpoints in bounds.items()
+               for checkpoint in channel_checkpoints]
+
+n_calls = 0
+report_offset = 0  # bytes of the report read so far (complete lines only)
+report_header = None
+report_data = None  # the report rows read so far that remaining checkpoints may need
+
+
+def compute_prevalence(data, year, gender, age_bin):
+    conditions = np.isclose(data['Year'], year) & (data['Age'] >= age_bin[0]) & (data['Age'] < age_bin[1])
+    if gender in GENDER_MAP:
+        conditions = conditions & (data['Gender'] == GENDER_MAP[gender])
+    rows = data.loc[conditions]
+    population = rows['Population'].sum()
+    return rows['Infected'].sum() / population if population > 0 else 0.0
+
+
+def find_violation(data):
+    """
+    Checks all checkpoints whose year has been completely written to the report (a later year is present).
+    Checked checkpoints are removed from the module-level list so they are only checked once.
+    """
+    latest_year = data['Year'].max()
+    for checkpoint in [c for c in checkpoints if c['Year'] < latest_year]:
+        checkpoints.remove(checkpoint)
+        value = compute_prevalence(data, year=checkpoint['Year'], gender=checkpoint['Gender'],
+                                   age_bin=checkpoint['AgeBin'])
+        if not checkpoint['Lower'] <= value <= checkpoint['Upper']:
+            return dict(checkpoint, Value=value)
+    return None
+
+
+def terminate(violation, output_dir):
+    print("Ending simulation early; checkpoint bounds violated: %s" % violation)
+    directory = os.path.join(output_dir, POST_PROCESS_DIRECTORY)
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    placeholder = pd.DataFrame({'Year': [violation['Year']], 'Node': [0], 'Gender': [violation['Gender']],
+                                'AgeBin': ['[%d:%d)' % tuple(violation['AgeBin'])], 'Result': [np.nan],
+                                EARLY_TERMINATION_CHANNEL: [1]})
+    for channel in post_channel_config.keys():
+        placeholder.to_csv(os.path.join(directory, '%s.csv' % channel), index=False)
+    with open(os.path.join(output_dir, EARLY_TERMINATION_FILENAME), 'w') as f:
+        json.dump(violation, f)
+    # exit immediately and successfully; the remainder of the simulation (and its post-processing) is skipped
+    os._exit(0)
+
+
+def read_new_rows(filename):
+    """
+    Reads the complete lines appended to the report since the previous call. A partially written last line is left
+    for the next call.
+    """
+    global report_offset, report_header
+    with open(filename, 'rb') as f:
+        f.seek(report_offset)
+        text = f.read()
+    end = text.rfind(b'\n') + 1
+    if end == 0:
+        return None  # no complete new lines
+    text = text[:end]
+    header = report_header
+    if header is None:
+        header = text[:text.index(b'\n') + 1]
+        text = text[len(header):]
+    try:
+        rows = pd.read_csv(io.BytesIO(header + text), usecols=REPORT_COLUMNS)
+    except (ValueError, pd.errors.ParserError, pd.errors.EmptyDataError):
+        return None  # malformed; try again later
+    report_header = header
+    report_offset += end
+    return rows
+
+
+def check(output_dir):
+    global report_data
+    filename = os.path.join(output_dir, by_age_and_gender_filename)
+    if not os.path.isfile(filename) or os.path.getsize(filename) <= report_offset:
+        return
+    rows = read_new_rows(filename)
+    if rows is None or len(rows) == 0:
+        return
+    report_data = rows if report_data is None else pd.concat([report_data, rows], ignore_index=True)
+    violation = find_violation(report_data)
+    if violation is not None:
+        terminate(violation, output_dir=output_dir)
+    if len(checkpoints) > 0:
+        # rows of years before every remaining checkpoint are not needed again
+        first_year = min(checkpoint['Year'] for checkpoint in checkpoints)
+        report_data = report_data.loc[(report_data['Year'] >= first_year) | np.isclose(report_data['Year'], first_year)]
+
+
+def application(timestep):
+    global n_calls
+    n_calls += 1
+    if len(checkpoints) > 0 and n_calls % CHECK_INTERVAL == 0:
+        check(output_dir=OUTPUT_DIRECTORY)
+    return ""
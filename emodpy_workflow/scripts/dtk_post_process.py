@@ -19,6 +19,7 @@ by_age_and_gender_filename = "ReportHIVByAgeAndGender.csv"
 AGGREGATED_NODE = 0  # reserved node number for aggregated aka 'National' processing
 
 OUTPUT_DIRECTORY = 'output'
+RESOURCE_USAGE_FILENAME = 'resource_usage.json'
 
 MALE = 0
 FEMALE = 1
@@ -26,17 +27,23 @@ BOTH = 2
 GENDER_MAP = {'Male': MALE, 'Female': FEMALE, 'Both': BOTH}  # str to int
 GENDER_STR = {k: v for v, k in GENDER_MAP.items()}  # int to str
 
-# load file post_channel_config.json which configures which data to process
-try:
-    # attempt to load cluster-style
-    ref_config = json.load(open(os.path.join("..", "Assets", "post_channel_config.json"), 'rb'))
-except FileNotFoundError:
-    try:
-        # attempt to load COMPS-style
-        ref_config = json.load(open(os.path.join("Assets", "post_channel_config.json"), 'rb'))
-    except FileNotFoundError as e:
-        e.args = ("Could not load post-processing configuration file: post_channel_config.json", )
-        raise e
+EXTRACT_DIRECTORY = 'extract'
+EXTRACT_CHUNK_SIZE = 1000000  # rows of a source report read (and filtered) at a time
+
+
+def load_asset(filename):
+    for directory in [os.path.join("..", "Assets"), "Assets"]:  # cluster-style, then COMPS-style
+        path = os.path.join(directory, filename)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                return json.load(f)
+    return None
+
+
+# load file post_channel_config.json which configures which data to process, and/or file extraction_spec.json which
+# configures compact extracts of simulation reports to write (see extract())
+ref_config = load_asset("post_channel_config.json")
+extraction_spec = load_asset("extraction_spec.json")
 
 
 def timing(f, message):
@@ -289,11 +296,101 @@ def process_report(report, all_data, node_ids):
     return output
 
 
+def record_resource_usage(output_dir):
+    """
+    Records the peak memory (MB) and walltime (s) of the EMOD process (which runs this post-processor) for resource
+    prediction of later simulations. Best effort: nothing is recorded where the process cannot be measured.
+    """
+    try:
+        import resource
+        peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0  # KB on Linux
+        with open('/proc/self/stat') as f:
+            # start time (field 22) is after the parenthesized command name, which may contain spaces
+            start_ticks = float(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        walltime_s = uptime - start_ticks / os.sysconf('SC_CLK_TCK')
+    except (ImportError, OSError, ValueError, IndexError):
+        return
+    with open(os.path.join(output_dir, RESOURCE_USAGE_FILENAME), 'w') as f:
+        json.dump({'peak_rss_mb': peak_rss_mb, 'walltime_s': walltime_s}, f)
+
+
+def normalize_column_name(name):
+    return name.strip().replace(' ', '_').replace('(', '').replace(')', '')
+
+
+def extract(filename, spec):
+    """
+    Extracts the rows and columns of a (large) report csv file selected by an extraction spec entry, optionally
+    aggregated. Column names are normalized as for channel post-processing (e.g. 'Newly Infected' -> Newly_Infected).
+
+    Spec keys (all optional except source):
+        source: the report file name, relative to the output directory
+        years: [first, last] year to keep (inclusive)
+        ages: [min, max) age range to keep
+        filters: a dict of column: list of values to keep, e.g. {"Gender": [1], "NodeId": [1, 2]}
+        columns: the columns to keep (Default: all). When aggregating, the value columns to aggregate.
+        group_by: columns to aggregate the value columns by
+        aggregation: one of sum, mean, min, max (Default: sum)
+    """
+    header = pd.read_csv(filename, nrows=0).columns
+    names = {normalize_column_name(name): name for name in header}
+    filters = spec.get('filters', {})
+    group_by = spec.get('group_by', [])
+    columns = spec.get('columns', None)
+    needed = set(filters.keys()) | set(group_by) | set(columns or names.keys())
+    needed |= {'Year'} if 'years' in spec else set()
+    needed |= {'Age'} if 'ages' in spec else set()
+    missing = needed - set(names.keys())
+    if len(missing) > 0:
+        raise UndefinedChannelException('Extraction columns not in %s: %s' % (filename, ', '.join(sorted(missing))))
+
+    chunks = []
+    for chunk in pd.read_csv(filename, usecols=[names[name] for name in needed], chunksize=EXTRACT_CHUNK_SIZE):
+        chunk.columns = [normalize_column_name(name) for name in chunk.columns]
+        conditions = np.ones(len(chunk), dtype=bool)
+        if 'years' in spec:
+            conditions &= (chunk['Year'] >= spec['years'][0]) & (chunk['Year'] <= spec['years'][1])
+        if 'ages' in spec:
+            conditions &= (chunk['Age'] >= spec['ages'][0]) & (chunk['Age'] < spec['ages'][1])
+        for column, values in filters.items():
+            conditions &= chunk[column].isin(values)
+        chunks.append(chunk.loc[conditions])
+    data = pd.concat(chunks, ignore_index=True)
+
+    if len(group_by) > 0:
+        value_columns = [column for column in (columns or data.columns) if column not in group_by]
+        data = data.groupby(group_by, as_index=False)[value_columns].agg(spec.get('aggregation', 'sum'))
+    elif columns is not None:
+        data = data[columns]
+    return data
+
+
+def write_extracts(output_dir, spec):
+    directory = os.path.join(output_dir, EXTRACT_DIRECTORY)
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    for name, extract_spec in spec.items():
+        data = timing(lambda: extract(os.path.join(output_dir, extract_spec['source']), extract_spec),
+                      message='Extract %s: ' % name)
+        data.to_csv(os.path.join(directory, '%s.csv' % name), index=False)
+
+
 def main(output_dir):
+    record_resource_usage(output_dir=output_dir)
     print("Hello from Python!")
     print("Started Python post processing  @ " + time.asctime())
     print("Current working directory is: " + os.getcwd())
 
+    if ref_config is None and extraction_spec is None:
+        raise FileNotFoundError("Could not load post-processing configuration file: post_channel_config.json")
+    if extraction_spec is not None:
+        write_extracts(output_dir=output_dir, spec=extraction_spec)
+    if ref_config is None:
+        print("Finished Python post processing @ " + time.asctime())
+        return
+
     filename = os.path.join(output_dir, by_age_and_gender_filename)
     if not os.path.isfile(filename):
         print("!!!! Can't open " + filename + "!")
@@ -304,7 +401,7 @@ def main(output_dir):
 
     reports = get_reports(data)
 
-    data.columns = map(lambda s: s.strip().replace(' ', '_').replace('(', '').replace(')', ''), data.columns)
+    data.columns = map(normalize_column_name, data.columns)
     node_ids = sorted([int(node_id) for node_id in data.NodeId.unique()])
 
     post_process_dir = 'post_process'
@@ -7,12 +7,15 @@ Reference data without provincial stratification should have a 'Province' column
 """
 
 import math
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import matplotlib.pyplot as plt
+import numpy as np
 import operator
 import pandas as pd
-import re
 import sys
 
 from matplotlib import collections as mc
@@ -22,6 +25,7 @@ from emodpy_workflow.lib.analysis.base_distribution import BaseDistribution
 from emodpy_workflow.lib.analysis.data_frame_wrapper import DataFrameWrapper
 from emodpy_workflow.lib.analysis.population_obs import PopulationObs
 from emodpy_workflow.lib.utils.analysis import model_population_in_year
+from emodpy_workflow.lib.utils.figure_renderer import FIGURE_FORMATS, FigureRenderer, new_figure
 from emodpy_workflow.lib.utils.project_data import parse_ingest_data_from_xlsm
 from emodpy_workflow.lib.utils.runtime import load_frame
 
@@ -31,6 +35,10 @@ TICK_SPACING = 3
 
 ALLOWED_GENDERS = {'Male', 'Female', 'Both'}
 
+# envelope mode: the quantiles of the sims shaded as (outer, inner) bands around the median
+ENVELOPE_QUANTILES = [0.025, 0.25, 0.5, 0.75, 0.975]
+ENVELOPE_INDEX = ['AgeBin', 'Province', 'Gender', 'Year']
+
 
 class Colors:
     male = 'blue'
@@ -76,6 +84,17 @@ def scale_to_census(df, pop_df, census_population, census_year, census_min_age,
     return df
 
 
+def get_axis(figure_dict, age_bin, provinces, headless=False):
+    # Try to obtain the axis to add data to and create it on the fly if it does not exist
+    if age_bin not in figure_dict:
+        # headless figures are not tracked by pyplot (and cannot be shown), see FigureRenderer
+        subplots = new_figure if headless else plt.subplots
+        figure, axis = subplots(max(len(provinces), 2), 1, sharex=True, sharey=True,
+                                figsize=(FIG_WIDTH, FIG_HEIGHT))
+        figure_dict[age_bin] = {'figure': figure, 'axis': axis}
+    return figure_dict[age_bin]['axis']
+
+
 def make_and_plot_collection(groups, provinces, figure_dict, channel, **kwargs):
     for group_tuple, data in groups:
         age_bin, province, gender = group_tuple
@@ -86,16 +105,8 @@ def make_and_plot_collection(groups, provinces, figure_dict, channel, **kwargs):
         marker = kwargs.get('marker', '.')
         linewidth = kwargs.get('linewidth', 0.5)
 
-        # Try to obtain the axis to add data to and create it on the fly if it does not exist
-        if age_bin in figure_dict:
-            fd = figure_dict[age_bin]
-        else:
-            figure, axis = plt.subplots(max(len(provinces), 2), 1, sharex=True, sharey=True,
-                                        figsize=(FIG_WIDTH, FIG_HEIGHT))
-            figure_dict[age_bin] = {'figure': figure, 'axis': axis}
-            fd = figure_dict[age_bin]
-
-        axis = fd['axis']
+        axis = get_axis(figure_dict=figure_dict, age_bin=age_bin, provinces=provinces,
+                        headless=kwargs.get('headless', False))
         province_index = provinces.index(province)
 
         # get simulation data and plot it
@@ -111,6 +122,125 @@ def make_and_plot_collection(groups, provinces, figure_dict, channel, **kwargs):
             axis[province_index].add_collection(lc)
 
 
+class SimulationEnvelope:
+    """
+    Accumulates one channel of many sims, one sim at a time, keeping only its values per (AgeBin, Province, Gender,
+    Year), so that quantiles across all sims can be computed in one vectorized step.
+    """
+
+    def __init__(self, channel='Result'):
+        self.channel = channel
+        self.index = None  # the (AgeBin, Province, Gender, Year) index of the first sim
+        self.values = []  # per sim, its channel values on self.index (or a Series, if its index differs)
+
+    @property
+    def n_sims(self):
+        return len(self.values)
+
+    def add(self, df):
+        series = df.groupby(ENVELOPE_INDEX)[self.channel].mean()
+        if self.index is None:
+            self.index = series.index
+        if series.index.equals(self.index):
+            self.values.append(series.to_numpy(dtype=float))
+        else:
+            self.values.append(series)
+
+    def quantiles(self, quantiles=None):
+        """
+        Computes quantiles of the channel across the accumulated sims.
+
+        Args:
+            quantiles: the quantiles to compute. Default: ENVELOPE_QUANTILES
+
+        Returns: a dataframe indexed by (AgeBin, Province, Gender, Year) with one column per quantile. A sim missing a
+            (AgeBin, Province, Gender, Year) is ignored in its quantiles.
+        """
+        quantiles = ENVELOPE_QUANTILES if quantiles is None else quantiles
+        if all(isinstance(values, np.ndarray) for values in self.values):
+            index, values = self.index, np.column_stack(self.values)
+        else:
+            aligned = pd.concat([pd.Series(values, index=self.index) if isinstance(values, np.ndarray) else values
+                                 for values in self.values], axis=1)
+            index, values = aligned.index, aligned.to_numpy(dtype=float)
+        return pd.DataFrame(np.nanquantile(values, quantiles, axis=1).T, index=index, columns=quantiles)
+
+
+def make_and_plot_envelope(envelope, provinces, figure_dict, quantiles=None, headless=False):
+    """
+    Draws the median of the sims of an envelope as a line, with the outer and inner quantile ranges around it as
+    shaded bands, per (AgeBin, Province, Gender).
+
+    Args:
+        envelope: a SimulationEnvelope of the sims
+        provinces: list of provinces available (needed for subplot identification)
+        figure_dict: dict of figures and axes for plotting on
+        quantiles: an odd number of increasing quantiles, shaded as nested bands around the middle (median) one.
+            Default: ENVELOPE_QUANTILES
+        headless: whether to create figures for rendering without a display (see get_axis())
+
+    Returns: no return
+    """
+    quantiles = ENVELOPE_QUANTILES if quantiles is None else quantiles
+    df = envelope.quantiles(quantiles=quantiles)
+    n_bands = len(quantiles) // 2
+    for group_tuple, data in df.groupby(level=['AgeBin', 'Province', 'Gender']):
+        age_bin, province, gender = group_tuple
+        if province in [1, '1']:  # kludgy fix for single-node simulations
+            continue
+        color = get_gendered_color(gender=gender)
+        axis = get_axis(figure_dict=figure_dict, age_bin=age_bin, provinces=provinces,
+                        headless=headless)[provinces.index(province)]
+        years = data.index.get_level_values('Year')
+        for band in range(n_bands):
+            axis.fill_between(years, data[quantiles[band]], data[quantiles[-band - 1]], color=color,
+                              alpha=0.15 * (band + 1), linewidth=0)
+        axis.plot(years, data[quantiles[n_bands]], color=color, linewidth=1.0,
+                  marker='.' if len(years) == 1 else None)
+
+
+class LineBatch:
+    """
+    Collects the lines (and single points) of many sims per axis, then draws all lines of an axis as one
+    LineCollection (and all points as one scatter). Looks the same as drawing each sim group separately with
+    make_and_plot_collection(), with a fraction of the matplotlib artists.
+    """
+
+    def __init__(self):
+        self.segments = {}  # (age_bin, province): list of (n, 2) arrays of (Year, value)
+        self.colors = {}  # (age_bin, province): list of segment colors
+        self.points = {}  # (age_bin, province): list of (Year, value, color)
+
+    def add(self, groups, channel):
+        for group_tuple, data in groups:
+            age_bin, province, gender = group_tuple
+            if province in [1, '1']:  # kludgy fix for single-node simulations
+                continue
+            key = (age_bin, province)
+            color = get_gendered_color(gender=gender)
+            if len(data.index) == 1:
+                # a single data element
+                self.points.setdefault(key, []).append((data['Year'].iloc[0], data[channel].iloc[0], color))
+            else:
+                # a line of data
+                self.segments.setdefault(key, []).append(np.column_stack([data['Year'].to_numpy(dtype=float),
+                                                                          data[channel].to_numpy(dtype=float)]))
+                self.colors.setdefault(key, []).append(color)
+
+    def draw(self, provinces, figure_dict, alpha=1.0, linewidth=0.5, marker='.', headless=False):
+        for key in sorted(set(self.segments) | set(self.points), key=str):
+            age_bin, province = key
+            axis = get_axis(figure_dict=figure_dict, age_bin=age_bin, provinces=provinces,
+                            headless=headless)[provinces.index(province)]
+            if key in self.segments:
+                lc = mc.LineCollection(self.segments[key], linewidths=linewidth, colors=self.colors[key])
+                lc.set_alpha(alpha)
+                axis.add_collection(lc)
+            if key in self.points:
+                years, values, colors = zip(*self.points[key])
+                axis.scatter(years, values, c=list(colors), marker=marker, alpha=alpha, s=15 ** 2)
+
+
 def make_and_plot_bxp(groups, genders, provinces, figure_dict, channel, lower_channel, upper_channel):
     """
     Make a center-point and whisker plot (subset of a boxplot) for reference data.
@@ -157,15 +287,80 @@ def make_and_plot_bxp(groups, genders, provinces, figure_dict, channel, lower_ch
                                  capprops=drawing_props)
 
 
+def load_sim_results(fn, pop_filename, node_map, time_conditions, census_population, census_year, census_min_age,
+                     census_max_age, verbose=False):
+    """
+    Reads a sim data file, keeping its data within the time conditions, and (if a Population file is given) scales
+    its Result to the census population.
+
+    Returns: the sim data dataframe, or None if the sim data file is missing
+    """
+    try:
+        results = read_sim_data(fn, node_map=node_map).filter(conditions=time_conditions)._dataframe
+    except FileNotFoundError:
+        print(f'File missing, post processing may have failed or is in-process for a sim: {fn}')
+        return None
+
+    # scale Results to census data
+    if pop_filename is not None:
+        pop = read_sim_data(pop_filename, node_map=node_map)._dataframe
+        results = scale_to_census(results, pop, census_population, census_year, census_min_age, census_max_age,
+                                  verbose=verbose)
+    return results
+
+
+def read_sim_results(sim_filenames, pop_filenames, n_readers=8, **kwargs):
+    """
+    Reads sim data files (and their Population files, if given) concurrently with load_sim_results(), keeping at most
+    a few files per reader in memory at a time.
+
+    Args:
+        sim_filenames: the sim data files to read
+        pop_filenames: the Population files to scale each sim data file with, or None to not scale
+        n_readers: the number of files to read concurrently
+        **kwargs: the other arguments of load_sim_results()
+
+    Returns: an iterator of (sim data filename, sim data dataframe or None if the file is missing), in file order
+    """
+    pop_filenames = [None] * len(sim_filenames) if pop_filenames is None else pop_filenames
+    with ThreadPoolExecutor(max_workers=n_readers) as executor:
+        pending = deque()
+        for fn, pop_filename in zip(sim_filenames, pop_filenames):
+            pending.append((fn, executor.submit(load_sim_results, fn, pop_filename=pop_filename, **kwargs)))
+            if len(pending) >= 2 * n_readers:
+                fn, future = pending.popleft()
+                yield fn, future.result()
+        while len(pending) > 0:
+            fn, future = pending.popleft()
+            yield fn, future.result()
+
+
+def plot_provinces(reference_provinces, sim_provinces):
+    # determine the union of sim and reference provinces (their intersection can be empty, all, or between)
+    provinces = list(set(reference_provinces).union(set(sim_provinces)))
+
+    # putting aggregated node at the end (RHS) of all plots
+    if PopulationObs.AGGREGATED_PROVINCE in provinces:
+        provinces.remove(PopulationObs.AGGREGATED_PROVINCE)
+    provinces.append(PopulationObs.AGGREGATED_PROVINCE)
+    return provinces
+
+
 def generate_plot(reference, sim_filenames, pop_filenames, node_map, channel, census_population, census_year,
                   census_min_age, census_max_age, scaling, distribution, selected_genders,
-                  start_year=None, end_year=None, verbose=False):
+                  start_year=None, end_year=None, verbose=False, envelope=False, n_highlighted=0, n_readers=8,
+                  output_dir='.', formats=None, renderer=None):
+    # with a renderer (a FigureRenderer), figures are built without a display and written by it; otherwise they are
+    # built with pyplot (for showing) and written here
+    headless = renderer is not None
+    formats = ['png'] if formats is None else formats
+
     # two-tailed two sigma error bars, p = 0.02275 and 0.97725 applied regardless of distribution
     p_low = (1 - 0.9545) / 2
     p_high = 1 - p_low
 
-    p_low_channel = reference.add_percentile_values(channel=channel, distribution=distribution, p=p_low)[0]
-    p_high_channel = reference.add_percentile_values(channel=channel, distribution=distribution, p=p_high)[0]
+    p_low_channel, p_high_channel = reference.add_percentile_values_batch(channel=channel, distribution=distribution,
+                                                                          ps=[p_low, p_high])
 
     # data always has provinces now; even if just the 'All' province
     reference_provinces = reference.get_provinces()
@@ -198,51 +393,56 @@ def generate_plot(reference, sim_filenames, pop_filenames, node_map, channel, ce
     # used for to group data for plotting
     multi_index = ['AgeBin', 'Province', 'Gender']
 
+    # sims are accumulated as they are read and drawn at the end: either as one line per sim, batched per axis, or
+    # (in envelope mode) as quantile bands plus a few highlighted sims
+    sim_lines = LineBatch() if not envelope else None
+    sim_envelope = SimulationEnvelope() if envelope else None
+    highlighted = []
+    sim_provinces = set()
+
     n_sims = len(sim_filenames)
     n = 1
     figure_dict = {}
     all_years = set()  # we will use this for setting year ticks
     missing_files = 0
-    for i in range(len(sim_filenames)):
-        fn = sim_filenames[i]
-
+    sim_results = read_sim_results(sim_filenames, pop_filenames=pop_filenames if scaling else None,
+                                   n_readers=n_readers, node_map=node_map, time_conditions=time_conditions,
+                                   census_population=census_population, census_year=census_year,
+                                   census_min_age=census_min_age, census_max_age=census_max_age, verbose=verbose)
+    for fn, results in sim_results:
         if verbose:
             print('Processing sim file %d/%d ...' % (n, n_sims))
             sys.stdout.flush()
-        try:
-            results = read_sim_data(fn, node_map=node_map).filter(conditions=time_conditions)
-        except FileNotFoundError:
-            print(f'File missing, post processing may have failed or is in-process for a sim: {fn}')
+        n += 1
+        if results is None:
             missing_files += 1
             continue
-        all_years = all_years.union(set(results.get_years()))
-        results = results._dataframe
-
-        # scale Results to census data
-        if scaling:
-            pop_filename = pop_filenames[i]
-            pop = read_sim_data(pop_filename, node_map=node_map)._dataframe
-            results = scale_to_census(results, pop, census_population, census_year, census_min_age, census_max_age,
-                                      verbose=verbose)
-
-        # determine the union of sim and reference provinces (their intersection can be empty, all, or between)
-        sim_provinces = results['Province'].unique()  # ck4, define
-        provinces = list(set(reference_provinces).union(set(sim_provinces)))
-
-        # putting aggregated node at the end (RHS) of all plots
-        if PopulationObs.AGGREGATED_PROVINCE in provinces:
-            provinces.remove(PopulationObs.AGGREGATED_PROVINCE)
-        provinces.append(PopulationObs.AGGREGATED_PROVINCE)
-
-        groups = results[results['Gender'].isin(genders)].groupby(multi_index)
-        make_and_plot_collection(groups=groups, provinces=provinces,
-                                 channel='Result', figure_dict=figure_dict,
-                                 alpha=0.1, linewidth=0.5, marker='.')
-        n += 1
+        all_years = all_years.union(set(results['Year'].unique()))
+        results = results[results['Gender'].isin(genders)]
+        sim_provinces.update(results['Province'].unique())
+
+        if sim_envelope is None:
+            sim_lines.add(groups=results.groupby(multi_index), channel='Result')
+        else:
+            sim_envelope.add(results)
+            if len(highlighted) < n_highlighted:
+                highlighted.append(results)
 
     if missing_files > 0:
         print(f'{missing_files} missing files detected, continuing with the data successfully retrieved...')
 
+    provinces = plot_provinces(reference_provinces=reference_provinces, sim_provinces=sim_provinces)
+    if sim_envelope is None:
+        sim_lines.draw(provinces=provinces, figure_dict=figure_dict, alpha=0.1, linewidth=0.5, marker='.',
+                       headless=headless)
+    elif sim_envelope.n_sims > 0:
+        print(f'Plotting quantile envelope of {sim_envelope.n_sims} sims...')
+        make_and_plot_envelope(envelope=sim_envelope, provinces=provinces, figure_dict=figure_dict, headless=headless)
+        for results in highlighted:
+            make_and_plot_collection(groups=results.groupby(multi_index), provinces=provinces,
+                                     channel='Result', figure_dict=figure_dict,
+                                     alpha=0.8, linewidth=1.0, marker='.', headless=headless)
+
     # independent/year axis ticks
     ticks_start = math.ceil(min(all_years) / TICK_SPACING) * TICK_SPACING
     ticks_end = math.ceil(
@@ -282,7 +482,12 @@ def generate_plot(reference, sim_filenames, pop_filenames, node_map, channel, ce
                 axis[province_index].legend(handles=patches, loc='upper right')
 
         figure = fd['figure']
-        figure.savefig('%s/%s_%s.png' % (args.output_dir, channel, age_bin.replace(':', '-')), bbox_inches='tight')
+        path = '%s/%s_%s' % (output_dir, channel, age_bin.replace(':', '-'))
+        if renderer is None:
+            for image_format in formats:
+                figure.savefig(f'{path}.{image_format}', bbox_inches='tight')
+        else:
+            renderer.submit(figure=figure, path=path)
 
 
 def detect_uncertainty_channel(dfw, channel):
@@ -295,103 +500,156 @@ def detect_uncertainty_channel(dfw, channel):
     return possible_channels[0]
 
 
-def main(args):
-    validate_args(args=args)
-    plt.tight_layout()
+def channel_filenames(channel_name, downloaded_filepaths):
+    # downloaded files of a channel are in a directory named after it (see DownloadAnalyzerByExperiment)
+    return sorted([fn for fn in downloaded_filepaths if Path(fn).parent.name == channel_name
+                   and Path(fn).suffix == '.csv'])
 
-    # get reference data and site info from ingest form
-    params, site_info, reference, analyzers, channels = parse_ingest_data_from_xlsm(filename=args.frame.ingest_form_path)
 
-    obs_data_channels_by_name = {channel.name for channel in channels}
-    analyzer_channels_by_name = {analyzer['channel'] for analyzer in analyzers}
-    valid_channel_names = obs_data_channels_by_name.union(analyzer_channels_by_name)
-    if args.channel not in valid_channel_names:
-        valid_str = ', '.join(valid_channel_names)
-        raise MissingChannelException(f"\nChannel: {args.channel} is invalid.\n"
-                                      f"Channels must have an Obs sheet and 1+ associated analyzer(s) to be valid.\n"
-                                      f"Current valid channels in current frame ingest form: {valid_str}")
-    # now grab the verified user-selected channel for use
-    channel = {channel.name: channel for channel in channels}[args.channel]
-
-    # obtain output data file to get plotting data from
-    output_file_root = Path('output', 'post_process')
+def select_channel_files(channel, downloaded_filepaths, samples_file=None):
+    """
+    Selects the downloaded files of a channel and (if it needs population scaling) the Population files aligned with
+    them.
 
-    output_filename = f"{args.channel}.csv"
-    output_file_paths = [Path(output_file_root, output_filename)]
+    Returns: a tuple of (channel filenames, Population filenames)
+    """
+    result_filenames = channel_filenames(channel_name=channel.name, downloaded_filepaths=downloaded_filepaths)
+    population_filenames = channel_filenames(channel_name='Population', downloaded_filepaths=downloaded_filepaths)
+    if len(result_filenames) == 0:
+        raise Exception(f"No simulation files were downloaded. Is the provided samples file empty?: "
+                        f"{samples_file}")
 
+    # paranoid checks: if we are scaling, ensure that the sort order above has properly aligned the two lists of files
+    if channel.needs_pop_scaling:
+        if len(result_filenames) != len(population_filenames):
+            raise Exception(f"Failed to obtain 1-1 counts of channel: {channel.name} and Population files for scaling.")
+        for i, res_fn in enumerate(result_filenames):
+            res_path = Path(res_fn).absolute()
+            pop_path = Path(population_filenames[i]).absolute()
+
+            res_exp_id = res_path.parent.parent.name
+            pop_exp_id = pop_path.parent.parent.name
+            if res_exp_id != pop_exp_id:
+                raise Exception(f"Failed to properly align channel: {channel.name} and Population files (experiment id check).")
+
+            res_name_parts = res_path.name.split('_')[1:]
+            pop_name_parts = pop_path.name.split('_')[1:]
+            if res_name_parts != pop_name_parts:
+                raise Exception(f"Failed to properly align channel: {channel.name} and Population files (filename check)")
+    return result_filenames, population_filenames
+
+
+def plot_channel(reference, channel, result_filenames, population_filenames, site_info, output_dir, genders,
+                 start_year=None, end_year=None, envelope=False, n_highlighted=0, n_readers=8, verbose=False,
+                 formats=None, renderer=None):
+    # plots one channel of the downloaded sims against its reference data
     uncertainty_channel = detect_uncertainty_channel(dfw=reference, channel=channel)
-    reference = reference.filter(keep_only=[args.channel, uncertainty_channel])
+    reference = reference.filter(keep_only=[channel.name, uncertainty_channel])
 
     distribution = BaseDistribution.from_uncertainty_channel(uncertainty_channel=uncertainty_channel)
-    distribution.prepare(dfw=reference, channel=args.channel)
+    distribution.prepare(dfw=reference, channel=channel.name)
 
-    # add in Population for computing the pop scaling factor
-    if channel.needs_pop_scaling:
-        print('Pop scaling will occur')
-        output_file_paths.append(Path(output_file_root, 'Population.csv'))
-        output_file_paths = list(set(output_file_paths))  # just in case the channel IS Population, no need to download twice
-    else:
-        print('Pop scaling will NOT occur')
+    generate_plot(reference, result_filenames, population_filenames, node_map=site_info['node_map'],
+                  channel=channel.name, census_population=site_info['census_population'],
+                  census_year=site_info['census_year'], census_min_age=site_info['census_age_bin'].start,
+                  census_max_age=site_info['census_age_bin'].end, scaling=channel.needs_pop_scaling,
+                  distribution=distribution, start_year=start_year, end_year=end_year, verbose=verbose,
+                  selected_genders=genders, envelope=envelope, n_highlighted=n_highlighted, n_readers=n_readers,
+                  output_dir=output_dir, formats=formats, renderer=renderer)
 
-    # Download the requisite files using the download script
+
+def download_args(args, output_file_paths):
+    """
+    The download command arguments to download the files to plot.
+
+    Args:
+        args: the plot command arguments
+        output_file_paths: the simulation output files to download
+
+    Returns: a Namespace of download command arguments
+    """
     from argparse import Namespace
-    from emodpy_workflow.scripts.download import main as download
+    from emodpy_workflow.scripts.download import DEFAULTS as DOWNLOAD_DEFAULTS
     dl_args = {
+        **DOWNLOAD_DEFAULTS,
         'files': [str(p) for p in output_file_paths],
         'platform': args.platform,
         'output_dir': args.output_dir,
-        'receipt_file': None,
-        'samples_file': None,
-        'suite_id': None,
-        'experiment_id': None
+        'cache_dir': os.path.join(args.output_dir, 'download_cache') if args.cache_dir is None else args.cache_dir
     }
     # pass information regarding the selected plot mode to downloader to get the right information
     if args.samples_file is not None:
         dl_args['samples_file'] = args.samples_file
     elif args.experiment_id is not None:
         dl_args['experiment_id'] = args.experiment_id
-    dl_args = Namespace(**dl_args)
-    downloaded_filepaths = download(args=dl_args)
-
-    # identify the selected channel and (if downloaded) Population data files
-    regex = re.compile(rf"^{channel.name}.*\.csv$")
-    result_filenames = sorted([fn for fn in downloaded_filepaths if regex.match(Path(fn).name)])
-    regex = re.compile(r"^Population.*\.csv$")
-    population_filenames = sorted([fn for fn in downloaded_filepaths if regex.match(Path(fn).name)])
-    if len(result_filenames) == 0:
-        raise Exception(f"No simulation files were downloaded. Is the provided samples file empty?: "
-                        f"{args.samples_file}")
+    return Namespace(**dl_args)
 
-    # paranoid checks: if we are scaling, ensure that the sort order above has properly aligned the two lists of files
-    if channel.needs_pop_scaling:
-        if len(result_filenames) != len(population_filenames):
-            raise Exception(f"Failed to obtain 1-1 counts of channel: {args.channel} and Population files for scaling.")
-        for i, res_fn in enumerate(result_filenames):
-            res_path = Path(res_fn).absolute()
-            pop_path = Path(population_filenames[i]).absolute()
 
-            res_exp_id = res_path.parent.parent.name
-            pop_exp_id = pop_path.parent.parent.name
-            if res_exp_id != pop_exp_id:
-                raise Exception(f"Failed to properly align channel: {args.channel} and Population files (experiment id check).")
+def main(args):
+    validate_args(args=args)
 
-            res_name_parts = res_path.name.split('_')[1:]
-            pop_name_parts = pop_path.name.split('_')[1:]
-            if res_name_parts != pop_name_parts:
-                raise Exception(f"Failed to properly align channel: {args.channel} and Population files (filename check)")
+    # get reference data and site info from ingest form
+    params, site_info, reference, analyzers, channels = parse_ingest_data_from_xlsm(filename=args.frame.ingest_form_path)
 
-    min_age = site_info['census_age_bin'].start
-    max_age = site_info['census_age_bin'].end
-    node_map = site_info['node_map']
-    # add the non-aggregated node to the node map
-    node_map[PopulationObs.AGGREGATED_NODE] = PopulationObs.AGGREGATED_PROVINCE
+    obs_data_channels_by_name = {channel.name for channel in channels}
+    analyzer_channels_by_name = {analyzer['channel'] for analyzer in analyzers}
+    if args.all_channels:
+        # every channel with an Obs sheet and 1+ associated analyzer(s)
+        plot_channels = [channel for channel in channels if channel.name in analyzer_channels_by_name]
+        if len(plot_channels) == 0:
+            raise MissingChannelException('\nNo valid channels in current frame ingest form.\n'
+                                          'Channels must have an Obs sheet and 1+ associated analyzer(s) to be valid.')
+    else:
+        valid_channel_names = obs_data_channels_by_name.union(analyzer_channels_by_name)
+        if args.channel not in valid_channel_names:
+            valid_str = ', '.join(valid_channel_names)
+            raise MissingChannelException(f"\nChannel: {args.channel} is invalid.\n"
+                                          f"Channels must have an Obs sheet and 1+ associated analyzer(s) to be valid.\n"
+                                          f"Current valid channels in current frame ingest form: {valid_str}")
+        # now grab the verified user-selected channel for use
+        plot_channels = [{channel.name: channel for channel in channels}[args.channel]]
+
+    # obtain output data files to get plotting data from; all channels are downloaded together
+    output_file_root = Path('output', 'post_process')
+    output_file_paths = [Path(output_file_root, f"{channel.name}.csv") for channel in plot_channels]
+
+    # add in Population for computing the pop scaling factor
+    if any(channel.needs_pop_scaling for channel in plot_channels):
+        print('Pop scaling will occur')
+        population_path = Path(output_file_root, 'Population.csv')
+        if population_path not in output_file_paths:  # just in case a channel IS Population, no need to download twice
+            output_file_paths.append(population_path)
+    else:
+        print('Pop scaling will NOT occur')
+
+    # Download the requisite files using the download script
+    from emodpy_workflow.scripts.download import main as download
+    downloaded_filepaths = download(args=download_args(args=args, output_file_paths=output_file_paths))
 
-    generate_plot(reference, result_filenames, population_filenames, node_map=node_map, channel=args.channel,
-                  census_population=site_info['census_population'], census_year=site_info['census_year'],
-                  census_min_age=min_age, census_max_age=max_age, scaling=channel.needs_pop_scaling,
-                  distribution=distribution, start_year=args.start_year, end_year=args.end_year, verbose=args.verbose,
-                  selected_genders=args.genders)
-    plt.show()
+    # add the non-aggregated node to the node map
+    site_info['node_map'][PopulationObs.AGGREGATED_NODE] = PopulationObs.AGGREGATED_PROVINCE
+
+    plots = []
+    for channel in plot_channels:
+        result_filenames, population_filenames = select_channel_files(channel=channel,
+                                                                      downloaded_filepaths=downloaded_filepaths,
+                                                                      samples_file=args.samples_file)
+        plots.append({'reference': reference, 'channel': channel, 'result_filenames': result_filenames,
+                      'population_filenames': population_filenames, 'site_info': site_info,
+                      'output_dir': args.output_dir, 'genders': args.genders, 'start_year': args.start_year,
+                      'end_year': args.end_year, 'envelope': args.envelope, 'n_highlighted': args.highlight,
+                      'n_readers': args.readers, 'verbose': args.verbose, 'formats': args.formats})
+
+    if args.headless:
+        # figures are built here, channel by channel, and written without a display by a pool of processes
+        with FigureRenderer(formats=args.formats, max_workers=args.jobs, bbox_inches='tight') as renderer:
+            for plot in plots:
+                plot_channel(**plot, renderer=renderer)
+        print(f'Wrote {len(renderer.paths)} figure files to: {args.output_dir}')
+    else:
+        plt.tight_layout()
+        plot_channel(**plots[0])
+        plt.show()
 
 
 DEFAULTS = {
@@ -400,7 +658,13 @@ DEFAULTS = {
     'experiment_id': None,
     'samples_file': None,
     'start_year': None,
-    'end_year': None
+    'end_year': None,
+    'envelope': False,
+    'highlight': 0,
+    'readers': 8,
+    'cache_dir': None,
+    'jobs': None,
+    'formats': 'png'
 }
 
 
@@ -415,8 +679,20 @@ def parse_args():
     parser.add_argument('--exp-id', dest='experiment_id', type=str, default=DEFAULTS['experiment_id'],
                         help='Experiment id from which to gather simulations for plotting '
                              '(Mutually exclusive with -s).')
-    parser.add_argument('-c', '--channel', dest='channel', type=str, required=True,
-                        help='Data channel with ingest form obs data and associated analyzer(s) to plot (Required).')
+    parser.add_argument('-c', '--channel', dest='channel', type=str, default=None,
+                        help='Data channel with ingest form obs data and associated analyzer(s) to plot '
+                             '(Mutually exclusive with --all-channels).')
+    parser.add_argument('-a', '--all-channels', dest='all_channels', action='store_true', default=False,
+                        help='Plot every channel with ingest form obs data and associated analyzer(s), downloading '
+                             'their files together. Implies --headless (Mutually exclusive with -c).')
+    parser.add_argument('--headless', dest='headless', action='store_true', default=False,
+                        help='Write the figures in parallel without displaying them, e.g. on machines without a '
+                             'display (Default: display the figures after writing them).')
+    parser.add_argument('-j', '--jobs', dest='jobs', type=int, default=DEFAULTS['jobs'],
+                        help='With --headless, number of processes to write figures with (Default: number of CPUs).')
+    parser.add_argument('--formats', dest='formats', type=str, default=DEFAULTS['formats'],
+                        help=f"Comma-separated list of image formats to write figures in "
+                             f"(Default: {DEFAULTS['formats']}). Available formats: {', '.join(FIGURE_FORMATS)}")
     parser.add_argument('-g', '--genders', dest='genders', type=str, default=DEFAULTS['genders'],
                         help=f"Comma-separated list of gender(s) to plot (Default: {DEFAULTS['genders']}). "
                              f"Available genders: {', '.join(ALLOWED_GENDERS)}")
@@ -428,6 +704,17 @@ def parse_args():
                         help='Plot data starting at this inclusive year (Default: beginning of all data).')
     parser.add_argument('--end_year', dest='end_year', type=float, default=DEFAULTS['end_year'],
                         help='Plot data through this inclusive year (Default: end of all data).')
+    parser.add_argument('--envelope', dest='envelope', action='store_true', default=DEFAULTS['envelope'],
+                        help='Plot the median and 50%% and 95%% ranges of the sims as shaded bands instead of one '
+                             'line per sim. Much faster for many sims (Default: one line per sim).')
+    parser.add_argument('--highlight', dest='highlight', type=int, default=DEFAULTS['highlight'],
+                        help=f"With --envelope, also plot this many sims as lines (Default: {DEFAULTS['highlight']}).")
+    parser.add_argument('--readers', dest='readers', type=int, default=DEFAULTS['readers'],
+                        help=f"Number of sim data files to read concurrently (Default: {DEFAULTS['readers']}).")
+    parser.add_argument('--cache-dir', dest='cache_dir', type=str, default=DEFAULTS['cache_dir'],
+                        help='Directory of a local cache of downloaded simulation files, reused by later plotting of '
+                             'the same simulations and shareable between output directories '
+                             '(Default: download_cache in the output directory).')
     parser.add_argument('-v', '--verbose', dest='verbose', action='store_true',
                         help='Print more information during processing.')
 
@@ -435,12 +722,16 @@ def parse_args():
     args = parser.parse_args()
     args.frame = load_frame(frame_name=args.frame)
     args.genders = args.genders.strip().split(',')
+    args.formats = args.formats.strip().split(',')
+    args.headless = args.headless or args.all_channels
     return args
 
 
 def validate_args(args):
     if not ((args.experiment_id is not None) ^ (args.samples_file is not None)):
         raise Exception("Must provide an experiment_id (--exp-id) or a samples file (-s) but not both.")
+    if not ((args.channel is not None) ^ args.all_channels):
+        raise Exception("Must provide a channel (-c) or plot all channels (--all-channels) but not both.")
 
 
 if __name__ == '__main__':
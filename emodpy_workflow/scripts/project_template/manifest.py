@@ -71,9 +71,29 @@ asset_collection_of_container = None
 #         - None for no post-processing
 #
 # in_processing_path
-#     - Not used in EMOD-HIV.  Set to None.
+#     - Indicates the dtk_in_process.py script to be run by the simulation every timestep.
+#     - This parameter can have the following values:
+#         - 'standard' to use the built-in early-termination in-processor. It ends
+#         simulations whose national prevalence is far from the ingest form reference data (see
+#         early_termination_tolerance) so they do not run to completion. Such simulations are scored at
+#         the minimum likelihood. Requires post_processing_path.
+#         - path to a custom in-processor
+#         - None for no in-processing
+#
+# early_termination_tolerance
+#     - Multiplicative tolerance around reference prevalence values used by the standard in-processor.
+#     e.g. 3.0 ends a simulation if a prevalence is below a third or above three times the reference value.
+#
+# extraction_spec_path
+#     - Path to a json file defining compact extracts of simulation reports (selected columns, year and age
+#     ranges, value filters, and aggregation) for the standard post-processor to write to output/extract/NAME.csv .
+#     Downloading these (download -x NAME) instead of full reports greatly reduces transfer volume.
+#     Requires post_processing_path = 'standard'.
+#     - None for no extracts
 ###############################################################################
 
 post_processing_path = None  # 'standard'
 pre_processing_path = None
 in_processing_path = None
+early_termination_tolerance = 3.0
+extraction_spec_path = None
@@ -9,64 +9,169 @@ ROULETTE = 'roulette'
 BEST = 'best'
 RESAMPLING_METHODS = [ROULETTE, BEST]
 
+SAMPLE_INDEX = '__sample_index__'
+
 
 class UnknownResampleMethodException(Exception):
     pass
 
 
-def set_parameterization_ids(samples):
-    for index in range(len(samples)):
-        samples[index].parameterization_id = index
-    return samples
-
-
-def get_samples_by_likelihood(calibration_dir):
-    # obtain samples from the calibration sorted by likelihood
+def iteration_history(iteration):
+    """
+    Tabulates the parameter sets of one calibration iteration, as IterationState.get_parameter_sets_with_likelihoods()
+    but as columns instead of ParameterSet objects.
+
+    Args:
+        iteration: an IterationState
+
+    Returns: a dataframe with one row per simulation (replicate) of each parameter set, with the parameter columns
+        followed by iteration_number, run_number, sim_id, likelihood and the likelihood_* sub-likelihood columns
+    """
+    samples = pd.DataFrame(iteration.samples_for_this_iteration)  # a list of dicts or a dict of lists
+    likelihoods = iteration.results['total']
+    if len(likelihoods) != len(samples):
+        raise Exception('Inconsistent iteration data. \'total\' and \'samples_for_this_iteration\' '
+                        'are not the same length')
+    sample_indices = np.arange(len(samples))
+
+    simulations = pd.DataFrame({
+        SAMPLE_INDEX: [simulation[SAMPLE_INDEX] for simulation in iteration.simulations.values()],
+        'iteration_number': iteration.iteration,
+        'run_number': [simulation['Run_Number'] for simulation in iteration.simulations.values()],
+        'sim_id': list(iteration.simulations.keys())
+    })
+    missing = np.setdiff1d(sample_indices, simulations[SAMPLE_INDEX].to_numpy())
+    if len(missing) > 0:
+        raise Exception(f'There should be at least one simulation associated with sample_index: {missing[0]}. '
+                        f'There are none.')
+
+    scores = pd.DataFrame({'likelihood': np.asarray(likelihoods, dtype=float)})
+    for name, values in iteration.results.items():
+        if name != 'total':
+            scores[f'likelihood_{name}'] = values
+    samples = pd.concat([samples, scores], axis=1)
+    samples[SAMPLE_INDEX] = sample_indices
+
+    # replicates of each parameter set in sample order, as the platform listed them
+    simulations = simulations.sort_values(by=SAMPLE_INDEX, kind='stable')
+    history = simulations.merge(samples, on=SAMPLE_INDEX, how='left').drop(columns=SAMPLE_INDEX)
+    columns = [column for column in samples.columns if column != SAMPLE_INDEX and column not in scores.columns]
+    columns += ['iteration_number', 'run_number', 'sim_id'] + list(scores.columns)
+    return history[columns]
+
+
+def read_calibration_history(calibration_dir):
+    """
+    Reads the parameter sets and likelihoods of all completed iterations of a calibration into one dataframe.
+
+    Args:
+        calibration_dir: the calibration directory (containing CalibManager.json)
+
+    Returns: a dataframe as iteration_history(), of all iterations in order
+    """
     calib_manager = CalibManager.open_for_reading(calibration_dir)
-    parameter_sets = calib_manager.get_parameter_sets_with_likelihoods()
-    sorted_parameter_sets = sorted(parameter_sets, key=lambda ps: ps.likelihood_exponentiated, reverse=True)
-    return sorted_parameter_sets
-
-
-def get_samples(args):
-    resample_method = args.resample_method.lower()
-
-    sorted_parameter_sets = get_samples_by_likelihood(calibration_dir=args.calibration_dir)
-    if len(sorted_parameter_sets) < args.n_samples:
-        raise ValueError(f"Insufficient parameter sets: {len(sorted_parameter_sets)} found in specified "
-                         f"calibration: {args.calibration_dir} "
-                         f"for requested sample count: {args.n_samples}.")
-
+    histories = [iteration_history(iteration=calib_manager.state_for_iteration(iteration=iteration_number))
+                 for iteration_number in range(calib_manager.get_last_iteration() + 1)]
+    return pd.concat(histories, ignore_index=True)
+
+
+def sort_by_likelihood(history):
+    # most to least likely; equally likely parameter sets keep their order and unknown likelihoods are last
+    likelihoods = history['likelihood'].to_numpy(dtype=float)
+    order = np.argsort(np.where(np.isnan(likelihoods), np.inf, -likelihoods), kind='stable')
+    return history.iloc[order].reset_index(drop=True)
+
+
+def selection_probabilities(log_likelihoods):
+    """
+    Normalizes likelihoods for probabilistic selection, without overflowing or underflowing their exponentiation
+    (log-sum-exp).
+
+    Args:
+        log_likelihoods: an array of (log) likelihoods
+
+    Returns: an array of selection probabilities, proportional to the exponentiated likelihoods
+    """
+    log_likelihoods = np.asarray(log_likelihoods, dtype=float)
+    log_likelihoods = np.where(np.isnan(log_likelihoods), -np.inf, log_likelihoods)
+    max_log_likelihood = np.max(log_likelihoods)
+    if not np.isfinite(max_log_likelihood):
+        raise ValueError('No parameter set has a finite likelihood to select by.')
+    weights = np.exp(log_likelihoods - max_log_likelihood)
+    return weights / weights.sum()
+
+
+def weighted_sample_without_replacement(probabilities, size, rng=None):
+    """
+    Selects indices without replacement, each successive selection being with probability proportional to the
+    remaining probabilities (as numpy.random.choice(replace=False, p=probabilities)), in a single vectorized step
+    (Gumbel-top-k).
+
+    Args:
+        probabilities: an array of selection probabilities
+        size: the number of indices to select
+        rng: a numpy random Generator. Default: a new, randomly seeded, Generator.
+
+    Returns: an array of the selected indices, in selection order
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    with np.errstate(divide='ignore'):
+        log_probabilities = np.log(np.asarray(probabilities, dtype=float))
+    if np.count_nonzero(np.isfinite(log_probabilities)) < size:
+        raise ValueError(f'Fewer parameter sets with a non-zero selection probability than the {size} requested.')
+    scores = log_probabilities + rng.gumbel(size=len(log_probabilities))
+    selected = np.argpartition(-scores, size - 1)[:size] if size > 0 else np.array([], dtype=int)
+    return selected[np.argsort(-scores[selected], kind='stable')]
+
+
+def resample(history, n_samples, resample_method, rng=None):
+    """
+    Selects parameter sets from a calibration history.
+
+    Args:
+        history: a dataframe as read_calibration_history()
+        n_samples: the number of parameter sets to select
+        resample_method: BEST, the most likely parameter sets, or ROULETTE, the most likely third of the parameter
+            sets plus the rest selected among the remaining ones with probability proportional to their likelihood
+        rng: a numpy random Generator for roulette selection. Default: a new, randomly seeded, Generator.
+
+    Returns: a dataframe of the selected parameter sets, with a parameterization_id column numbering them
+    """
+    sorted_history = sort_by_likelihood(history)
     if resample_method == ROULETTE:
         # determine distribution of top and probabilistically selected samples
-        n_top_samples = int(np.ceil(args.n_samples / 3))
-        n_roulette_samples = args.n_samples - n_top_samples
-
-        # select the top samples - sorted_parameter_sets is sorted most<->least likely
-        top_samples = sorted_parameter_sets[0:n_top_samples]
-
-        # remove selected "top" samples and roulette sample the remaining to prevent duplication
-        remaining_sorted_parameter_sets = sorted_parameter_sets[n_top_samples:-1]
-
-        # normalize the parameter set likelihoods for probabilistic selection
-        total_likelihood = sum([ps.likelihood_exponentiated for ps in remaining_sorted_parameter_sets])
-        p = [ps.likelihood_exponentiated / total_likelihood for ps in remaining_sorted_parameter_sets]
-
-        # probabilistically select the remaining samples - duplicates of top_samples are allowed
-        roulette_samples = list(
-            np.random.choice(remaining_sorted_parameter_sets, p=p, size=n_roulette_samples, replace=False))
-
-        samples = top_samples + roulette_samples
+        n_top_samples = int(np.ceil(n_samples / 3))
+        n_roulette_samples = n_samples - n_top_samples
+
+        # roulette sample the parameter sets remaining after the "top" samples, to prevent duplication
+        roulette_indices = np.array([], dtype=int)
+        if n_roulette_samples > 0:
+            p = selection_probabilities(log_likelihoods=sorted_history['likelihood'].to_numpy()[n_top_samples:])
+            roulette_indices = n_top_samples + weighted_sample_without_replacement(probabilities=p,
+                                                                                   size=n_roulette_samples, rng=rng)
+        samples = sorted_history.iloc[np.concatenate([np.arange(n_top_samples), roulette_indices])]
     elif resample_method == BEST:
-        samples = sorted_parameter_sets[0:args.n_samples]
+        samples = sorted_history.iloc[0:n_samples]
     else:
         raise UnknownResampleMethodException(f'Unknown resample method: {resample_method}')
 
     # for readable logging purposes
-    samples = set_parameterization_ids(samples)
+    return samples.reset_index(drop=True).assign(parameterization_id=np.arange(len(samples)))
+
+
+def get_samples(args):
+    resample_method = args.resample_method.lower()
+    if resample_method not in RESAMPLING_METHODS:
+        raise UnknownResampleMethodException(f'Unknown resample method: {resample_method}')
+
+    history = read_calibration_history(calibration_dir=args.calibration_dir)
+    if len(history) < args.n_samples:
+        raise ValueError(f"Insufficient parameter sets: {len(history)} found in specified "
+                         f"calibration: {args.calibration_dir} "
+                         f"for requested sample count: {args.n_samples}.")
 
-    samples_df = pd.DataFrame(data=[s.to_dict() for s in samples])
-    return samples_df
+    return resample(history=history, n_samples=args.n_samples, resample_method=resample_method,
+                    rng=np.random.default_rng(args.seed))
 
 
 def main(args):
@@ -84,7 +189,8 @@ def main(args):
 
 DEFAULTS = {
     'n_samples': 3,
-    'output_file': 'resampled_parameter_sets.csv'
+    'output_file': 'resampled_parameter_sets.csv',
+    'seed': None
 }
 
 
@@ -101,6 +207,8 @@ def parse_args():
                         help='Number of resampled parameter sets to generate (Default: %d) ' % DEFAULTS['n_samples'])
     parser.add_argument('-o', '--output-file', dest='output_file', type=str, default=DEFAULTS['output_file'],
                         help='Path of file to write samples to (Default: %s).' % DEFAULTS['output_file'])
+    parser.add_argument('--seed', dest='seed', type=int, default=DEFAULTS['seed'],
+                        help='Random seed for roulette resampling, for reproducible selection (Default: random).')
 
     args = parser.parse_args()
     return args
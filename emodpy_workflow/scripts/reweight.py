@@ -0,0 +1,180 @@
+import glob
+import os
+import re
+
+import pandas as pd
+
+from emodpy_workflow.lib.analysis.hiv_analyzer import HIVAnalyzer
+from emodpy_workflow.lib.analysis.population_obs import PopulationObs
+from emodpy_workflow.lib.utils.runtime import load_frame
+
+
+class MissingStratumLikelihoodsException(Exception):
+    pass
+
+
+class MismatchedReferenceDataException(Exception):
+    pass
+
+
+ITERATION_REGEX = re.compile(r'^iter(?P<iteration>\d+)$')
+
+
+def load_stratum_likelihoods(calibration_dir):
+    """
+    Loads the unweighted per-sample, per-stratum likelihoods saved by HIVAnalyzer.reduce() for every iteration of a
+    calibration. Strata are loaded as strings (as saved), since their original types cannot be told from the file;
+    see reference_weights_for().
+    Args:
+        calibration_dir: directory of the calibration (containing CalibManager.json and iterN directories)
+
+    Returns: a dict of (iteration, analyzer uid): stratum likelihood DataFrame
+    """
+    stratum_likelihoods = {}
+    pattern = os.path.join(calibration_dir, 'iter*', f'{HIVAnalyzer.STRATUM_LIKELIHOODS_PREFIX}*.csv')
+    for path in glob.glob(pattern):
+        match = ITERATION_REGEX.match(os.path.basename(os.path.dirname(path)))
+        if match is None:
+            continue
+        iteration = int(match['iteration'])
+        uid = os.path.splitext(os.path.basename(path))[0][len(HIVAnalyzer.STRATUM_LIKELIHOODS_PREFIX):]
+
+        value_columns = [HIVAnalyzer.LOG_LIKELIHOOD_CHANNEL, PopulationObs.WEIGHT_CHANNEL]
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        df = df.astype({'Sample': int, **{column: float for column in value_columns}})
+        index = [column for column in df.columns if column not in value_columns]
+        stratum_likelihoods[(iteration, uid)] = df.set_index(index)
+    if len(stratum_likelihoods) == 0:
+        raise MissingStratumLikelihoodsException(f'No saved stratum likelihoods found in calibration directory: '
+                                                 f'{calibration_dir} . Calibrations analyzed before re-weighting '
+                                                 f'support was added cannot be re-weighted.')
+    return stratum_likelihoods
+
+
+def reference_weights_for(stratum_likelihoods, analyzer):
+    """
+    Aligns the reference weights of an analyzer (e.g. from an edited ingest form) to saved stratum likelihoods.
+    Args:
+        stratum_likelihoods: saved stratum likelihoods of the analyzer, indexed by Sample and stratifiers
+        analyzer: an HIVAnalyzer to obtain reference weights from
+
+    Returns: an array of reference weights, one per row of stratum_likelihoods
+    """
+    stratifiers = analyzer.reference.stratifiers
+    reference = analyzer.reference._dataframe[stratifiers + [PopulationObs.WEIGHT_CHANNEL]]
+    mismatch_message = (f'Reference data strata of analyzer: {analyzer.uid} do not match the calibration. Only '
+                        f'weights may change for re-weighting.')
+    strata = stratum_likelihoods.index.to_frame(index=False)
+    missing = [stratifier for stratifier in stratifiers if stratifier not in strata.columns]
+    if len(missing) > 0:
+        raise MismatchedReferenceDataException(f'{mismatch_message} Missing strata: {", ".join(missing)}')
+
+    # loaded strata are strings (e.g. Year '2010.5', Province '1'); compare them as the reference data types
+    try:
+        strata = strata.astype({stratifier: reference[stratifier].dtype for stratifier in stratifiers})
+    except (TypeError, ValueError):
+        raise MismatchedReferenceDataException(mismatch_message)
+    aligned = strata.merge(reference, how='left', on=stratifiers)
+    if len(aligned.index) != len(strata.index) or aligned[PopulationObs.WEIGHT_CHANNEL].isnull().any():
+        raise MismatchedReferenceDataException(mismatch_message)
+    return aligned[PopulationObs.WEIGHT_CHANNEL].to_numpy()
+
+
+def reweight(stratum_likelihoods, analyzer_weights, analyzers=None):
+    """
+    Recombines saved stratum likelihoods into sample likelihoods under new weights.
+    Args:
+        stratum_likelihoods: a dict of (iteration, analyzer uid): stratum likelihood DataFrame
+        analyzer_weights: a dict of analyzer uid: analyzer weight. Analyzers not included are dropped from the total.
+        analyzers: an optional dict of analyzer uid: HIVAnalyzer to take new reference weights from
+
+    Returns: a DataFrame of weighted likelihoods per analyzer and in total, indexed by iteration and sample, sorted
+        most to least likely
+    """
+    analyzers = analyzers or {}
+    by_iteration = {}
+    for (iteration, uid), likelihoods in stratum_likelihoods.items():
+        if uid not in analyzer_weights:
+            continue
+        reference_weights = None
+        if uid in analyzers:
+            reference_weights = reference_weights_for(stratum_likelihoods=likelihoods, analyzer=analyzers[uid])
+        by_iteration.setdefault(iteration, {})[uid] = HIVAnalyzer.combine_stratum_likelihoods(
+            stratum_likelihoods=likelihoods, weight=analyzer_weights[uid], reference_weights=reference_weights)
+
+    results = pd.concat({iteration: pd.DataFrame(columns) for iteration, columns in by_iteration.items()},
+                        names=['iteration', 'sample'])
+    results['total'] = results.sum(axis=1)
+    return results.sort_values(by='total', ascending=False)
+
+
+def parse_weights(weights_str):
+    weights = {}
+    for entry in weights_str.strip().split(','):
+        try:
+            uid, weight = entry.rsplit('=', 1)
+            weights[uid.strip()] = float(weight)
+        except ValueError:
+            raise ValueError(f'Invalid analyzer weight: {entry} . Expected format: analyzer_uid=weight')
+    return weights
+
+
+def main(args):
+    if os.path.exists(args.output_file):
+        raise FileExistsError(f'Specified output file already exists, cannot overwrite: {args.output_file}')
+
+    stratum_likelihoods = load_stratum_likelihoods(calibration_dir=args.calibration_dir)
+
+    # start with equal analyzer weights, then apply frame and command line overrides
+    analyzer_weights = {uid: 1.0 for _, uid in stratum_likelihoods.keys()}
+    analyzers = {}
+    if args.frame is not None:
+        analyzers = {analyzer.uid: analyzer for analyzer in args.frame.site.analyzers}
+        analyzer_weights = {uid: analyzers[uid].weight for uid in analyzer_weights.keys() if uid in analyzers}
+    if args.weights is not None:
+        overrides = parse_weights(weights_str=args.weights)
+        unknown = set(overrides.keys()) - set(analyzer_weights.keys())
+        if len(unknown) > 0:
+            raise KeyError(f"Unknown analyzer(s): {', '.join(sorted(unknown))} . "
+                           f"Available: {', '.join(sorted(analyzer_weights.keys()))}")
+        analyzer_weights.update(overrides)
+
+    results = reweight(stratum_likelihoods=stratum_likelihoods, analyzer_weights=analyzer_weights,
+                       analyzers=analyzers)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output_file)), exist_ok=True)
+    results.to_csv(args.output_file)
+    print(results.head(10))
+    print(f'Wrote re-weighted likelihoods to {args.output_file}')
+
+
+DEFAULTS = {
+    'output_file': 'reweighted_likelihoods.csv'
+}
+
+
+def parse_args():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('-d', '--calib-dir', dest='calibration_dir', type=str, required=True,
+                        help='Directory of calibration to re-weight (containing CalibManager.json).')
+    parser.add_argument('-f', '--frame', dest='frame', type=str, default=None,
+                        help='Model frame whose (edited) ingest form analyzer and reference weights are used '
+                             '(Default: weight all analyzers equally, keep reference weights).')
+    parser.add_argument('-w', '--weights', dest='weights', type=str, default=None,
+                        help='Comma-separated analyzer_uid=weight overrides, applied after any frame weights '
+                             '(Default: no overrides).')
+    parser.add_argument('-o', '--output-file', dest='output_file', type=str, default=DEFAULTS['output_file'],
+                        help='Path of file to write re-weighted likelihoods to (Default: %s).' % DEFAULTS['output_file'])
+
+    args = parser.parse_args()
+    if args.frame is not None:
+        args.frame = load_frame(frame_name=args.frame)
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    main(args)
@@ -1,10 +1,19 @@
 import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from threading import Lock
 
 import pandas as pd
 
+from emodpy_workflow.lib.utils.burn_in import burn_in_builder, collect_burn_in_populations, fork_builder, \
+    validate_fork_overrides, BURN_IN_POPULATIONS_DIRECTORY
+from emodpy_workflow.lib.utils.completion_watcher import CompletionWatcher
+from emodpy_workflow.lib.utils.resource_profile import ResourceProfile, apply_resource_request, platform_resources
+from emodpy_workflow.lib.utils.results_catalog import ResultsCatalog
 from emodpy_workflow.lib.utils.runtime import load_frame
+from emodpy_workflow.lib.utils.simulation_index import LINKED_SIMULATIONS_FILENAME, SAMPLE_INDEX_TAG, SimulationIndex
 
 from idmtools.builders.simulation_builder import SimulationBuilder
+from idmtools.core import EntityStatus, ItemType
 from idmtools.core.platform_factory import Platform
 from idmtools.entities import Suite
 from idmtools.entities.experiment import Experiment
@@ -13,6 +22,9 @@ from idmtools.entities.templated_simulation import TemplatedSimulations
 from idmtools_calibra.utilities.mod_fn import ModFn
 from idmtools_calibra.utilities.parameter_set import ParameterSet, NaNDetectedError
 
+# receipt column counting the simulations of each experiment re-commissioned by resuming
+RESUMED_COLUMN = 'resumed_simulations'
+
 DOLPHIN = r'''
                                   _
                              _.-~~.)
@@ -34,8 +46,27 @@ DOLPHIN = r'''
 '''
 
 
-def build_scenario_experiment(platform, samples, experiment_name, frame, suite_id, sample_overrides=None):
+def build_scenario_simulations(platform, samples, frame, sample_overrides=None, burn_in_year=None, burn_in=False,
+                               burn_in_populations=None, sample_indices=None):
+    """
+    Builds one simulation per sample.
+
+    Args:
+        platform: the platform to build for
+        samples: a list of sample dicts
+        frame: the model frame to build simulations of
+        sample_overrides: a dict of parameter values to apply on top of every sample
+        burn_in_year: if provided, simulations are either burn-ins that end at this year (burn_in=True) or forks that
+            start from the burn-in population of their sample at this year (burn_in=False)
+        burn_in: if True (and a burn_in_year is given), build burn-in simulations
+        burn_in_populations: a dict of sample index: burn-in population file, for forks. Each fork receives only
+            the population of its own sample.
+        sample_indices: indices of the samples to build simulations for. None means all samples.
+
+    Returns: a TemplatedSimulations object
+    """
     sample_overrides = {} if sample_overrides is None else sample_overrides
+    sample_indices = range(len(samples)) if sample_indices is None else sample_indices
 
     # create our base task
     task = frame.initialize_task()
@@ -43,8 +74,15 @@ def build_scenario_experiment(platform, samples, experiment_name, frame, suite_i
 
     # now for each sample, make a simulation that uses task and the sample_mapping_function
     # TODO: test out the use of these kwargs, they SHOULD be being passed to SampleIndexWrapper objects, if I've traced the code correctly (confusing!)
-    sweeps = [[ModFn(inputs_builder, idx=index, sample={**sample, **sample_overrides})
-               for index, sample in enumerate(samples)]]
+    if burn_in_year is None:
+        sweeps = [[ModFn(inputs_builder, idx=index, sample={**samples[index], **sample_overrides})
+                   for index in sample_indices]]
+    else:
+        fork_kwargs = {} if burn_in else {'burn_in_populations': burn_in_populations}
+        sweeps = [[ModFn(burn_in_builder if burn_in else fork_builder, inputs_builder=inputs_builder,
+                         burn_in_year=burn_in_year, idx=index, sample={**samples[index], **sample_overrides},
+                         **fork_kwargs)
+                   for index in sample_indices]]
     builder = SimulationBuilder()
     builder.sweeps = sweeps
     builder.count = len(sweeps[0])
@@ -53,8 +91,24 @@ def build_scenario_experiment(platform, samples, experiment_name, frame, suite_i
     if frame.asset_collection_of_container:
         task.set_sif(path_to_sif=frame.asset_collection_of_container, platform=platform)
 
-    experiment = Experiment(name=experiment_name,
-                            simulations=TemplatedSimulations(base_task=task, builders={builder}), parent_id=suite_id)
+    return TemplatedSimulations(base_task=task, builders={builder})
+
+
+def build_scenario_experiment(platform, samples, experiment_name, frame, suite_id, sample_overrides=None,
+                              burn_in_year=None, burn_in=False, burn_in_populations=None):
+    """
+    Builds an experiment with one simulation per sample. See build_scenario_simulations() for arguments.
+
+    Args:
+        experiment_name: the name of the experiment
+        suite_id: the id of the suite the experiment belongs to
+
+    Returns: the experiment
+    """
+    simulations = build_scenario_simulations(platform=platform, samples=samples, frame=frame,
+                                             sample_overrides=sample_overrides, burn_in_year=burn_in_year,
+                                             burn_in=burn_in, burn_in_populations=burn_in_populations)
+    experiment = Experiment(name=experiment_name, simulations=simulations, parent_id=suite_id)
     # doesn't work for now platform.num_cores = frame.num_cores  # TODO: this does set per-exp num_cores in comps (min/max cores is this) BUT it also does it on the sim config (breaks!)
     return experiment
 
@@ -84,6 +138,14 @@ def make_a_suite(platform, suite_name):
     return suite
 
 
+def write_linked_simulations(linked_simulations, receipt_path):
+    # the receipt index (experiment) and sample each linked, previously completed simulation stands in for
+    df = pd.DataFrame(linked_simulations, columns=['receipt_index', 'sample_index', 'simulation_id'])
+    linked_path = os.path.join(os.path.dirname(os.path.abspath(receipt_path)), LINKED_SIMULATIONS_FILENAME)
+    df.to_csv(linked_path, index=False)
+    print(f'Linked {len(df)} previously completed simulations instead of re-running them, listed in: {linked_path}')
+
+
 def write_receipt(receipt, receipt_path):
     df = pd.DataFrame(receipt)
     df.index.name = 'index'
@@ -92,71 +154,391 @@ def write_receipt(receipt, receipt_path):
     print(f'Wrote {os.path.basename(__file__)} receipt to: {receipt_path}')
 
 
-def main(args):
-    # For consistency, we don't want to accidentally mix-and-match receipts and prior processed results.
-    receipt_path = os.path.join(args.output_dir, 'experiment_index.csv')
-    if os.path.exists(receipt_path):
-        raise Exception(f'{os.path.basename(__file__)} receipt already exists at: {receipt_path} . '
-                        f'Please delete it and related downloads and processed files or pick a different '
-                        f'output directory.')
+def burn_in_populations_directory(output_dir, burn_in_experiment_id):
+    return os.path.join(output_dir, BURN_IN_POPULATIONS_DIRECTORY, str(burn_in_experiment_id))
 
-    # TODO: num_cores > 1 seems to be BUSTED
-    platform = Platform(args.platform, max_running_jobs=1000000, array_batch_size=1000000)  # We will set num_cores on a per-experiment basis
 
-    # load model frame python modules
-    frames = {frame_name: load_frame(frame_name=frame_name) for frame_name in args.frames}
+def run_burn_ins(platform, frames, samples, suite, burn_in_year, output_dir):
+    """
+    Runs one burn-in simulation per sample for each frame, waits for them to complete, and downloads their
+    populations.
 
-    # now determine the samples to use as overrides to the frames
-    samples = get_samples(samples_file=args.samples_file)
+    Args:
+        platform: the platform to run on
+        frames: a dict of frame name: frame
+        samples: a list of sample dicts
+        suite: the suite to run the burn-in experiments within
+        burn_in_year: the year to end the burn-ins at (serializing their populations)
+        output_dir: the run output directory, to download the populations into
 
-    # Now generate and run one simulation per sample in each experiment
-    # The number of experiments is one per sweep entry (if provided) or one per frame (default with no sweeping)
-    suite = make_a_suite(platform=platform, suite_name=args.suite_name)
-    receipt = []
+    Returns: a dict of frame name: (burn-in experiment, dict of sample index: burn-in population file)
+    """
+    experiments = {}
     for frame_name, frame in frames.items():
         frame.initialize_executable()
+        experiment = build_scenario_experiment(platform=platform,
+                                               samples=samples,
+                                               experiment_name=f'{frame_name}_burn_in',
+                                               frame=frame,
+                                               suite_id=suite.id,
+                                               burn_in_year=burn_in_year,
+                                               burn_in=True)
+        suite.add_experiment(experiment)
+        experiments[frame_name] = experiment
+    platform.run_items(list(experiments.values()))
+
+    # burn-in populations are collected from each experiment as soon as it is done
+    frame_names = {id(experiment): frame_name for frame_name, experiment in experiments.items()}
+    burn_ins = {}
+    for experiment in CompletionWatcher(platform=platform).completed(experiments=list(experiments.values())):
+        directory = burn_in_populations_directory(output_dir=output_dir, burn_in_experiment_id=experiment.id)
+        populations = collect_burn_in_populations(platform=platform, experiment=experiment, directory=directory)
+        burn_ins[frame_names[id(experiment)]] = (experiment, populations)
+    return burn_ins
+
+
+def experiment_definitions(args, frames):
+    """
+    Determines the experiments to run: one per sweep entry (if provided) or one per frame (default with no sweeping).
+
+    Args:
+        args: the run arguments
+        frames: a dict of frame name: frame
+
+    Returns: a list of (frame name, experiment name, sample overrides) tuples, in receipt order
+    """
+    definitions = []
+    for frame_name in frames.keys():
         for overrides in args.sweep_parameter_sets[frame_name]['sweeps']:
+            overrides = dict(overrides)
             # experiment_name:
             #  if not using a sweeps.py file, then it is the suite_name
             #  otherwise if 'experiment_name' is not in the overrides dict for a sweeps row, use the frame_name
             experiment_name = overrides.pop('experiment_name', frame_name) if args.doing_sweeps else args.suite_name
+            definitions.append((frame_name, experiment_name, overrides))
+    return definitions
+
+
+def samples_to_resume(platform, experiment_id, n_samples, linked_sample_indices=None):
+    """
+    Determines the samples of an experiment without a succeeded or still active simulation.
+
+    Args:
+        platform: the platform the experiment is on
+        experiment_id: the id of the experiment
+        n_samples: the number of samples the experiment was built with
+        linked_sample_indices: indices of samples provided by linked, completed simulations (not in the experiment)
+
+    Returns: a sorted list of sample indices to simulate again
+    """
+    simulations = platform.get_children(experiment_id, item_type=ItemType.EXPERIMENT, force=True)
+    present = {int(simulation.tags[SAMPLE_INDEX_TAG]) for simulation in simulations
+               if simulation.status != EntityStatus.FAILED}
+    present |= set() if linked_sample_indices is None else set(linked_sample_indices)
+    return [index for index in range(n_samples) if index not in present]
+
+
+def match_receipt_definitions(receipt, definitions):
+    """
+    Matches the rows of a receipt to experiment definitions by (frame, experiment name), independent of their order.
+    Definitions sharing a (frame, experiment name) are matched to the receipt rows sharing it in order.
+
+    Args:
+        receipt: a receipt DataFrame, indexed by receipt index
+        definitions: a list of (frame name, experiment name, sample overrides) tuples, as experiment_definitions()
+
+    Returns: a list of (receipt index, receipt row, definition) tuples, in receipt order
+    """
+    unmatched = {}
+    for definition in definitions:
+        unmatched.setdefault(definition[:2], []).append(definition)
+    matched = []
+    for receipt_index, row in receipt.iterrows():
+        candidates = unmatched.get((row['frame'], row['experiment_name']), [])
+        if len(candidates) == 0:
+            raise ValueError(f"Receipt row {receipt_index} (frame: {row['frame']}, experiment: "
+                             f"{row['experiment_name']}) has no matching experiment definition")
+        matched.append((receipt_index, row, candidates.pop(0)))
+    leftover = [definition[:2] for candidates in unmatched.values() for definition in candidates]
+    if len(leftover) > 0:
+        raise ValueError(f'Experiment definitions without a receipt row: {leftover}')
+    return matched
+
+
+def resume_experiments(args, platform, frames, samples, receipt_path):
+    """
+    Re-commissions the failed or missing simulations of a previous run (with the same arguments) into their original
+    experiments and patches the receipt with the number of simulations resumed per experiment.
+
+    Returns: the list of receipt experiments
+    """
+    receipt = pd.read_csv(receipt_path, index_col='index')
+    definitions = experiment_definitions(args=args, frames=frames)
+    try:
+        matched = match_receipt_definitions(receipt=receipt, definitions=definitions)
+    except ValueError:
+        raise Exception(f'{os.path.basename(__file__)} receipt at: {receipt_path} does not match the requested frames '
+                        f'and sweeps. A run must be resumed with the same arguments it was started with.')
+    if RESUMED_COLUMN not in receipt.columns:
+        receipt[RESUMED_COLUMN] = 0
+    linked_path = os.path.join(os.path.dirname(os.path.abspath(receipt_path)), LINKED_SIMULATIONS_FILENAME)
+    linked = pd.DataFrame(columns=['receipt_index', 'sample_index', 'simulation_id'])
+    if os.path.exists(linked_path):
+        linked = pd.read_csv(linked_path)
+
+    for frame in frames.values():
+        frame.initialize_executable()
+    experiments = []
+    for receipt_index, row, (frame_name, experiment_name, overrides) in matched:
+        if pd.isna(row['experiment_id']):
+            continue  # consists entirely of linked, completed simulations
+        experiment = platform.get_item(row['experiment_id'], item_type=ItemType.EXPERIMENT, force=True)
+        experiments.append(experiment)
+        linked_sample_indices = linked.loc[linked['receipt_index'] == receipt_index, 'sample_index']
+        sample_indices = samples_to_resume(platform=platform, experiment_id=experiment.id, n_samples=len(samples),
+                                           linked_sample_indices=linked_sample_indices)
+        if len(sample_indices) == 0:
+            continue
+
+        print(f'Resuming {len(sample_indices)} of {len(samples)} simulations of experiment: {experiment_name} '
+              f'({experiment.id})')
+        burn_in_populations = None
+        if args.burn_in_year is not None:
+            burn_in_experiment_id = row['burn_in_experiment_id']
+            directory = burn_in_populations_directory(output_dir=args.output_dir,
+                                                      burn_in_experiment_id=burn_in_experiment_id)
+            burn_in_populations = collect_burn_in_populations(platform=platform, experiment=burn_in_experiment_id,
+                                                              directory=directory, sample_indices=sample_indices)
+        simulations = build_scenario_simulations(platform=platform,
+                                                 samples=samples,
+                                                 frame=frames[frame_name],
+                                                 sample_overrides=overrides,
+                                                 burn_in_year=args.burn_in_year,
+                                                 burn_in_populations=burn_in_populations,
+                                                 sample_indices=sample_indices)
+        experiment.add_simulations(simulations)
+        # the experiment keeps its existing assets (executable, ...)
+        experiment.run(regather_common_assets=False)
+        receipt.loc[receipt_index, RESUMED_COLUMN] += len(sample_indices)
+
+    receipt.index.name = 'index'
+    receipt.to_csv(receipt_path)
+    print(f'Updated {os.path.basename(__file__)} receipt: {receipt_path}')
+    if args.catalog is not None:
+        ResultsCatalog(path=args.catalog).add_receipt(receipt_path=receipt_path, suite_name=args.suite_name)
+    return experiments
+
+
+def submit_experiments(platform, experiments, max_workers, prepare=None):
+    """
+    Submits experiments to the platform as soon as each is built, with up to max_workers submissions in flight at
+    once. Experiments are built by iterating over them in the calling thread (EMOD input building relies on
+    module-level state), one ahead of the submissions.
+
+    Args:
+        platform: the platform to submit to
+        experiments: an iterable of experiments with built simulations, e.g. a generator that builds them
+        max_workers: the maximum number of concurrent submissions
+        prepare: an optional function of an experiment that sets up the platform for submitting it (e.g. its
+            resource requests). As it changes shared platform state, submissions are then made one at a time.
+
+    Returns: None
+    """
+    lock = Lock()
+
+    def submit(experiment):
+        if prepare is None:
+            return platform.run_items(experiment)
+        with lock:
+            prepare(experiment)
+            return platform.run_items(experiment)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        for experiment in experiments:
+            pending.add(executor.submit(submit, experiment))
+            if len(pending) > max_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()  # raises any submission error
+        for future in wait(pending).done:
+            future.result()
+
+
+def create_experiments(args, platform, frames, samples, receipt_path):
+    """
+    Creates and runs the experiments of a new suite and writes its receipt.
+
+    Returns: the list of created experiments
+    """
+    # Now generate and run one simulation per sample in each experiment
+    suite = make_a_suite(platform=platform, suite_name=args.suite_name)
+
+    # Optionally, simulate the shared history of every sample once and fork all sweeps from it
+    if args.burn_in_year is not None:
+        # fail before running burn-ins if any sweep cannot be forked; warn of overrides acting before the burn-in
+        for _, experiment_name, overrides in experiment_definitions(args=args, frames=frames):
+            for warning in validate_fork_overrides(overrides=overrides, burn_in_year=args.burn_in_year):
+                print(f'WARNING: experiment {experiment_name}: {warning}')
+        burn_ins = run_burn_ins(platform=platform, frames=frames, samples=samples, suite=suite,
+                                burn_in_year=args.burn_in_year, output_dir=args.output_dir)
+
+    # Optionally, simulations identical to already completed ones are linked to instead of re-run
+    simulation_index = None if args.simulation_index is None else SimulationIndex(path=args.simulation_index)
+    linked_simulations = []
+    indexed_simulations = []  # tuples of (experiment, simulations, input hashes) to index once created
+
+    # Optionally, request memory and walltime per experiment as predicted from previously measured simulations
+    resource_profile = None if args.resource_profile is None else ResourceProfile(path=args.resource_profile)
+    resource_requests = {}  # id(experiment): ResourceRequest, or None for the platform defaults
+    profiled_simulations = []  # tuples of (frame name, experiment, simulations) to profile once created
+    if resource_profile is not None:
+        n_measured = resource_profile.update(platform=platform)
+        print(f'Measured {n_measured} previously run simulations for resource prediction.')
+        default_resources = platform_resources(platform=platform)
+
+        def prepare(experiment):
+            for attribute, value in default_resources.items():
+                setattr(platform, attribute, value)
+            if resource_requests[id(experiment)] is not None:
+                apply_resource_request(platform=platform, request=resource_requests[id(experiment)])
+
+    receipt = []
+    experiments = []
+    for frame in frames.values():
+        frame.initialize_executable()
+
+    def built_experiments():
+        for frame_name, experiment_name, overrides in experiment_definitions(args=args, frames=frames):
+            burn_in_experiment, burn_in_populations = burn_ins[frame_name] if args.burn_in_year is not None else \
+                (None, None)
             experiment = build_scenario_experiment(platform=platform,
                                                    samples=samples,
                                                    experiment_name=experiment_name,
-                                                   frame=frame,
+                                                   frame=frames[frame_name],
                                                    suite_id=suite.id,
-                                                   sample_overrides=overrides)
+                                                   sample_overrides=overrides,
+                                                   burn_in_year=args.burn_in_year,
+                                                   burn_in_populations=burn_in_populations)
+            # build simulation inputs here, rather than during (concurrent) submission
+            simulations = list(experiment.simulations)
+
+            if simulation_index is not None:
+                simulations, input_hashes, linked = simulation_index.partition(
+                    simulations=simulations, platform=platform, platform_name=args.platform)
+                indexed_simulations.append((experiment, simulations, input_hashes))
+                linked_simulations.extend({'receipt_index': len(receipt), 'sample_index': sample_index,
+                                           'simulation_id': simulation_id}
+                                          for sample_index, simulation_id in linked.items())
+            experiment.simulations = simulations
+            if resource_profile is not None and len(simulations) > 0:
+                request = resource_profile.request_for(frame=frame_name, simulations=simulations)
+                resource_requests[id(experiment)] = request
+                profiled_simulations.append((frame_name, experiment, simulations))
+                if request is not None:
+                    print(f'Requesting {request.memory_mb} MB and {request.slurm_time} per simulation of experiment: '
+                          f'{experiment_name}')
 
             # generate the receipt data for this experiment
             frame_and_experiment_info = {
                 'frame': frame_name,
-                'experiment_id': experiment.id,
+                'experiment_id': experiment.id if len(simulations) > 0 else None,
                 'experiment_name': experiment_name
             }
-            # add the experiment directory to the receipt if it exists on the platform
-            suite.add_experiment(experiment)
-            try:
-                exp_directory = platform.get_directory(item=experiment)
-                frame_and_experiment_info['experiment_directory'] = exp_directory
-            except AttributeError:
-                pass
+            if burn_in_experiment is not None:
+                frame_and_experiment_info['burn_in_experiment_id'] = burn_in_experiment.id
+            if len(simulations) > 0:
+                # add the experiment directory to the receipt if it exists on the platform
+                suite.add_experiment(experiment)
+                experiments.append(experiment)
+                try:
+                    exp_directory = platform.get_directory(item=experiment)
+                    frame_and_experiment_info['experiment_directory'] = exp_directory
+                except AttributeError:
+                    pass
             receipt.append({**frame_and_experiment_info, **overrides})
-    platform.run_items([suite])
+            if len(simulations) > 0:
+                yield experiment
+
+    # Experiments are submitted while the next ones are built. The suite (and any burn-in experiments) already
+    # exist; linked simulations have already completed.
+    submit_experiments(platform=platform, experiments=built_experiments(), max_workers=args.workers,
+                       prepare=None if resource_profile is None else prepare)
     write_receipt(receipt=receipt, receipt_path=receipt_path)
+    if args.catalog is not None:
+        ResultsCatalog(path=args.catalog).add_receipt(receipt_path=receipt_path, suite_id=suite.id,
+                                                      suite_name=args.suite_name)
+
+    if resource_profile is not None:
+        for frame_name, experiment, simulations in profiled_simulations:
+            resource_profile.add(frame=frame_name, experiment_id=experiment.id, simulations=simulations)
+        resource_profile.save()
+
+    if simulation_index is not None:
+        for experiment, simulations, input_hashes in indexed_simulations:
+            for simulation, input_hash in zip(simulations, input_hashes):
+                simulation_index.add(input_hash=input_hash, platform_name=args.platform, experiment_id=experiment.id,
+                                     simulation_id=simulation.id)
+        simulation_index.save()
+        write_linked_simulations(linked_simulations=linked_simulations, receipt_path=receipt_path)
+    return experiments
+
+
+def main(args):
+    # For consistency, we don't want to accidentally mix-and-match receipts and prior processed results.
+    receipt_path = os.path.join(args.output_dir, 'experiment_index.csv')
+    if args.resume and not os.path.exists(receipt_path):
+        raise Exception(f'No {os.path.basename(__file__)} receipt to resume at: {receipt_path} .')
+    if os.path.exists(receipt_path) and not args.resume:
+        raise Exception(f'{os.path.basename(__file__)} receipt already exists at: {receipt_path} . '
+                        f'Please delete it and related downloads and processed files or pick a different '
+                        f'output directory. To re-run only its failed simulations, use --resume .')
+
+    # TODO: num_cores > 1 seems to be BUSTED
+    platform = Platform(args.platform, max_running_jobs=1000000, array_batch_size=1000000)  # We will set num_cores on a per-experiment basis
+
+    # load model frame python modules
+    frames = {frame_name: load_frame(frame_name=frame_name) for frame_name in args.frames}
+
+    # now determine the samples to use as overrides to the frames
+    samples = get_samples(samples_file=args.samples_file)
+
+    if args.resume:
+        resume_experiments(args=args, platform=platform, frames=frames, samples=samples, receipt_path=receipt_path)
+    else:
+        create_experiments(args=args, platform=platform, frames=frames, samples=samples, receipt_path=receipt_path)
 
     print('Done with model experiment creation.')
     if args.download_filenames:
-        from argparse import Namespace
         from emodpy_workflow.scripts.download import main as download
-        platform.wait_till_done(item=suite)
-        dl_args = Namespace(**{'files': args.download_filenames, 'receipt_file': receipt_path,
-                               'platform': platform._config_block,
-                               'suite_id': None, 'experiment_id': None, 'output_dir': None, 'samples_file': None})
+        # the download waits on all experiments at once, downloading each as soon as it is done
+        download(args=download_args(args=args, platform_name=platform._config_block, receipt_path=receipt_path))
+
+
+def download_args(args, platform_name, receipt_path):
+    """
+    The download command arguments to download the requested files of the experiments of a run receipt.
+
+    Args:
+        args: the run command arguments
+        platform_name: the platform the experiments run on
+        receipt_path: the run receipt path
 
-        download(args=dl_args)
+    Returns: a Namespace of download command arguments
+    """
+    from argparse import Namespace
+    from emodpy_workflow.scripts.download import DEFAULTS as DOWNLOAD_DEFAULTS
+    return Namespace(**{**DOWNLOAD_DEFAULTS, 'files': args.download_filenames, 'receipt_file': receipt_path,
+                        'platform': platform_name, 'catalog': args.catalog})
 
 
 DEFAULTS = {
+    'burn_in_year': None,
+    'simulation_index': None,
+    'resource_profile': None,
+    'catalog': None,
+    'resume': False,
+    'workers': 8
 }
 
 
@@ -180,12 +562,40 @@ def parse_args():
                              '(if downloading).')
     parser.add_argument('-p', '--platform', dest='platform', type=str, required=True,
                         help="Platform to run simulations on (Required).")
+    parser.add_argument('-b', '--burn-in-year', dest='burn_in_year', type=float,
+                        default=DEFAULTS['burn_in_year'],
+                        help='Year to fork scenarios at. If provided, one burn-in simulation per sample is run up to '
+                             'this year first and every experiment then starts from the serialized population of '
+                             'its sample (Default: no burn-in, simulate every experiment from the start).')
+    parser.add_argument('-i', '--simulation-index', dest='simulation_index', type=str,
+                        default=DEFAULTS['simulation_index'],
+                        help='Index file of previously run simulations by their inputs (created if needed). '
+                             'Simulations with inputs identical to a completed, indexed simulation on the same '
+                             'platform are linked to instead of being run again (Default: no index, run all '
+                             'simulations).')
+    parser.add_argument('-r', '--resource-profile', dest='resource_profile', type=str,
+                        default=DEFAULTS['resource_profile'],
+                        help='Resource profile file of previously run simulations (created if needed). The peak '
+                             'memory and walltime of its completed simulations are measured and used to request '
+                             'memory and walltime per experiment on platforms that support it (Slurm); new '
+                             'simulations are added to it (Default: no profile, use the platform requests).')
+    parser.add_argument('-c', '--catalog', dest='catalog', type=str, default=DEFAULTS['catalog'],
+                        help='Results catalog database to record the suite and experiments of the run in (created '
+                             'if needed). Files downloaded with --files are recorded too (Default: no catalog).')
+    parser.add_argument('--workers', dest='workers', type=int, default=DEFAULTS['workers'],
+                        help=f"Maximum number of experiments to submit to the platform concurrently "
+                             f"(Default: {DEFAULTS['workers']}).")
+    parser.add_argument('--resume', dest='resume', action='store_true', default=DEFAULTS['resume'],
+                        help='Resume a previous run with the same arguments (and output directory): re-run only the '
+                             'simulations of its receipt experiments that failed or are missing, within the same '
+                             'experiments (Default: start a new run).')
     parser.add_argument('-w', '--sweep', dest='sweep', type=str, default=None,
                         help='Python module to load with a sweep definition to generate extra experiments with '
                              '(Default: no sweeping).')
 
     args = parser.parse_args()
-    args.frames = set(args.frames.strip().split(','))
+    # ordered and de-duplicated, so experiments are defined (and receipted) in the same order on every run
+    args.frames = list(dict.fromkeys(args.frames.strip().split(',')))
     if args.sweep is None:
         # This means there are no swept value overrides
         args.sweep_parameter_sets = {frame_name: {'sweeps': [{}]} for frame_name in args.frames}
@@ -1,8 +1,11 @@
 import numpy as np
 import os
 import pandas as pd
+import tempfile
 import unittest
 
+from types import SimpleNamespace
+
 import emodpy_workflow.lib.utils.project_data as ingest_utils
 
 from emodpy_workflow.lib.analysis.age_bin import AgeBin
@@ -219,6 +222,95 @@ class TestHIVAnalyzer(unittest.TestCase):
                           item=None,  # not needed in HIVAnalyzer currently
                           data=made_up_sim_data_missing_2012)
 
+    def test_map_results_are_cached_by_simulation(self):
+        channel = 'Prevalence'
+        custom_age_bin = AgeBin(start=15, end=50)
+        analyzer_dict = [a for a in self.analyzers
+                         if a['channel'] == channel and
+                         a['provinciality'] == PopulationObs.NON_PROVINCIAL and
+                         a['age_bins'] == [str(custom_age_bin)]][0]
+        analyzer = HIVAnalyzer(site=self.site, weight=1.0,
+                               channel=analyzer_dict['channel'],
+                               distribution=analyzer_dict['distribution'],
+                               provinciality=analyzer_dict['provinciality'],
+                               scale_population=analyzer_dict['scale_population'],
+                               age_bins=analyzer_dict['age_bins'])
+
+        # simulation data exactly covering the reference data, as raw (unparsed) csv file contents
+        sim_df = analyzer.reference._dataframe[['Year', 'Gender', 'AgeBin']].assign(
+            Node=PopulationObs.AGGREGATED_NODE, **{HIVAnalyzer.SIM_RESULT_CHANNEL: 0.1})
+        data = {analyzer.filenames[0]: sim_df.to_csv(index=False).encode('utf-8')}
+        item = SimpleNamespace(id='a-simulation-id')
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            analyzer.enable_result_cache(directory=cache_dir)
+            self.assertFalse(analyzer.parse)
+            result = analyzer.map(data=data, item=item)
+            self.assertIn(analyzer._result_cache_key(item=item), analyzer.result_cache)
+
+            # a cache hit does not need (or look at) the simulation files
+            cached_result = analyzer.map(data={}, item=item)
+            pd.testing.assert_frame_equal(cached_result['df'], result['df'])
+            self.assertEqual(cached_result['stratifiers'], result['stratifiers'])
+
+            # other simulations are not cache hits
+            self.assertRaises(KeyError, analyzer.map, data={}, item=SimpleNamespace(id='another-simulation-id'))
+
+    def test_early_terminated_simulations_are_scored_at_floor(self):
+        channel = 'Prevalence'
+        custom_age_bin = AgeBin(start=15, end=50)
+        analyzer_dict = [a for a in self.analyzers
+                         if a['channel'] == channel and
+                         a['provinciality'] == PopulationObs.NON_PROVINCIAL and
+                         a['age_bins'] == [str(custom_age_bin)]][0]
+        analyzer = HIVAnalyzer(site=self.site, weight=0.5,
+                               channel=analyzer_dict['channel'],
+                               distribution=analyzer_dict['distribution'],
+                               provinciality=analyzer_dict['provinciality'],
+                               scale_population=analyzer_dict['scale_population'],
+                               age_bins=analyzer_dict['age_bins'])
+        working_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(working_dir.cleanup)
+        analyzer.working_dir = working_dir.name
+
+        sim_df = analyzer.reference._dataframe[['Year', 'Gender', 'AgeBin']].assign(
+            Node=PopulationObs.AGGREGATED_NODE, **{HIVAnalyzer.SIM_RESULT_CHANNEL: 0.1})
+        terminated_df = pd.DataFrame({'Year': [1990.5], 'Node': [0], 'Gender': ['Male'], 'AgeBin': ['[15:50)'],
+                                      HIVAnalyzer.SIM_RESULT_CHANNEL: [np.nan],
+                                      HIVAnalyzer.EARLY_TERMINATION_CHANNEL: [1]})
+        completed = analyzer.map(data={analyzer.filenames[0]: sim_df}, item=None)
+        terminated = analyzer.map(data={analyzer.filenames[0]: terminated_df}, item=None)
+        self.assertTrue(terminated['early_terminated'])
+
+        class Simulation(SimpleNamespace):
+            __hash__ = object.__hash__
+
+        def simulation(sim_id, sample):
+            return Simulation(id=sim_id, tags={'__sample_index__': sample})
+
+        # sample 1 has one completed and one early-terminated replicate; any early termination floors the sample
+        results = analyzer.reduce(all_data={simulation('a', 0): completed, simulation('b', 1): completed,
+                                            simulation('c', 1): terminated, simulation('d', 2): terminated})
+        self.assertEqual(list(results.index), [0, 1, 2])
+        self.assertGreater(results[0], HIVAnalyzer.log_float_tiny * 0.5)
+        self.assertEqual(results[1], HIVAnalyzer.log_float_tiny * 0.5)
+        self.assertEqual(results[2], HIVAnalyzer.log_float_tiny * 0.5)
+
+        # early-terminated samples are saved at the floor too, so re-weighting from the saved file scores them alike
+        stratum_likelihoods_path = os.path.join(working_dir.name,
+                                                HIVAnalyzer.construct_stratum_likelihoods_filename(uid=analyzer.uid))
+        stratum_likelihoods = pd.read_csv(stratum_likelihoods_path,
+                                          index_col=['Sample', *analyzer.reference.stratifiers])
+        self.assertEqual(sorted(set(stratum_likelihoods.index.get_level_values('Sample'))), [0, 1, 2])
+        recombined = HIVAnalyzer.combine_stratum_likelihoods(stratum_likelihoods=stratum_likelihoods, weight=0.5)
+        np.testing.assert_allclose(recombined.to_numpy(), results.to_numpy())
+
+        # all simulations terminated early
+        results = analyzer.reduce(all_data={simulation('c', 1): terminated})
+        self.assertEqual(results.to_dict(), {1: HIVAnalyzer.log_float_tiny * 0.5})
+        stratum_likelihoods = pd.read_csv(stratum_likelihoods_path, index_col='Sample')
+        self.assertEqual(set(stratum_likelihoods[HIVAnalyzer.LOG_LIKELIHOOD_CHANNEL]), {HIVAnalyzer.log_float_tiny})
+
     class DummySiteClass(object):
         pass
 
@@ -325,6 +417,55 @@ class TestHIVAnalyzer(unittest.TestCase):
                                                 weight=analyzer_weight)
             self.assertEqual(actual_value, expected_value)
 
+    def test_all_samples_scored_at_once_match_per_sample_scores(self):
+        reference_channel = 'Prevalence'
+        stratifiers = ['Year', 'Province', 'Gender']
+        rows = []
+        for sample in range(3):
+            for replicate in range(2):
+                for year, gender, reference, two_sigma, weight in [(2010, 'Male', 0.10, 0.02, 1),
+                                                                   (2010, 'Female', 0.15, 0.03, 3),
+                                                                   (2012, 'Male', 0.12, 0.01, 0.5)]:
+                    rows.append({'Sample': sample, 'Sim_Id': f'sim-{sample}-{replicate}', 'Year': year,
+                                 'Gender': gender, 'Province': PopulationObs.AGGREGATED_PROVINCE,
+                                 reference_channel: reference, 'two_sigma': two_sigma,
+                                 PopulationObs.WEIGHT_CHANNEL: weight, 'effective_count': 200,
+                                 HIVAnalyzer.SIM_RESULT_CHANNEL: reference + 0.01 * (sample - replicate)})
+        data = pd.DataFrame(rows)
+
+        for distribution_name in ['Gaussian', 'Beta']:
+            distribution = BaseDistribution.from_string(distribution_name)
+            dfw = PopulationObs(dataframe=data, stratifiers=['Sample', 'Sim_Id', *stratifiers])
+            prepared = distribution.prepare(dfw=dfw, channel=reference_channel,
+                                            weight_channel=PopulationObs.WEIGHT_CHANNEL,
+                                            additional_keep=[HIVAnalyzer.SIM_RESULT_CHANNEL])._dataframe
+            all_at_once = HIVAnalyzer._compare_samples(data=prepared.set_index(['Sample', 'Sim_Id']),
+                                                       stratifiers=stratifiers, distribution=distribution,
+                                                       reference_channel=reference_channel,
+                                                       data_channel=HIVAnalyzer.SIM_RESULT_CHANNEL, weight=0.5)
+            for sample, sample_df in prepared.groupby('Sample'):
+                expected = HIVAnalyzer._compare(sample=sample_df, stratifiers=stratifiers, distribution=distribution,
+                                                reference_channel=reference_channel,
+                                                data_channel=HIVAnalyzer.SIM_RESULT_CHANNEL, weight=0.5)
+                self.assertAlmostEqual(all_at_once[sample], expected, places=9)
+
+            # re-weighting saved unweighted likelihoods matches re-scoring with the new weights
+            stratum_likelihoods = HIVAnalyzer._compute_stratum_likelihoods(
+                data=prepared.set_index(['Sample', 'Sim_Id']), stratifiers=stratifiers, distribution=distribution,
+                reference_channel=reference_channel, data_channel=HIVAnalyzer.SIM_RESULT_CHANNEL)
+            new_reference_weights = np.arange(1, len(stratum_likelihoods.index) + 1)
+            reweighted = HIVAnalyzer.combine_stratum_likelihoods(stratum_likelihoods=stratum_likelihoods, weight=2.0,
+                                                                 reference_weights=new_reference_weights)
+            reweighted_df = prepared.merge(
+                stratum_likelihoods.assign(**{PopulationObs.WEIGHT_CHANNEL: new_reference_weights})[
+                    [PopulationObs.WEIGHT_CHANNEL]].reset_index(),
+                on=['Sample', *stratifiers], suffixes=('_old', ''))
+            for sample, sample_df in reweighted_df.groupby('Sample'):
+                expected = HIVAnalyzer._compare(sample=sample_df, stratifiers=stratifiers, distribution=distribution,
+                                                reference_channel=reference_channel,
+                                                data_channel=HIVAnalyzer.SIM_RESULT_CHANNEL, weight=2.0)
+                self.assertAlmostEqual(reweighted[sample], expected, places=9)
+
 # TODO: revive this or remake result
 #     def test_valid_garden_path_setup_regression(self):
 #         # analyzing and comparing answer against pre-refactor analyzer results
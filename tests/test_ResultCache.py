@@ -0,0 +1,57 @@
+import os
+import tempfile
+import time
+import unittest
+
+from emodpy_workflow.lib.utils.result_cache import ResultCache
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(directory=os.path.join(self.temp_dir.name, 'cache'), max_size_mb=1)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_put_and_get(self):
+        key = ('sim-id', 'analyzer-uid', 'reference-hash')
+        self.assertNotIn(key, self.cache)
+        self.assertIsNone(self.cache.get(key=key))
+        self.assertEqual(self.cache.get(key=key, default=42), 42)
+
+        self.cache.put(key=key, value={'a': [1, 2, 3]})
+        self.assertIn(key, self.cache)
+        self.assertEqual(self.cache.get(key=key), {'a': [1, 2, 3]})
+
+        # keys differing in any element are distinct
+        self.assertIsNone(self.cache.get(key=('sim-id', 'analyzer-uid', 'another-reference-hash')))
+
+    def test_prune_evicts_least_recently_used_entries(self):
+        value = b'x' * 400000  # ~0.4MB per entry, so only two fit in the 1MB cache
+        keys = [('sim', index) for index in range(4)]
+        for key in keys:
+            self.cache.put(key=key, value=value)
+            time.sleep(0.01)  # ensure distinct modification times
+
+        # use the oldest entry so it becomes the most recently used one
+        os.utime(self.cache._path_for(key=keys[0]), (time.time() + 10, time.time() + 10))
+
+        n_evicted = self.cache.prune()
+        self.assertEqual(n_evicted, 2)
+        self.assertLessEqual(self.cache.size_mb, self.cache.max_size_mb)
+        self.assertIn(keys[0], self.cache)
+        self.assertIn(keys[3], self.cache)
+        self.assertNotIn(keys[1], self.cache)
+        self.assertNotIn(keys[2], self.cache)
+
+    def test_clear(self):
+        self.cache.put(key='a', value=1)
+        self.cache.clear()
+        self.assertNotIn('a', self.cache)
+        self.assertEqual(self.cache.size_mb, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+from types import SimpleNamespace
+
+import pandas as pd
+
+from emodpy_workflow.lib.calibration.adaptive_replicates import AdaptiveReplicateCalibManager, \
+    AdaptiveReplicateIterationState
+
+
+class TestAdaptiveReplicates(unittest.TestCase):
+
+    def test_samples_within_margin_of_best_are_selected(self):
+        likelihoods = pd.Series([-100.0, -3.0, -12.5, -7.0], index=[0, 1, 2, 3])
+        selected = AdaptiveReplicateIterationState.select_samples(likelihoods=likelihoods, margin=5)
+        self.assertEqual(selected, [1, 3])
+        selected = AdaptiveReplicateIterationState.select_samples(likelihoods=likelihoods, margin=0)
+        self.assertEqual(selected, [1])
+
+    def test_followup_replicates_keep_sample_indices(self):
+        def map_sample(simulation, index, sample):
+            return {'__sample_index__': index, **sample}
+
+        def map_replicate(simulation, value):
+            return {'Run_Number': value}
+
+        manager = SimpleNamespace(sites=[SimpleNamespace(setup_fn=lambda simulation: {})],
+                                  map_replicates_callback=map_replicate,
+                                  map_sample_to_model_input_fn=map_sample)
+        samples = {1: {'x': 0.5}, 3: {'x': 0.25}}
+        builder = AdaptiveReplicateCalibManager.followup_experiment_builder_function(manager, samples=samples,
+                                                                                     n_replicates=2)
+        self.assertEqual(builder.count, 4)
+
+        tags = []
+        for site_fn in builder.sweeps[0]:
+            for replicate_fn in builder.sweeps[1]:
+                for sample_fn in builder.sweeps[2]:
+                    tags.append({**site_fn(None), **replicate_fn(None), **sample_fn(None)})
+        self.assertEqual(sorted((t['__sample_index__'], t['Run_Number']) for t in tags),
+                         [(1, 2), (1, 3), (3, 2), (3, 3)])
+        self.assertEqual({t['__sample_index__']: t['x'] for t in tags}, {1: 0.5, 3: 0.25})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from idmtools.assets import AssetCollection
+from idmtools.core import EntityStatus
+
+from emodpy_workflow.lib.utils.burn_in import burn_in_asset_filename, collect_burn_in_populations, \
+    configure_burn_in, configure_fork, fork_builder, serialization_timestep, validate_fork_overrides, \
+    BURN_IN_FILENAME_TAG, BURN_IN_YEAR_TAG
+
+
+class FakeTask:
+    def __init__(self, **parameters):
+        self.config = SimpleNamespace(parameters=SimpleNamespace(**parameters))
+
+    def set_parameter(self, name, value):
+        setattr(self.config.parameters, name, value)
+        return {name: value}
+
+
+class FakePlatform:
+    def __init__(self, n_samples):
+        self.simulations = [SimpleNamespace(id=f'sim{i}', status=EntityStatus.SUCCEEDED,
+                                            tags={'__sample_index__': str(i), BURN_IN_FILENAME_TAG: 'state-00720.dtk'})
+                            for i in range(n_samples)]
+        self.fetched = []
+
+    def get_item(self, item_id, item_type, force=False):
+        return SimpleNamespace(id=item_id, succeeded=True)
+
+    def get_children(self, item_id, item_type, force=False):
+        return self.simulations
+
+    def get_files(self, item, files):
+        self.fetched.append(item.id)
+        return {files[0]: f'population of {item.id}'.encode()}
+
+
+class TestBurnIn(unittest.TestCase):
+
+    def build_simulation(self):
+        task = FakeTask(Base_Year=1960.5, Simulation_Timestep=30.4166667, Start_Time=0,
+                        Simulation_Duration=91.5 * 365)
+        task.transient_assets = AssetCollection()
+        return SimpleNamespace(task=task)
+
+    def test_serialization_timestep(self):
+        self.assertEqual(serialization_timestep(burn_in_year=2020.5, base_year=1960.5, simulation_timestep=365), 60)
+        self.assertEqual(serialization_timestep(burn_in_year=1970.5, base_year=1960.5, simulation_timestep=30.4166667),
+                         120)
+        self.assertRaises(ValueError, serialization_timestep, burn_in_year=1960, base_year=1960.5,
+                          simulation_timestep=1)
+
+    def test_configure_burn_in(self):
+        simulation = self.build_simulation()
+        tags = configure_burn_in(simulation=simulation, burn_in_year=2020.5)
+        parameters = simulation.task.config.parameters
+        self.assertEqual(parameters.Serialization_Type, 'TIMESTEP')
+        self.assertEqual(parameters.Serialization_Time_Steps, [720])
+        self.assertAlmostEqual(parameters.Simulation_Duration, 720 * 30.4166667)
+        self.assertEqual(tags, {BURN_IN_YEAR_TAG: 2020.5, BURN_IN_FILENAME_TAG: 'state-00720.dtk'})
+
+    def test_configure_fork(self):
+        simulation = self.build_simulation()
+        tags = configure_fork(simulation=simulation, burn_in_year=2020.5, sample_index=3)
+        parameters = simulation.task.config.parameters
+        self.assertEqual(parameters.Serialized_Population_Path, '.')
+        self.assertEqual(parameters.Serialized_Population_Filenames, [burn_in_asset_filename(sample_index=3)])
+        # the fork continues exactly where its burn-in ended
+        self.assertAlmostEqual(parameters.Start_Time, 720 * 30.4166667)
+        self.assertAlmostEqual(parameters.Start_Time + parameters.Simulation_Duration, 91.5 * 365)
+        self.assertEqual(tags, {BURN_IN_YEAR_TAG: 2020.5})
+
+    def test_fork_after_end_of_simulation_is_rejected(self):
+        simulation = self.build_simulation()
+        self.assertRaises(ValueError, configure_fork, simulation=simulation, burn_in_year=2060, sample_index=0)
+
+    def test_fork_receives_only_its_own_population(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        populations = {index: os.path.join(directory.name, burn_in_asset_filename(sample_index=index))
+                       for index in [0, 3]}
+        for path in populations.values():
+            with open(path, 'wb') as f:
+                f.write(b'population')
+        simulation = self.build_simulation()
+        tags = fork_builder(simulation=simulation, inputs_builder=lambda simulation, **kwargs: {'Built': True},
+                            burn_in_year=2020.5, idx=3, burn_in_populations=populations)
+        self.assertEqual(tags, {'Built': True, BURN_IN_YEAR_TAG: 2020.5})
+        self.assertEqual([(asset.filename, asset.absolute_path) for asset in simulation.task.transient_assets],
+                         [(burn_in_asset_filename(sample_index=3), populations[3])])
+
+    def test_collect_burn_in_populations(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        platform = FakePlatform(n_samples=3)
+        populations = collect_burn_in_populations(platform=platform, experiment='exp1', directory=directory.name,
+                                                  sample_indices=[0, 2])
+        self.assertEqual(sorted(populations.keys()), [0, 2])
+        with open(populations[2], 'rb') as f:
+            self.assertEqual(f.read(), b'population of sim2')
+        self.assertEqual(os.path.basename(populations[2]), burn_in_asset_filename(sample_index=2))
+
+        # populations downloaded before are reused, e.g. when resuming
+        populations = collect_burn_in_populations(platform=platform, experiment='exp1', directory=directory.name)
+        self.assertEqual(sorted(populations.keys()), [0, 1, 2])
+        self.assertEqual(platform.fetched, ['sim0', 'sim2', 'sim1'])
+
+    def test_validate_fork_overrides(self):
+        self.assertEqual(validate_fork_overrides(overrides={'Base_Infectivity': 2.0, 'ART_Start_Year': 2030},
+                                                 burn_in_year=2025), [])
+        warnings = validate_fork_overrides(overrides={'ART_Start_Year': 2010, 'Condom_Usage_Year': 2030},
+                                           burn_in_year=2025)
+        self.assertEqual(len(warnings), 1)
+        self.assertIn('ART_Start_Year', warnings[0])
+        self.assertRaises(ValueError, validate_fork_overrides, overrides={'x_Base_Population': 0.5},
+                          burn_in_year=2025)
+
+
+if __name__ == '__main__':
+    unittest.main()
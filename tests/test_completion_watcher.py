@@ -0,0 +1,79 @@
+import unittest
+from types import SimpleNamespace
+
+from idmtools.core import EntityStatus
+
+from emodpy_workflow.lib.utils.completion_watcher import CompletionWatcher
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakePlatform:
+    def __init__(self, clock, finish_times):
+        # experiment id: list of the times each of its simulations finishes at (None: fails at time 0)
+        self.clock = clock
+        self.finish_times = finish_times
+        self.polls = {}
+
+    def get_item(self, item_id, item_type, force=False):
+        return SimpleNamespace(id=item_id, name=f'name_{item_id}',
+                               simulations=[SimpleNamespace(status=EntityStatus.RUNNING)
+                                            for _ in self.finish_times[item_id]])
+
+    def refresh_status(self, item):
+        self.polls.setdefault(item.id, []).append(self.clock.now)
+        for simulation, finish_time in zip(item.simulations, self.finish_times[item.id]):
+            if finish_time is None:
+                simulation.status = EntityStatus.FAILED
+            elif finish_time <= self.clock.now:
+                simulation.status = EntityStatus.SUCCEEDED
+
+
+class TestCompletionWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.platform = FakePlatform(clock=self.clock, finish_times={'slow': [10, 1000], 'fast': [None, 20]})
+        self.watcher = CompletionWatcher(platform=self.platform, min_interval_s=5, max_interval_s=100,
+                                         on_progress=None, sleep=self.clock.sleep, clock=self.clock)
+
+    def test_experiments_complete_in_finishing_order(self):
+        completed = [experiment.id for experiment in self.watcher.completed(experiments=['slow', 'fast'])]
+        self.assertEqual(['fast', 'slow'], completed)
+        self.assertGreaterEqual(self.clock.now, 1000)
+
+    def test_progress_stream(self):
+        updates = [(progress.experiment.id, progress.n_done, progress.n_failed, progress.done)
+                   for progress in self.watcher.progress(experiments=['slow', 'fast'])]
+        self.assertEqual([('slow', 0, 0, False), ('fast', 1, 1, False), ('slow', 1, 0, False),
+                          ('fast', 2, 1, True), ('slow', 2, 0, True)], updates)
+        self.assertEqual('Experiment name_fast (fast): 2/2 simulations done (1 failed)',
+                         str(self.watcher.wait(experiments=['fast'])['fast']))
+
+    def test_polling_backs_off_while_idle(self):
+        self.watcher.wait(experiments=['slow'])
+        intervals = [b - a for a, b in zip(self.platform.polls['slow'], self.platform.polls['slow'][1:])]
+        self.assertEqual(5, intervals[0])
+        self.assertEqual(100, max(intervals))
+        self.assertLess(len(intervals), 20)  # vs. 200 polls at a fixed 5 s interval
+
+    def test_timeout(self):
+        watcher = CompletionWatcher(platform=self.platform, timeout_s=50, on_progress=None,
+                                    sleep=self.clock.sleep, clock=self.clock)
+        with self.assertRaises(TimeoutError):
+            watcher.wait(experiments=['slow'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,9 @@
+import numpy as np
 import pandas as pd
 import unittest
 
+from scipy.stats import norm
+
 from emodpy_workflow.lib.analysis.base_distribution import BaseDistribution
 from emodpy_workflow.lib.analysis.beta_distribution import BetaDistribution
 from emodpy_workflow.lib.analysis.gaussian_distribution import GaussianDistribution
@@ -86,6 +89,74 @@ class TestDistributions(unittest.TestCase):
         distribution.prepare(dfw=dfw, channel='some_value',
                              weight_channel=PopulationObs.WEIGHT_CHANNEL)
 
+    def test_gaussian_compare_supports_row_specific_uncertainty(self):
+        df = pd.DataFrame([{'reference': 0.30, 'result': 0.32, GaussianDistribution.UNCERTAINTY_CHANNEL: 0.05},
+                           {'reference': 0.30, 'result': 0.25, GaussianDistribution.UNCERTAINTY_CHANNEL: 0.10},
+                           {'reference': 0.30, 'result': 0.90, GaussianDistribution.UNCERTAINTY_CHANNEL: 0.0001}])
+        distribution = GaussianDistribution()
+        score = distribution.compare(df=df, reference_channel='reference', data_channel='result')
+
+        # scaled log likelihood is log pdf relative to the pdf peak, shifted up by SCALE_MAX; tiny values are floored
+        sigma = df[GaussianDistribution.UNCERTAINTY_CHANNEL] / 1.96
+        log_pdf = norm.logpdf(df['result'], loc=df['reference'], scale=sigma)
+        peak_log_pdf = norm.logpdf(df['reference'], loc=df['reference'], scale=sigma)
+        expected = np.where(log_pdf > BaseDistribution.SCALE_MIN, log_pdf - peak_log_pdf + BaseDistribution.SCALE_MAX,
+                            BaseDistribution.SCALE_MIN)
+        self.assertAlmostEqual(score, expected.mean(), places=9)
+
+    def test_gaussian_compare_groups_matches_compare(self):
+        df = pd.DataFrame({'group': ['a', 'a', 'b', 'b', 'b'],
+                           'reference': [10.0, 10.0, 5.0, 5.0, 5.0],
+                           'result': [9.0, 11.5, 4.0, 5.5, 7.0],
+                           GaussianDistribution.UNCERTAINTY_CHANNEL: [1.0, 1.0, 2.0, 2.0, 2.0]})
+        dfw = PopulationObs(dataframe=df, stratifiers=['group'])
+        distribution = GaussianDistribution()
+        df = distribution.prepare(dfw=dfw, channel='reference', additional_keep=['result'])._dataframe
+
+        grouped = distribution.compare_groups(df=df, groupby=['group'], reference_channel='reference',
+                                              data_channel='result')
+        for group, group_df in df.groupby('group'):
+            expected = distribution.compare(df=group_df, reference_channel='reference', data_channel='result')
+            self.assertAlmostEqual(grouped[group], expected, places=12)
+
+    #
+    # percentile tests
+    #
+
+    def _verify_batch_percentiles_match_single_percentiles(self, distribution_class, df):
+        ps = [0.02275, 0.5, 0.97725]
+        single_dfw = PopulationObs(dataframe=df)
+        single_channels = [single_dfw.add_percentile_values(channel='some_value', distribution=distribution_class(), p=p)[0]
+                           for p in ps]
+        batch_dfw = PopulationObs(dataframe=df)
+        batch_channels = batch_dfw.add_percentile_values_batch(channel='some_value', distribution=distribution_class(),
+                                                               ps=ps)
+        self.assertEqual(batch_channels, single_channels)
+        self.assertEqual(batch_dfw.derived_items, single_dfw.derived_items)
+        for channel in batch_channels:
+            pd.testing.assert_series_equal(batch_dfw._dataframe[channel], single_dfw._dataframe[channel])
+
+        # percentiles of each row must be non-decreasing with p
+        values = batch_dfw._dataframe[batch_channels].to_numpy()
+        self.assertTrue((values[:, 1:] >= values[:, :-1]).all())
+
+    def test_beta_batch_percentiles(self):
+        df = pd.DataFrame([{'some_value': 0.2, BetaDistribution.COUNT_CHANNEL: 10, PopulationObs.WEIGHT_CHANNEL: 1},
+                           {'some_value': 0.7, BetaDistribution.COUNT_CHANNEL: 250, PopulationObs.WEIGHT_CHANNEL: 1},
+                           {'some_value': 0.01, BetaDistribution.COUNT_CHANNEL: 40, PopulationObs.WEIGHT_CHANNEL: 1}])
+        self._verify_batch_percentiles_match_single_percentiles(distribution_class=BetaDistribution, df=df)
+
+    def test_gaussian_batch_percentiles(self):
+        df = pd.DataFrame([{'some_value': 101.01, GaussianDistribution.UNCERTAINTY_CHANNEL: 1, PopulationObs.WEIGHT_CHANNEL: 1},
+                           {'some_value': 212.12, GaussianDistribution.UNCERTAINTY_CHANNEL: 50.1, PopulationObs.WEIGHT_CHANNEL: 1}])
+        self._verify_batch_percentiles_match_single_percentiles(distribution_class=GaussianDistribution, df=df)
+
+        # the median of a gaussian is its mean
+        dfw = PopulationObs(dataframe=df)
+        median_channel = dfw.add_percentile_values_batch(channel='some_value', distribution=GaussianDistribution(),
+                                                         ps=[0.5])[0]
+        pd.testing.assert_series_equal(dfw._dataframe[median_channel], dfw._dataframe['some_value'], check_names=False)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import pandas as pd
+
+from emodpy_workflow.lib.analysis.download_analyzer_by_experiment_receipt import DownloadAnalyzerByExperimentReceipt
+
+
+class TestDownloadAnalyzerByExperimentReceipt(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.receipt_path = os.path.join(self.directory.name, 'experiment_index.csv')
+        n_experiments = 200
+        receipt = pd.DataFrame({'frame': ['baseline'] * n_experiments,
+                                'experiment_id': [f'exp{i}' for i in range(n_experiments)],
+                                'experiment_name': [f'arm_{i % 10}' for i in range(n_experiments)]})
+        receipt.index.name = 'index'
+        receipt.to_csv(self.receipt_path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_lookups_do_not_scan_the_receipt(self):
+        analyzer = DownloadAnalyzerByExperimentReceipt(filenames=['output/ReportHIVByAgeAndGender.csv'],
+                                                       receipt_file=self.receipt_path)
+        analyzer.receipt = None  # all lookups are precomputed
+
+        simulation = SimpleNamespace(id='sim', tags={'__sample_index__': 7, 'Run_Number': 2},
+                                     experiment=SimpleNamespace(id='exp123'))
+        [path] = analyzer.destination_paths(item=simulation, source_filename='output/ReportHIVByAgeAndGender.csv')
+        self.assertEqual(os.path.join(self.directory.name, 'arm_3--123', 'ReportHIVByAgeAndGender',
+                                      'ReportHIVByAgeAndGender_sample00007_run00002.csv'), path)
+        self.assertEqual(os.path.join(self.directory.name, 'arm_3--123', 'InsetChart'),
+                         analyzer.directory_for_experiment_and_file(experiment_id='exp123',
+                                                                    filename='output/InsetChart.json'))
+
+    def test_filename_infixes(self):
+        analyzer = DownloadAnalyzerByExperimentReceipt(filenames=['output/InsetChart.json'],
+                                                       receipt_file=self.receipt_path, use_run_number=False)
+        tags = {'__sample_index__': 3, 'Run_Number': 1}
+        self.assertEqual('output/InsetChart_sample00003.json',
+                         analyzer._construct_filename(tags, 'output/InsetChart.json'))
+        self.assertEqual('Population_sample00003.csv', analyzer._construct_filename(tags, 'Population.csv'))
+        self.assertRaises(KeyError, analyzer._construct_filename, {'Run_Number': 1}, 'Population.csv')
+
+
+if __name__ == '__main__':
+    unittest.main()
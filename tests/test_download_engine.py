@@ -0,0 +1,151 @@
+import os
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+
+from idmtools.core import EntityStatus
+
+from emodpy_workflow.lib.analysis.download_analyzer_by_experiment import DownloadAnalyzerByExperiment
+from emodpy_workflow.lib.utils.download_engine import DownloadCache, DownloadEngine, DownloadFailedException, \
+    DownloadManifest, EARLY_TERMINATION_PATH
+
+SOURCE = 'output/InsetChart.json'
+
+
+def build_simulation(index, status=EntityStatus.SUCCEEDED):
+    return SimpleNamespace(id=f'sim{index}', status=status, experiment=SimpleNamespace(id='exp1'),
+                           tags={'__sample_index__': index, 'Run_Number': 1})
+
+
+class FakePlatform:
+    def __init__(self, simulations, n_failures=0, early_terminated=()):
+        self.simulations = simulations
+        self.n_failures = n_failures  # number of initial get_files calls per simulation that fail
+        self.early_terminated = early_terminated  # ids of simulations without files but an early termination record
+        self.calls = {}
+        self.requests = []  # (simulation id, file) of every get_files call
+        self.waited = []
+
+    def get_item(self, item_id, item_type, force=False):
+        return SimpleNamespace(id=item_id, name=item_id, simulations=self.simulations)
+
+    def refresh_status(self, item):
+        self.waited.append(item.id)
+
+    def get_children(self, item_id, item_type, force=False):
+        return self.simulations
+
+    def get_files(self, item, files):
+        self.requests.append((item.id, files[0]))
+        if item.id in self.early_terminated:
+            if files == [EARLY_TERMINATION_PATH]:
+                return {files[0]: b'{}'}
+            raise FileNotFoundError(files[0])
+        self.calls[item.id] = self.calls.get(item.id, 0) + 1
+        if self.calls[item.id] <= self.n_failures:
+            raise ConnectionError('transient failure')
+        return {files[0]: f'content of {item.id}'.encode()}
+
+
+class TestDownloadEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.analyzer = DownloadAnalyzerByExperiment(filenames=[SOURCE], output_path=self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_download_and_resume(self):
+        simulations = [build_simulation(index=i) for i in range(3)] + \
+                      [build_simulation(index=3, status=EntityStatus.FAILED)]
+        platform = FakePlatform(simulations=simulations)
+        paths = DownloadEngine(platform=platform, analyzer=self.analyzer, max_workers=2).download(
+            experiment_ids=['exp1'])
+        self.assertEqual(['exp1'], platform.waited)
+        self.assertEqual(3, len(paths))
+        with open(paths[1], 'rb') as f:
+            self.assertEqual(b'content of sim1', f.read())
+        self.assertTrue(paths[0].endswith(os.path.join('exp1', 'InsetChart', 'InsetChart_sample00000_run00001.json')))
+
+        # a second download only fetches what is missing or no longer intact
+        os.remove(paths[0])
+        with open(paths[2], 'wb') as f:
+            f.write(b'truncated')
+        engine = DownloadEngine(platform=platform, analyzer=self.analyzer, max_workers=2)
+        self.assertEqual(paths, engine.download(experiment_ids=['exp1']))
+        self.assertEqual((2, 1), (engine.n_downloaded, engine.n_skipped))
+        self.assertEqual({'sim0': 2, 'sim1': 1, 'sim2': 2}, platform.calls)
+        with open(paths[2], 'rb') as f:
+            self.assertEqual(b'content of sim2', f.read())
+
+    def test_checksum_verification(self):
+        platform = FakePlatform(simulations=[build_simulation(index=0)])
+        path, = DownloadEngine(platform=platform, analyzer=self.analyzer).download(experiment_ids=['exp1'])
+        with open(path, 'wb') as f:
+            f.write(b'content of simX')  # same size, different content
+
+        manifest = DownloadManifest(path=os.path.join(self.directory.name, DownloadManifest.FILENAME))
+        self.assertTrue(manifest.is_complete(path=path))
+        self.assertFalse(manifest.is_complete(path=path, verify_checksum=True))
+        DownloadEngine(platform=platform, analyzer=self.analyzer, verify_checksum=True).download(
+            experiment_ids=['exp1'])
+        self.assertEqual(2, platform.calls['sim0'])
+
+    def test_retries_with_backoff(self):
+        platform = FakePlatform(simulations=[build_simulation(index=0)], n_failures=2)
+        engine = DownloadEngine(platform=platform, analyzer=self.analyzer, max_attempts=3, backoff_s=0.001)
+        self.assertEqual(1, len(engine.download(experiment_ids=['exp1'])))
+        self.assertEqual(3, platform.calls['sim0'])
+
+    def test_failures_are_reported(self):
+        platform = FakePlatform(simulations=[build_simulation(index=i) for i in range(2)], n_failures=5)
+        engine = DownloadEngine(platform=platform, analyzer=self.analyzer, max_attempts=2, backoff_s=0.001)
+        with self.assertRaises(DownloadFailedException) as context:
+            engine.download(experiment_ids=['exp1'])
+        self.assertIn('Could not download 2 files', str(context.exception))
+        self.assertFalse(os.path.exists(os.path.join(self.directory.name, DownloadManifest.FILENAME)))
+
+    def test_early_terminated_simulations_are_skipped(self):
+        platform = FakePlatform(simulations=[build_simulation(index=i) for i in range(2)], early_terminated=['sim1'])
+        with self.assertRaises(DownloadFailedException):
+            DownloadEngine(platform=platform, analyzer=self.analyzer, max_attempts=1).download(experiment_ids=['exp1'])
+
+        engine = DownloadEngine(platform=platform, analyzer=self.analyzer, max_attempts=1, skip_early_terminated=True)
+        paths = engine.download(experiment_ids=['exp1'])
+        self.assertEqual(['sim0'], [record['sim_id'] for record in engine.files])
+        self.assertEqual(1, len(paths))
+        self.assertEqual(1, engine.n_early_terminated)
+
+    def test_missing_files_of_early_terminated_simulations_are_not_retried(self):
+        platform = FakePlatform(simulations=[build_simulation(index=i) for i in range(2)], early_terminated=['sim1'])
+        analyzer = DownloadAnalyzerByExperiment(filenames=[SOURCE, 'output/ReportHIVByAgeAndGender.csv'],
+                                                output_path=self.directory.name)
+        engine = DownloadEngine(platform=platform, analyzer=analyzer, max_attempts=5, backoff_s=60,
+                                skip_early_terminated=True, max_workers=1)
+        start = time.time()
+        engine.download(experiment_ids=['exp1'])
+        self.assertLess(time.time() - start, 10)
+        self.assertEqual(2, engine.n_early_terminated)
+        # each missing file is tried once; the early termination record is checked once per simulation
+        sim1_requests = [file for sim_id, file in platform.requests if sim_id == 'sim1']
+        self.assertEqual([SOURCE, EARLY_TERMINATION_PATH, 'output/ReportHIVByAgeAndGender.csv'], sim1_requests)
+
+    def test_cache_is_shared_between_output_directories(self):
+        platform = FakePlatform(simulations=[build_simulation(index=i) for i in range(2)])
+        cache = DownloadCache(directory=os.path.join(self.directory.name, 'cache'))
+        DownloadEngine(platform=platform, analyzer=self.analyzer, cache=cache).download(experiment_ids=['exp1'])
+        self.assertTrue(os.path.isfile(os.path.join(self.directory.name, 'cache', 'sim0', 'output', 'InsetChart.json')))
+
+        other_analyzer = DownloadAnalyzerByExperiment(filenames=[SOURCE],
+                                                      output_path=os.path.join(self.directory.name, 'other'))
+        paths = DownloadEngine(platform=platform, analyzer=other_analyzer, cache=cache).download(
+            experiment_ids=['exp1'])
+        self.assertEqual({'sim0': 1, 'sim1': 1}, platform.calls)
+        with open(paths[1], 'rb') as f:
+            self.assertEqual(b'content of sim1', f.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
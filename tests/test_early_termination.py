@@ -0,0 +1,115 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import pandas as pd
+
+import emodpy_workflow.lib.utils.project_data as ingest_utils
+import emodpy_workflow.scripts.dtk_in_process as dtk_in_process
+
+from emodpy_workflow.lib.analysis.population_obs import PopulationObs
+from emodpy_workflow.lib.models.emod_hiv import EMOD_HIV
+from emodpy_workflow.lib.utils.runtime import build_checkpoint_bounds
+
+
+class TestEarlyTermination(unittest.TestCase):
+
+    def setUp(self):
+        filename = os.path.join(os.path.dirname(__file__), 'input', 'analyzers', 'valid_ingest_form.xlsm')
+        _, _, self.reference, _, _ = ingest_utils.parse_ingest_data_from_xlsm(filename=filename)
+
+    def test_checkpoint_bounds_from_national_reference_data(self):
+        bounds = build_checkpoint_bounds(reference_data=self.reference, tolerance=2.0)
+        self.assertEqual(list(bounds.keys()), ['Prevalence'])
+
+        df = self.reference._dataframe
+        national = df.loc[(df['Province'] == PopulationObs.AGGREGATED_PROVINCE) & df['Prevalence'].notnull()]
+        self.assertGreater(len(national.index), 0)
+        self.assertEqual(len(bounds['Prevalence']), len(national.index))
+        for checkpoint in bounds['Prevalence']:
+            self.assertLessEqual(checkpoint['Lower'], checkpoint['Upper'])
+            self.assertLessEqual(checkpoint['Upper'], 1.0)
+            self.assertEqual(len(checkpoint['AgeBin']), 2)
+        years = [checkpoint['Year'] for checkpoint in bounds['Prevalence']]
+        self.assertEqual(years, sorted(years))
+
+        self.assertRaises(ValueError, build_checkpoint_bounds, reference_data=self.reference, tolerance=1.0)
+
+    def test_bounds_are_only_shipped_for_early_termination(self):
+        filename = os.path.join(os.path.dirname(__file__), 'input', 'analyzers', 'valid_ingest_form.xlsm')
+        ingest_info, _ = ingest_utils.get_ingest_information(ingest_filename=filename)
+        _, setter = EMOD_HIV._handle_python_processing(channels=ingest_info['channels'],
+                                                       reference_data=ingest_info['reference'],
+                                                       site_info=ingest_info['site_info'], in_processing_path='standard',
+                                                       post_processing_path='standard')
+
+        def shipped(early_termination):
+            task = SimpleNamespace(common_assets=SimpleNamespace(assets=[]))
+            task.common_assets.add_asset = lambda asset, fail_on_duplicate: task.common_assets.assets.append(asset)
+            setter(task=task, early_termination=early_termination)
+            return [asset.filename for asset in task.common_assets.assets]
+
+        # scenario simulations (and burn-ins) run to completion; calibration simulations may end early
+        self.assertNotIn('early_termination_bounds.json', shipped(early_termination=False))
+        self.assertIn('early_termination_bounds.json', shipped(early_termination=True))
+
+    def test_in_processor_finds_violations_of_completed_years_only(self):
+        # two nodes, ages 15 and 30, both genders; 10% prevalence in 1990.5, 60% in 1991.5, 1992.5 in progress
+        rows = []
+        for year, prevalence in [(1990.5, 0.1), (1991.5, 0.6), (1992.5, 0.9)]:
+            for node in [1, 2]:
+                for gender in [0, 1]:
+                    for age in [15, 30]:
+                        rows.append({'Year': year, 'NodeId': node, 'Gender': gender, 'Age': age,
+                                     'Population': 100, 'Infected': 100 * prevalence})
+        data = pd.DataFrame(rows)
+        self.assertAlmostEqual(dtk_in_process.compute_prevalence(data, year=1991.5, gender='Female',
+                                                                 age_bin=[15, 50]), 0.6)
+
+        def checkpoint(year):
+            return {'Channel': 'Prevalence', 'Year': year, 'Gender': 'Both', 'AgeBin': [15, 50],
+                    'Lower': 0.05, 'Upper': 0.2}
+
+        dtk_in_process.checkpoints[:] = [checkpoint(1990.5), checkpoint(1992.5)]
+        self.assertIsNone(dtk_in_process.find_violation(data))
+        # the completed year was checked, the in-progress one is left for later
+        self.assertEqual(dtk_in_process.checkpoints, [checkpoint(1992.5)])
+
+        dtk_in_process.checkpoints[:] = [checkpoint(1991.5)]
+        violation = dtk_in_process.find_violation(data)
+        self.assertAlmostEqual(violation['Value'], 0.6)
+        self.assertEqual(violation['Year'], 1991.5)
+        dtk_in_process.checkpoints[:] = []
+
+    def test_in_processor_reads_only_new_report_rows(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        filename = os.path.join(directory.name, dtk_in_process.by_age_and_gender_filename)
+        dtk_in_process.report_offset, dtk_in_process.report_header, dtk_in_process.report_data = 0, None, None
+        dtk_in_process.checkpoints[:] = [{'Channel': 'Prevalence', 'Year': 1991.5, 'Gender': 'Both',
+                                          'AgeBin': [15, 50], 'Lower': 0.05, 'Upper': 0.2}]
+
+        def row(year):
+            return f'{year},1,0,15,10,100,0\n'
+
+        with open(filename, 'w') as f:
+            f.write('Year,NodeId,Gender,Age,Infected,Population,Newly Infected\n' + row(1990.5) + row(1991.5)
+                    + '1992.5,1,0')  # a partially written line
+        dtk_in_process.check(output_dir=directory.name)
+        self.assertEqual(dtk_in_process.report_data['Year'].tolist(), [1991.5])  # 1990.5 is no longer needed
+        self.assertEqual(dtk_in_process.checkpoints[0]['Year'], 1991.5)  # not complete until a later year is written
+
+        with open(filename, 'a') as f:
+            f.write(',15,10,100,0\n')
+        self.assertEqual(dtk_in_process.read_new_rows(filename)['Year'].tolist(), [1992.5])
+        self.assertIsNone(dtk_in_process.read_new_rows(filename))
+        with open(filename, 'a') as f:
+            f.write(row(1993.5))
+        self.assertEqual(dtk_in_process.read_new_rows(filename)['Infected'].tolist(), [10])
+        dtk_in_process.checkpoints[:] = []
+        dtk_in_process.report_offset, dtk_in_process.report_header, dtk_in_process.report_data = 0, None, None
+
+
+if __name__ == '__main__':
+    unittest.main()
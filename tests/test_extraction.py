@@ -0,0 +1,89 @@
+import json
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import pandas as pd
+
+import emodpy_workflow.scripts.dtk_post_process as dtk_post_process
+from emodpy_workflow.lib.models.emod_hiv import EMOD_HIV
+from emodpy_workflow.lib.utils.runtime import add_extraction_spec_as_asset, validate_extraction_spec
+
+
+class TestExtraction(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        rows = [{'Year': year, 'NodeId': node, 'Gender': gender, 'Age': age, 'Infected': 1, 'Population': 10,
+                 'Newly Infected': node}
+                for year in [1999.5, 2000.5, 2001.5] for node in [1, 2] for gender in [0, 1] for age in [10, 15, 30]]
+        self.report = os.path.join(self.directory.name, 'ReportHIVByAgeAndGender.csv')
+        pd.DataFrame(rows).to_csv(self.report, index=False)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_filtered_extract(self):
+        spec = {'source': 'ReportHIVByAgeAndGender.csv', 'years': [2000, 2002], 'ages': [15, 50],
+                'filters': {'NodeId': [2]}, 'columns': ['Year', 'Gender', 'Age', 'Newly_Infected']}
+        data = dtk_post_process.extract(self.report, spec)
+        self.assertEqual(['Year', 'Gender', 'Age', 'Newly_Infected'], list(data.columns))
+        self.assertEqual(8, len(data))  # 2 years x 2 genders x 2 ages
+        self.assertEqual({2}, set(data['Newly_Infected']))
+
+    def test_aggregated_extract(self):
+        spec = {'source': 'ReportHIVByAgeAndGender.csv', 'columns': ['Infected', 'Population'],
+                'group_by': ['Year', 'Gender'], 'aggregation': 'sum', 'filters': {'Gender': [1]}}
+        data = dtk_post_process.extract(self.report, spec)
+        self.assertEqual(['Year', 'Gender', 'Infected', 'Population'], list(data.columns))
+        self.assertEqual([6, 6, 6], data['Infected'].tolist())  # 2 nodes x 3 ages
+        self.assertEqual([60, 60, 60], data['Population'].tolist())
+
+    def test_unknown_column(self):
+        spec = {'source': 'ReportHIVByAgeAndGender.csv', 'columns': ['On_ART']}
+        self.assertRaises(dtk_post_process.UndefinedChannelException, dtk_post_process.extract, self.report, spec)
+
+    def test_write_extracts(self):
+        spec = {'national': {'source': 'ReportHIVByAgeAndGender.csv', 'group_by': ['Year'],
+                             'columns': ['Infected']}}
+        dtk_post_process.write_extracts(output_dir=self.directory.name, spec=spec)
+        data = pd.read_csv(os.path.join(self.directory.name, 'extract', 'national.csv'))
+        self.assertEqual([12, 12, 12], data['Infected'].tolist())
+
+    def test_spec_validation(self):
+        validate_extraction_spec({'a': {'source': 'ReportHIVByAgeAndGender.csv', 'years': [2000, 2010]}})
+        invalid_specs = [{'a': {'years': [2000, 2010]}},
+                         {'a': {'source': 'x.csv', 'years': [2010, 2000]}},
+                         {'a': {'source': 'x.csv', 'group_by': ['Year'], 'aggregation': 'median'}},
+                         {'a': {'source': 'x.csv', 'aggregation': 'sum'}},
+                         {'a': {'source': 'x.csv', 'year': [2000, 2010]}}]
+        for spec in invalid_specs:
+            self.assertRaises(ValueError, validate_extraction_spec, spec)
+
+        spec_path = os.path.join(self.directory.name, 'extraction_spec.json')
+        with open(spec_path, 'w') as f:
+            json.dump({'a': {'source': 'ReportHIVByAgeAndGender.csv'}}, f)
+        task = SimpleNamespace(common_assets=SimpleNamespace(assets=[]))
+        task.common_assets.add_asset = lambda asset, fail_on_duplicate: task.common_assets.assets.append(asset)
+        add_extraction_spec_as_asset(task=task, spec_path=spec_path)
+        self.assertEqual(['extraction_spec.json'], [asset.filename for asset in task.common_assets.assets])
+
+    def test_spec_is_shipped_without_channels(self):
+        spec_path = os.path.join(self.directory.name, 'extraction_spec.json')
+        with open(spec_path, 'w') as f:
+            json.dump({'a': {'source': 'ReportHIVByAgeAndGender.csv'}}, f)
+        paths, setter = EMOD_HIV._handle_python_processing(post_processing_path='standard',
+                                                           extraction_spec_path=spec_path)
+        self.assertEqual(['dtk_post_process.py'], [os.path.basename(path) for path in paths])
+        task = SimpleNamespace(common_assets=SimpleNamespace(assets=[]))
+        task.common_assets.add_asset = lambda asset, fail_on_duplicate: task.common_assets.assets.append(asset)
+        setter(task=task)
+        self.assertEqual(['extraction_spec.json'], [asset.filename for asset in task.common_assets.assets])
+
+        # no post-processing without channels or extracts
+        self.assertEqual(([], None), EMOD_HIV._handle_python_processing(post_processing_path='standard'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+
+import matplotlib.pyplot as plt
+
+from emodpy_workflow.lib.utils.figure_renderer import FigureRenderer, new_figure
+
+
+class TestFigureRenderer(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_render_formats(self):
+        with FigureRenderer(formats=['png', 'svg'], max_workers=2, bbox_inches='tight') as renderer:
+            for i in range(3):
+                figure, axis = new_figure(2, 1, figsize=(4, 6), sharex=True)
+                axis[0].plot([0, 1], [i, i + 1])
+                renderer.submit(figure=figure, path=os.path.join(self.directory.name, 'figures', f'figure{i}'))
+                self.assertEqual([], figure.axes)  # cleared once submitted
+        self.assertEqual(6, len(renderer.paths))
+        for path in renderer.paths:
+            self.assertGreater(os.path.getsize(path), 0)
+        with open(os.path.join(self.directory.name, 'figures', 'figure2.png'), 'rb') as f:
+            self.assertEqual(b'\x89PNG', f.read(4))
+
+        # headless figures are not tracked (kept alive) by pyplot
+        self.assertEqual([], plt.get_fignums())
+
+    def test_unsupported_format(self):
+        with self.assertRaises(ValueError):
+            FigureRenderer(formats=['png', 'bmp'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from emodpy_workflow.lib.calibration.gp_emulator import GaussianProcess, GPEmulator
+
+
+class TestGPEmulator(unittest.TestCase):
+
+    params = [
+        {'Name': 'x', 'Dynamic': True, 'Guess': 0.1, 'Min': 0.0, 'Max': 1.0},
+        {'Name': 'y', 'Dynamic': True, 'Guess': 0.9, 'Min': -1.0, 'Max': 1.0},
+        {'Name': 'fixed', 'Dynamic': False, 'Guess': 3.0, 'Min': 0.0, 'Max': 10.0}
+    ]
+
+    @staticmethod
+    def log_likelihood(sample):
+        return -50 * ((sample['x'] - 0.7) ** 2 + (sample['y'] + 0.2) ** 2)
+
+    def run_iteration(self, emulator, iteration):
+        samples = emulator.get_samples_for_iteration(iteration=iteration)
+        results = pd.DataFrame({'total': [self.log_likelihood(sample) for sample in samples]})
+        emulator.set_results_for_iteration(iteration=iteration, results=results)
+        return samples
+
+    def test_gaussian_process_interpolates_observations(self):
+        rng = np.random.default_rng(1)
+        x = rng.uniform(size=(20, 2))
+        y = np.sin(3 * x[:, 0]) + x[:, 1]
+        gp = GaussianProcess(seed=1).fit(x, y)
+        mean, std = gp.predict(x)
+        self.assertTrue(np.allclose(mean, y, atol=0.05))
+        self.assertTrue(np.all(std < 0.1))
+
+        # uncertainty grows away from the data and collapses where it is conditioned on
+        far = np.array([[5.0, 5.0]])
+        self.assertGreater(gp.predict(far)[1][0], 0.9 * gp.y_std)
+        gp.condition_on(x=far, y=[0.0])
+        self.assertLess(gp.predict(far)[1][0], 0.1 * gp.y_std)
+
+    def test_samples_respect_bounds_and_static_parameters(self):
+        emulator = GPEmulator(params=self.params, samples_per_iteration=8, n_candidates=500, seed=1)
+        for iteration in range(2):
+            samples = self.run_iteration(emulator=emulator, iteration=iteration)
+            self.assertEqual(len(samples), 8)
+            for sample in samples:
+                self.assertTrue(0.0 <= sample['x'] <= 1.0)
+                self.assertTrue(-1.0 <= sample['y'] <= 1.0)
+                self.assertEqual(sample['fixed'], 3.0)
+        # the guess is part of the initial design
+        self.assertEqual(emulator.data.loc[0, 'x'], 0.1)
+
+    def test_converges_towards_optimum(self):
+        emulator = GPEmulator(params=self.params, samples_per_iteration=8, n_candidates=1000, seed=2)
+        for iteration in range(4):
+            self.run_iteration(emulator=emulator, iteration=iteration)
+
+        best_initial = emulator.data.loc[emulator.data['Iteration'] == 0, 'Results'].max()
+        best_overall = emulator.data['Results'].max()
+        self.assertGreater(best_overall, best_initial)
+        self.assertGreater(best_overall, -0.5)
+
+        final = emulator.get_final_samples()['final_samples']
+        self.assertAlmostEqual(final['x'][0], 0.7, delta=0.1)
+        self.assertAlmostEqual(final['y'][0], -0.2, delta=0.1)
+
+    def test_state_round_trip(self):
+        emulator = GPEmulator(params=self.params, samples_per_iteration=4, n_candidates=200, seed=3)
+        self.run_iteration(emulator=emulator, iteration=0)
+
+        restored = GPEmulator(params=self.params, samples_per_iteration=4, n_candidates=200, seed=3)
+        restored.set_state(state=emulator.get_state(), iteration=1)
+        pd.testing.assert_frame_equal(restored.data, emulator.data)
+        self.assertEqual(len(restored.get_samples_for_iteration(iteration=1)), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
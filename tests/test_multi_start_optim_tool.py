@@ -0,0 +1,70 @@
+import unittest
+
+import pandas as pd
+
+from emodpy_workflow.lib.calibration.multi_start_optim_tool import MultiStartOptimTool
+
+
+class TestMultiStartOptimTool(unittest.TestCase):
+
+    params = [
+        {'Name': 'x', 'Dynamic': True, 'Guess': 0.1, 'Min': 0.0, 'Max': 1.0},
+        {'Name': 'y', 'Dynamic': True, 'Guess': 0.9, 'Min': -1.0, 'Max': 1.0},
+        {'Name': 'fixed', 'Dynamic': False, 'Guess': 3.0, 'Min': 0.0, 'Max': 10.0}
+    ]
+
+    @staticmethod
+    def log_likelihood(sample):
+        return -50 * ((sample['x'] - 0.7) ** 2 + (sample['y'] + 0.2) ** 2)
+
+    def run_iteration(self, algorithm, iteration):
+        samples = algorithm.get_samples_for_iteration(iteration=iteration)
+        results = pd.DataFrame({'total': [self.log_likelihood(sample) for sample in samples]})
+        algorithm.set_results_for_iteration(iteration=iteration, results=results)
+        return samples
+
+    def test_starts_are_distinct_and_first_keeps_guess(self):
+        start_params = MultiStartOptimTool.choose_start_params(params=self.params, n_starts=3, seed=1)
+        self.assertEqual(start_params[0], self.params)
+        guesses = {(p[0]['Guess'], p[1]['Guess']) for p in start_params}
+        self.assertEqual(len(guesses), 3)
+        for params in start_params:
+            self.assertEqual(params[2]['Guess'], 3.0)
+            self.assertTrue(0.0 <= params[0]['Guess'] <= 1.0)
+            self.assertTrue(-1.0 <= params[1]['Guess'] <= 1.0)
+
+    def test_samples_and_results_are_split_by_start(self):
+        algorithm = MultiStartOptimTool(params=self.params, n_starts=3, samples_per_start=5, center_repeats=1,
+                                        mu_r=0.1, sigma_r=0.01, seed=1)
+        samples = self.run_iteration(algorithm=algorithm, iteration=0)
+        self.assertEqual(len(samples), 15)
+
+        # each start's center repeat is the first of its block of samples
+        for index, start_params in enumerate(algorithm.start_params):
+            center = samples[index * 5]
+            self.assertAlmostEqual(center['x'], start_params[0]['Guess'])
+            scored = algorithm.starts[index].data['Results'].tolist()
+            self.assertEqual(scored, [self.log_likelihood(s) for s in samples[index * 5:(index + 1) * 5]])
+
+        for iteration in range(1, 3):
+            self.assertEqual(len(self.run_iteration(algorithm=algorithm, iteration=iteration)), 15)
+        self.assertEqual(algorithm.summarize_starts().shape, (3, 3))
+
+        final = algorithm.get_final_samples()['final_samples']
+        best_center = algorithm.starts[algorithm.best_start()].get_final_samples()['final_samples']
+        self.assertEqual(final, best_center)
+
+    def test_state_round_trip(self):
+        algorithm = MultiStartOptimTool(params=self.params, n_starts=2, samples_per_start=4, center_repeats=1, seed=2)
+        self.run_iteration(algorithm=algorithm, iteration=0)
+
+        restored = MultiStartOptimTool(params=self.params, n_starts=2, samples_per_start=4, center_repeats=1, seed=2)
+        restored.set_state(state=algorithm.get_state(), iteration=1)
+        self.assertEqual(len(restored.get_samples_for_iteration(iteration=1)), 8)
+
+        mismatched = MultiStartOptimTool(params=self.params, n_starts=3, samples_per_start=4, center_repeats=1)
+        self.assertRaises(ValueError, mismatched.set_state, state=algorithm.get_state(), iteration=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
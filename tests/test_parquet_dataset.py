@@ -0,0 +1,132 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from idmtools.core import EntityStatus
+
+from emodpy_workflow.lib.analysis.download_analyzer_by_experiment import DownloadAnalyzerByExperiment
+from emodpy_workflow.lib.utils.download_engine import DownloadEngine
+from emodpy_workflow.lib.utils.parquet_dataset import ParquetDatasetTarget, read_dataset, STAGING_DIRECTORY
+
+SOURCE = 'output/ReportHIVByAgeAndGender.csv'
+
+
+class FakePlatform:
+    def __init__(self, simulations, contents=None):
+        self.simulations = simulations
+        self.contents = {} if contents is None else contents  # simulation id: file content, instead of the default
+        self.fetched = []
+
+    def get_item(self, item_id, item_type, force=False):
+        return SimpleNamespace(id=item_id, name=item_id, simulations=self.get_children(item_id, item_type))
+
+    def refresh_status(self, item):
+        pass
+
+    def get_children(self, item_id, item_type, force=False):
+        return [simulation for simulation in self.simulations if simulation.experiment.id == item_id]
+
+    def get_files(self, item, files):
+        self.fetched.append(item.id)
+        if item.id in self.contents:
+            return {files[0]: self.contents[item.id]}
+        sample_index = item.tags['__sample_index__']
+        year_rows = '\n'.join(f'{year},{sample_index * 100 + year - 2000}' for year in range(2000, 2005))
+        return {files[0]: f'Year,Infected\n{year_rows}\n'.encode()}
+
+
+class TestParquetDataset(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_only_csv_files(self):
+        analyzer = DownloadAnalyzerByExperiment(filenames=[SOURCE, 'output/InsetChart.json'],
+                                                output_path=self.directory.name)
+        with self.assertRaises(ValueError):
+            ParquetDatasetTarget(analyzer=analyzer)
+
+    @staticmethod
+    def build_simulations(experiment_ids):
+        return [SimpleNamespace(id=f'sim{i}', status=EntityStatus.SUCCEEDED,
+                                experiment=SimpleNamespace(id=experiment_id),
+                                tags={'__sample_index__': i, 'Run_Number': 1})
+                for i, experiment_id in enumerate(experiment_ids)]
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'requires pyarrow')
+    def test_download_into_dataset(self):
+        simulations = self.build_simulations(experiment_ids=['exp1', 'exp1', 'exp2'])
+        analyzer = DownloadAnalyzerByExperiment(filenames=[SOURCE], output_path=self.directory.name)
+        target = ParquetDatasetTarget(analyzer=analyzer)
+        paths = DownloadEngine(platform=FakePlatform(simulations=simulations), analyzer=analyzer,
+                               target=target).download(experiment_ids=['exp1', 'exp2'])
+        # one compacted file per experiment and channel; no staged part files are left
+        self.assertEqual(2, len(paths))
+        self.assertTrue(paths[0].endswith(os.path.join('experiment=exp1', 'channel=ReportHIVByAgeAndGender',
+                                                       'part-00000.parquet')))
+        staging = os.path.join(target.dataset_path, STAGING_DIRECTORY)
+        self.assertEqual([], [filenames for _, _, filenames in os.walk(staging) if len(filenames) > 0])
+
+        df = read_dataset(dataset_path=target.dataset_path, channel='ReportHIVByAgeAndGender')
+        self.assertEqual(15, len(df))
+        self.assertEqual({'sim0', 'sim1', 'sim2'}, set(df['sim_id']))
+
+        df = read_dataset(dataset_path=target.dataset_path, channel='ReportHIVByAgeAndGender', experiments=['exp1'],
+                          filters=[('Year', '>=', 2003)], columns=['Year', 'Infected', 'sample_index'])
+        self.assertEqual(['experiment', 'Year', 'Infected', 'sample_index'], list(df.columns))
+        self.assertEqual([3, 4, 103, 104], sorted(df['Infected']))
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'requires pyarrow')
+    def test_resumed_download_adds_to_compacted_files(self):
+        simulations = self.build_simulations(experiment_ids=['exp1', 'exp1', 'exp1'])
+        analyzer = DownloadAnalyzerByExperiment(filenames=[SOURCE], output_path=self.directory.name)
+        platform = FakePlatform(simulations=simulations[:2])
+        DownloadEngine(platform=platform, analyzer=analyzer,
+                       target=ParquetDatasetTarget(analyzer=analyzer)).download(experiment_ids=['exp1'])
+
+        # compacted simulations are not downloaded again
+        platform = FakePlatform(simulations=simulations)
+        target = ParquetDatasetTarget(analyzer=analyzer)
+        engine = DownloadEngine(platform=platform, analyzer=analyzer, target=target)
+        paths = engine.download(experiment_ids=['exp1'])
+        self.assertEqual(['sim2'], platform.fetched)
+        self.assertEqual(1, len(paths))
+        self.assertEqual({paths[0]}, {record['path'] for record in engine.files})
+        df = read_dataset(dataset_path=target.dataset_path, channel='ReportHIVByAgeAndGender')
+        self.assertEqual(15, len(df))
+        self.assertEqual([5, 5, 5], df.groupby('sim_id').size().tolist())
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'requires pyarrow')
+    def test_channel_schema_is_pinned(self):
+        simulations = self.build_simulations(experiment_ids=['exp1', 'exp1', 'exp2', 'exp2'])
+        contents = {'sim1': b'Year,Infected\n2000.5,1.5\n',  # fractional values in otherwise integer columns
+                    'sim2': b'Year,Infected,EarlyTermination\n2001,,1\n',  # early termination placeholder
+                    'sim3': b'Year\n2002\n'}  # a missing column
+        analyzer = DownloadAnalyzerByExperiment(filenames=[SOURCE], output_path=self.directory.name)
+        target = ParquetDatasetTarget(analyzer=analyzer)
+        DownloadEngine(platform=FakePlatform(simulations=simulations, contents=contents), analyzer=analyzer,
+                       target=target, max_workers=1).download(experiment_ids=['exp1', 'exp2'])
+        schema = target.schema(channel='ReportHIVByAgeAndGender')
+        self.assertEqual(['Year', 'Infected', 'sample_index', 'run_number', 'sim_id'], schema.names)
+        self.assertEqual(['double', 'double', 'int64', 'int64', 'string'], [str(field.type) for field in schema])
+
+        df = read_dataset(dataset_path=target.dataset_path, channel='ReportHIVByAgeAndGender')
+        self.assertNotIn('EarlyTermination', df.columns)
+        self.assertEqual({'sim0': 5, 'sim1': 1, 'sim3': 1}, df.groupby('sim_id').size().to_dict())
+        self.assertTrue(df.loc[df['sim_id'] == 'sim3', 'Infected'].isna().all())
+
+        unknown = FakePlatform(simulations=[SimpleNamespace(
+            id='sim4', status=EntityStatus.SUCCEEDED, experiment=SimpleNamespace(id='exp3'),
+            tags={'__sample_index__': 4, 'Run_Number': 1})], contents={'sim4': b'Year,Infected,Other\n2000,1,2\n'})
+        with self.assertRaises(Exception):
+            DownloadEngine(platform=unknown, analyzer=analyzer, target=ParquetDatasetTarget(analyzer=analyzer),
+                           max_attempts=1).download(experiment_ids=['exp3'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import os
+import tempfile
+import unittest
+from argparse import Namespace
+from pathlib import Path
+from unittest import mock
+
+import matplotlib
+matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from emodpy_workflow.lib.analysis.channel import Channel  # noqa: E402
+from emodpy_workflow.scripts import download  # noqa: E402
+from emodpy_workflow.scripts.plot_sims_with_reference import LineBatch, SimulationEnvelope, download_args, \
+    make_and_plot_envelope, read_sim_results, select_channel_files  # noqa: E402
+
+
+def build_sim_data(offset, years=(2000, 2001, 2002)):
+    rows = [{'AgeBin': '[15:50)', 'Province': province, 'Gender': gender, 'Year': year,
+             'Result': offset + year - 2000}
+            for province in ['North', 'All'] for gender in ['Male', 'Female'] for year in years]
+    return pd.DataFrame(rows)
+
+
+class TestSimulationEnvelope(unittest.TestCase):
+
+    def tearDown(self):
+        plt.close('all')
+
+    def test_quantiles(self):
+        envelope = SimulationEnvelope()
+        for offset in range(101):
+            envelope.add(build_sim_data(offset=offset))
+        df = envelope.quantiles(quantiles=[0.0, 0.5, 1.0])
+        self.assertEqual(101, envelope.n_sims)
+        self.assertEqual(12, len(df))
+        self.assertEqual([0.0, 50.0, 100.0], df.loc[('[15:50)', 'North', 'Male', 2000)].tolist())
+        self.assertEqual([2.0, 52.0, 102.0], df.loc[('[15:50)', 'All', 'Female', 2002)].tolist())
+
+    def test_quantiles_of_sims_with_missing_data(self):
+        envelope = SimulationEnvelope()
+        envelope.add(build_sim_data(offset=0))
+        envelope.add(build_sim_data(offset=10, years=(2000, 2001)))
+        df = envelope.quantiles(quantiles=[0.5])
+        self.assertEqual(5.0, df.loc[('[15:50)', 'North', 'Male', 2000), 0.5])
+        self.assertEqual(2.0, df.loc[('[15:50)', 'North', 'Male', 2002), 0.5])
+
+    def test_artists_do_not_scale_with_sims(self):
+        n_artists = []
+        for n_sims in [5, 50]:
+            envelope = SimulationEnvelope()
+            for offset in np.linspace(0, 1, n_sims):
+                envelope.add(build_sim_data(offset=offset))
+            figure_dict = {}
+            make_and_plot_envelope(envelope=envelope, provinces=['North', 'All'], figure_dict=figure_dict)
+            axes = figure_dict['[15:50)']['axis']
+            n_artists.append(sum(len(axis.collections) + len(axis.lines) for axis in axes))
+        self.assertEqual(n_artists[0], n_artists[1])
+        self.assertEqual(2 * 2 * 3, n_artists[0])  # per province and gender: two bands and a median line
+
+
+class TestBatchedSimPlotting(unittest.TestCase):
+
+    def tearDown(self):
+        plt.close('all')
+
+    def test_one_line_collection_per_axis(self):
+        lines = LineBatch()
+        for offset in range(20):
+            lines.add(groups=build_sim_data(offset=offset).groupby(['AgeBin', 'Province', 'Gender']),
+                      channel='Result')
+            lines.add(groups=build_sim_data(offset=offset, years=(2000,)).groupby(['AgeBin', 'Province', 'Gender']),
+                      channel='Result')
+        figure_dict = {}
+        lines.draw(provinces=['North', 'All'], figure_dict=figure_dict, alpha=0.1)
+        for axis in figure_dict['[15:50)']['axis']:
+            line_collection, points = axis.collections
+            self.assertEqual(40, len(line_collection.get_segments()))  # 20 sims, 2 genders
+            self.assertEqual((40, 2), points.get_offsets().shape)
+            self.assertEqual(0, len(axis.lines))
+
+    def test_read_sim_results_in_order(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filenames = []
+            for i in range(10):
+                filenames.append(os.path.join(directory, f'Prevalence_sample{i:05d}.csv'))
+                if i != 3:
+                    build_sim_data(offset=i).iloc[::-1].to_csv(filenames[-1], index=False)
+            results = list(read_sim_results(filenames, pop_filenames=None, n_readers=2, node_map={},
+                                            time_conditions=[], census_population=None, census_year=None,
+                                            census_min_age=None, census_max_age=None))
+        self.assertEqual(filenames, [fn for fn, _ in results])
+        self.assertIsNone(results[3][1])
+        self.assertEqual([9, 10, 11], sorted(results[9][1]['Result'].unique())[:3])
+        self.assertTrue(results[9][1]['Year'].is_monotonic_increasing)
+
+
+class TestSelectChannelFiles(unittest.TestCase):
+
+    def setUp(self):
+        # all channels of a plot are downloaded together
+        self.downloaded = [os.path.join('out', experiment, channel, f'{channel}_sample{i:05d}_run00001.csv')
+                           for experiment in ['exp2', 'exp1'] for channel in ['Prevalence', 'PrevalenceAdult',
+                                                                              'Population', 'OnART']
+                           for i in range(3)]
+
+    def test_select_channel_files(self):
+        prevalence, population = select_channel_files(channel=Channel(name='Prevalence', type='fraction'),
+                                                      downloaded_filepaths=self.downloaded)
+        self.assertEqual(6, len(prevalence))
+        self.assertTrue(all(os.path.basename(fn).startswith('Prevalence_') for fn in prevalence))
+        self.assertEqual(os.path.join('out', 'exp1', 'Prevalence', 'Prevalence_sample00000_run00001.csv'),
+                         prevalence[0])
+
+        on_art, population = select_channel_files(channel=Channel(name='OnART', type='count'),
+                                                  downloaded_filepaths=self.downloaded)
+        self.assertEqual([fn.replace('OnART', 'Population') for fn in on_art], population)
+
+    def test_missing_population_files(self):
+        with self.assertRaises(Exception):
+            select_channel_files(channel=Channel(name='OnART', type='count'),
+                                 downloaded_filepaths=[fn for fn in self.downloaded if 'Population' not in fn])
+
+
+class TestDownloadArgs(unittest.TestCase):
+
+    def test_download_args_are_accepted_by_download(self):
+        args = Namespace(platform='SLURM', output_dir='plots', cache_dir=None, samples_file=None, experiment_id='exp1')
+        output_file_paths = [Path('output', 'post_process', 'Prevalence.csv')]
+        with mock.patch.object(download, 'Platform'), \
+                mock.patch.object(download, 'download_experiments', return_value=[]) as download_experiments:
+            download.main(args=download_args(args=args, output_file_paths=output_file_paths))
+        kwargs = download_experiments.call_args.kwargs
+        self.assertEqual(['exp1'], kwargs['experiment_ids'])
+        self.assertEqual([os.path.join('output', 'post_process', 'Prevalence.csv')], kwargs['analyzer'].filenames)
+        self.assertEqual(os.path.join('plots', 'download_cache'), kwargs['cache_dir'])
+        self.assertFalse(kwargs['skip_early_terminated'])
+
+
+if __name__ == '__main__':
+    unittest.main()
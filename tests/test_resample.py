@@ -0,0 +1,93 @@
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+from idmtools_calibra.iteration_state import IterationState
+
+from emodpy_workflow.scripts.resample import BEST, ROULETTE, iteration_history, resample, selection_probabilities, \
+    sort_by_likelihood, weighted_sample_without_replacement
+
+
+def build_iteration(calibration_directory, iteration_number, likelihoods, n_replicates=2):
+    n_samples = len(likelihoods)
+    simulations = {f'sim{iteration_number}_{i}_{run}': {'__sample_index__': i, 'Run_Number': run}
+                   for run in range(1, n_replicates + 1) for i in reversed(range(n_samples))}
+    return IterationState(iteration=iteration_number, calibration_directory=calibration_directory,
+                          samples_for_this_iteration={'Condom_Usage': [0.1 * i for i in range(n_samples)],
+                                                      'Base_Infectivity': [i + 1 for i in range(n_samples)]},
+                          results={'prevalence': list(likelihoods), 'total': list(likelihoods)},
+                          simulations=simulations)
+
+
+def build_history(likelihoods):
+    return pd.DataFrame({'Condom_Usage': np.arange(len(likelihoods)), 'iteration_number': 0,
+                         'run_number': 1, 'sim_id': [f'sim{i}' for i in range(len(likelihoods))],
+                         'likelihood': likelihoods})
+
+
+class TestResample(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_iteration_history_matches_parameter_sets(self):
+        iteration = build_iteration(calibration_directory=self.directory.name, iteration_number=2,
+                                    likelihoods=[-3.0, -1.0, -2.0])
+        iteration.samples_for_this_iteration = pd.DataFrame(iteration.samples_for_this_iteration).to_dict('records')
+        expected = pd.DataFrame([ps.to_dict() for ps in iteration.get_parameter_sets_with_likelihoods()])
+        pd.testing.assert_frame_equal(expected, iteration_history(iteration=iteration), check_dtype=False)
+
+    def test_iteration_history_requires_simulations(self):
+        iteration = build_iteration(calibration_directory=self.directory.name, iteration_number=0,
+                                    likelihoods=[-3.0, -1.0])
+        del iteration.simulations['sim0_1_1'], iteration.simulations['sim0_1_2']
+        with self.assertRaises(Exception):
+            iteration_history(iteration=iteration)
+
+    def test_best(self):
+        history = build_history(likelihoods=[-5.0, -1.0, np.nan, -3.0, -1.0])
+        self.assertEqual(['sim1', 'sim4', 'sim3', 'sim0', 'sim2'], sort_by_likelihood(history)['sim_id'].tolist())
+        samples = resample(history=history, n_samples=2, resample_method=BEST)
+        self.assertEqual(['sim1', 'sim4'], samples['sim_id'].tolist())
+        self.assertEqual([0, 1], samples['parameterization_id'].tolist())
+
+    def test_roulette_can_select_the_least_likely(self):
+        # the least likely parameter set used to be excluded from roulette selection
+        history = build_history(likelihoods=[-1.0, -2.0, -3.0])
+        samples = resample(history=history, n_samples=3, resample_method=ROULETTE, rng=np.random.default_rng(0))
+        self.assertEqual(['sim0', 'sim1', 'sim2'], sorted(samples['sim_id']))
+        self.assertEqual('sim0', samples['sim_id'].iloc[0])
+
+    def test_selection_probabilities_are_stable(self):
+        p = selection_probabilities(log_likelihoods=[-2000.0, -2000.0 + np.log(3), np.nan, -np.inf])
+        np.testing.assert_allclose([0.25, 0.75, 0.0, 0.0], p)
+        p = selection_probabilities(log_likelihoods=[1000.0, 1000.0])
+        np.testing.assert_allclose([0.5, 0.5], p)
+        with self.assertRaises(ValueError):
+            selection_probabilities(log_likelihoods=[-np.inf, np.nan])
+
+    def test_weighted_sample_without_replacement(self):
+        rng = np.random.default_rng(1)
+        p = np.array([0.5, 0.3, 0.2, 0.0])
+        selections = np.array([weighted_sample_without_replacement(probabilities=p, size=2, rng=rng)
+                               for _ in range(20000)])
+        self.assertFalse(np.any(selections == 3))
+        self.assertFalse(np.any(selections[:, 0] == selections[:, 1]))
+        np.testing.assert_allclose(p[:3], np.bincount(selections[:, 0], minlength=3) / len(selections), atol=0.02)
+        with self.assertRaises(ValueError):
+            weighted_sample_without_replacement(probabilities=p, size=4, rng=rng)
+
+    def test_large_history(self):
+        rng = np.random.default_rng(2)
+        history = build_history(likelihoods=rng.normal(loc=-5000, scale=50, size=10 ** 6))
+        samples = resample(history=history, n_samples=3000, resample_method=ROULETTE, rng=rng)
+        self.assertEqual(3000, samples['sim_id'].nunique())
+        self.assertEqual(history['likelihood'].max(), samples['likelihood'].iloc[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import json
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from idmtools.assets import Asset, AssetCollection
+from idmtools.core import EntityStatus
+
+from emodpy_workflow.lib.utils.resource_profile import ResourceProfile, ResourceRequest, apply_resource_request, \
+    simulation_size, RESOURCE_USAGE_FILENAME
+
+
+def build_simulation(simulation_id, node_populations, base_population=1.0, duration=3650.0, directory=None):
+    demographics = json.dumps({'Nodes': [{'NodeAttributes': {'InitialPopulation': population}}
+                                         for population in node_populations]})
+    if directory is None:
+        asset = Asset(filename='demographics.json', content=demographics)
+    else:
+        # as emodpy writes the demographics built for each simulation: to a randomly named temporary file
+        with tempfile.NamedTemporaryFile(mode='w', dir=directory, suffix='.json', delete=False) as f:
+            f.write(demographics)
+        asset = Asset(absolute_path=f.name)
+    parameters = SimpleNamespace(Simulation_Duration=duration, x_Base_Population=base_population,
+                                 Demographics_Filenames=[f'Demographics/{asset.filename}'])
+    task = SimpleNamespace(config=SimpleNamespace(parameters=parameters),
+                           transient_assets=AssetCollection([asset]),
+                           common_assets=AssetCollection())
+    return SimpleNamespace(id=simulation_id, task=task)
+
+
+class FakePlatform:
+    def __init__(self, simulations, usages):
+        self.simulations = simulations  # experiment id: list of simulations with a status
+        self.usages = usages  # simulation id: resource usage dict
+
+    def get_children(self, item_id, item_type, force=False):
+        if item_id not in self.simulations:
+            raise ConnectionError(item_id)
+        return self.simulations[item_id]
+
+    def get_files(self, item, files):
+        if item.id not in self.usages:
+            raise FileNotFoundError(files[0])
+        return {RESOURCE_USAGE_FILENAME: json.dumps(self.usages[item.id]).encode()}
+
+
+class TestResourceProfile(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'resource_profile.csv')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_simulation_size(self):
+        simulation = build_simulation(simulation_id='sim', node_populations=[1000, 3000], base_population=0.5)
+        self.assertEqual((2000.0, 3650.0), simulation_size(simulation))
+
+    def test_simulation_size_parses_shared_demographics_once(self):
+        simulations = [build_simulation(simulation_id=f'sim{i}', node_populations=[1000],
+                                        directory=self.directory.name) for i in range(3)]
+        self.assertEqual(3, len({simulation.task.transient_assets.assets[0].filename for simulation in simulations}))
+        populations = {}
+        for simulation in simulations:
+            self.assertEqual((1000.0, 3650.0), simulation_size(simulation, populations=populations))
+        self.assertEqual(1, len(populations))
+        # a cached population is used without parsing the demographics again
+        key = list(populations.keys())[0]
+        populations[key] = 5
+        self.assertEqual((5.0, 3650.0), simulation_size(simulations[0], populations=populations))
+
+    def test_update_measures_succeeded_simulations_only(self):
+        profile = ResourceProfile(path=self.path)
+        simulations = [build_simulation(simulation_id=f'sim{i}', node_populations=[1000]) for i in range(3)]
+        profile.add(frame='baseline', experiment_id='exp1', simulations=simulations)
+
+        statuses = [EntityStatus.SUCCEEDED, EntityStatus.FAILED, EntityStatus.SUCCEEDED]
+        platform = FakePlatform(
+            simulations={'exp1': [SimpleNamespace(id=f'sim{i}', status=status) for i, status in enumerate(statuses)]},
+            usages={'sim0': {'peak_rss_mb': 500.0, 'walltime_s': 100.0}})
+        self.assertEqual(1, profile.update(platform=platform))
+        profile.save()
+
+        # the failed simulation and the one without a usage record are dropped
+        reloaded = ResourceProfile(path=self.path)
+        self.assertEqual(['sim0'], reloaded.profile['simulation_id'].tolist())
+        self.assertEqual(500.0, reloaded.profile['peak_rss_mb'].iloc[0])
+
+    def test_update_waits_for_running_experiments(self):
+        profile = ResourceProfile(path=self.path)
+        profile.add(frame='baseline', experiment_id='exp1',
+                    simulations=[build_simulation(simulation_id=f'sim{i}', node_populations=[1000]) for i in range(2)])
+        platform = FakePlatform(simulations={'exp1': [SimpleNamespace(id='sim0', status=EntityStatus.SUCCEEDED),
+                                                      SimpleNamespace(id='sim1', status=EntityStatus.RUNNING)]},
+                                usages={'sim0': {'peak_rss_mb': 500.0, 'walltime_s': 100.0}})
+        self.assertEqual(0, profile.update(platform=platform))
+        self.assertEqual(2, len(profile.profile))
+
+    def test_update_keeps_unretrievable_experiments(self):
+        profile = ResourceProfile(path=self.path)
+        profile.add(frame='baseline', experiment_id='exp1',
+                    simulations=[build_simulation(simulation_id='sim0', node_populations=[1000])])
+        self.assertEqual(0, profile.update(platform=FakePlatform(simulations={}, usages={})))
+        self.assertEqual(['sim0'], profile.profile['simulation_id'].tolist())
+
+        # measured once the experiment can be retrieved again
+        platform = FakePlatform(simulations={'exp1': [SimpleNamespace(id='sim0', status=EntityStatus.SUCCEEDED)]},
+                                usages={'sim0': {'peak_rss_mb': 500.0, 'walltime_s': 100.0}})
+        self.assertEqual(1, profile.update(platform=platform))
+        self.assertEqual(500.0, profile.profile['peak_rss_mb'].iloc[0])
+
+    def test_prediction(self):
+        profile = ResourceProfile(path=self.path)
+        populations = [1000, 2000, 3000, 4000, 5000]
+        simulations = [build_simulation(simulation_id=f'sim{i}', node_populations=[population])
+                       for i, population in enumerate(populations)]
+        self.assertIsNone(profile.request_for(frame='baseline', simulations=simulations[:1]))
+
+        profile.add(frame='baseline', experiment_id='exp1', simulations=simulations)
+        platform = FakePlatform(
+            simulations={'exp1': [SimpleNamespace(id=f'sim{i}', status=EntityStatus.SUCCEEDED)
+                                  for i in range(len(populations))]},
+            usages={f'sim{i}': {'peak_rss_mb': 100 + population / 10, 'walltime_s': population}
+                    for i, population in enumerate(populations)})
+        profile.update(platform=platform)
+
+        # memory is 100 MB + 0.1 MB/person and walltime 1 s/person (per 3650 days), plus headroom
+        request = profile.predict(frame='baseline', population=10000, duration=3650.0)
+        self.assertAlmostEqual(1100 * ResourceProfile.HEADROOM, request.memory_mb, delta=1)
+        self.assertAlmostEqual(20000 * ResourceProfile.HEADROOM, profile.predict(
+            frame='baseline', population=10000, duration=7300.0).walltime_s, delta=1)
+        self.assertIsNone(profile.predict(frame='other', population=10000, duration=3650.0))
+
+        # an experiment requests enough for its largest simulation
+        larger = build_simulation(simulation_id='larger', node_populations=[20000])
+        self.assertEqual(profile.predict(frame='baseline', population=20000, duration=3650.0),
+                         profile.request_for(frame='baseline', simulations=simulations + [larger]))
+
+    def test_apply_resource_request(self):
+        request = ResourceRequest(memory_mb=2048, walltime_s=90061)
+        self.assertEqual('1-01:01:01', request.slurm_time)
+
+        slurm = SimpleNamespace(mem=None, mem_per_cpu=4096, time='02:00:00')
+        self.assertEqual({'mem': 2048, 'mem_per_cpu': None, 'time': '1-01:01:01'},
+                         apply_resource_request(platform=slurm, request=request))
+        self.assertEqual((2048, None, '1-01:01:01'), (slurm.mem, slurm.mem_per_cpu, slurm.time))
+
+        comps = SimpleNamespace(num_cores=1)
+        self.assertEqual({}, apply_resource_request(platform=comps, request=request))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from emodpy_workflow.lib.utils.results_catalog import ResultsCatalog
+from emodpy_workflow.scripts.catalog import parse_overrides, parse_sample_indices
+
+
+class TestResultsCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.receipt_path = os.path.join(self.directory.name, 'run', 'experiment_index.csv')
+        os.makedirs(os.path.dirname(self.receipt_path))
+        receipt = pd.DataFrame({'frame': ['baseline', 'baseline'],
+                                'experiment_id': ['exp0', 'exp1'],
+                                'experiment_name': ['status_quo', 'condoms'],
+                                'Condom_Usage_Max': [None, 0.5]})
+        receipt.index.name = 'index'
+        receipt.to_csv(self.receipt_path)
+        self.catalog = ResultsCatalog(path=os.path.join(self.directory.name, 'catalog.db'))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def add_files(self, directory_name, n_samples, channel='Prevalence'):
+        directory = os.path.join(self.directory.name, 'run', directory_name)
+        self.catalog.add_files(files=[{'path': os.path.join(directory, channel, f'{channel}_sample{i:05d}.csv'),
+                                       'directory': directory, 'sim_id': f'{directory_name}_sim{i}',
+                                       'sample_index': i, 'run_number': 1, 'source': f'output/{channel}.csv',
+                                       'channel': channel, 'size': 100, 'sha256': 'abc'}
+                                      for i in range(n_samples)])
+
+    def test_find_files(self):
+        self.catalog.add_receipt(receipt_path=self.receipt_path, suite_id='suite0', suite_name='scenarios')
+        self.add_files(directory_name='status_quo--0', n_samples=3)
+        self.add_files(directory_name='condoms--1', n_samples=3)
+        self.add_files(directory_name='condoms--1', n_samples=3, channel='Population')
+
+        files = self.catalog.find_files(channel='Prevalence', experiment_name='condoms', sample_indices=[0, 2])
+        self.assertEqual(['condoms--1_sim0', 'condoms--1_sim2'], files['sim_id'].tolist())
+        self.assertEqual({'scenarios'}, set(files['suite_name']))
+        self.assertEqual({'exp1'}, set(files['experiment_id']))
+
+        files = self.catalog.find_files(overrides={'Condom_Usage_Max': 0.5})
+        self.assertEqual(6, len(files))
+        self.assertEqual(3, len(self.catalog.find_files(suite_id='suite0', channel='Prevalence',
+                                                        experiment_name='status_quo')))
+        self.assertEqual(0, len(self.catalog.find_files(suite_name='other')))
+
+    def test_updates_keep_known_values(self):
+        self.catalog.add_receipt(receipt_path=self.receipt_path, suite_id='suite0', suite_name='scenarios')
+        # e.g. a later download from the receipt, which does not know the suite
+        self.catalog.add_receipt(receipt_path=self.receipt_path)
+        experiments = self.catalog.experiments()
+        self.assertEqual(2, len(experiments))
+        self.assertEqual({'suite0'}, set(experiments['suite_id']))
+        self.assertEqual([0, 1], experiments['receipt_index'].tolist())
+
+        self.add_files(directory_name='condoms--1', n_samples=2)
+        self.add_files(directory_name='condoms--1', n_samples=2)
+        self.assertEqual(2, len(self.catalog.find_files()))
+
+    def test_parse_arguments(self):
+        self.assertEqual([0, 1, 2, 7], parse_sample_indices('0-2,7'))
+        self.assertEqual({'Condom_Usage_Max': 0.5, 'Scenario': 'baseline'},
+                         parse_overrides(['Condom_Usage_Max=0.5', 'Scenario=baseline']))
+        with self.assertRaises(ValueError):
+            parse_overrides(['Condom_Usage_Max'])
+
+
+if __name__ == '__main__':
+    unittest.main()
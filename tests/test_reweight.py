@@ -0,0 +1,128 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+import emodpy_workflow.lib.utils.project_data as ingest_utils
+from emodpy_workflow.lib.analysis.hiv_analyzer import HIVAnalyzer
+from emodpy_workflow.lib.analysis.hiv_calib_site import HIVCalibSite
+from emodpy_workflow.lib.analysis.population_obs import PopulationObs
+from emodpy_workflow.scripts.reweight import MismatchedReferenceDataException, MissingStratumLikelihoodsException, \
+    load_stratum_likelihoods, reference_weights_for, reweight
+
+
+class Simulation(SimpleNamespace):
+    __hash__ = object.__hash__
+
+
+class TestReweight(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        filename = os.path.join(os.path.dirname(__file__), 'input', 'analyzers', 'valid_ingest_form.xlsm')
+        _, site_info, reference, analyzers, _ = ingest_utils.parse_ingest_data_from_xlsm(filename=filename)
+        site = HIVCalibSite(reference_data=reference, site_data=site_info, analyzers=analyzers, force_apply=True)
+        analyzer_dict = [a for a in analyzers
+                         if a['channel'] == 'Prevalence' and a['provinciality'] == PopulationObs.PROVINCIAL][0]
+        self.analyzer = HIVAnalyzer(site=site, weight=0.5,
+                                    channel=analyzer_dict['channel'],
+                                    distribution=analyzer_dict['distribution'],
+                                    provinciality=analyzer_dict['provinciality'],
+                                    scale_population=analyzer_dict['scale_population'],
+                                    age_bins=analyzer_dict['age_bins'])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def analyze_iteration(self, iteration, n_samples=3):
+        # one simulation per sample, each with its own (reproducible) prevalence per reference stratum
+        self.analyzer.working_dir = os.path.join(self.directory.name, f'iter{iteration}')
+        reference = self.analyzer.reference._dataframe
+        node_ids = {province: node for node, province in self.analyzer.site.node_map.items()}
+        random = np.random.default_rng(seed=iteration)
+        all_data = {}
+        for sample in range(n_samples):
+            sim_df = reference[['Year', 'Gender', 'AgeBin']].assign(
+                Node=reference['Province'].map(node_ids),
+                **{HIVAnalyzer.SIM_RESULT_CHANNEL: random.uniform(0.05, 0.5, size=len(reference.index))})
+            simulation = Simulation(id=f'sim{iteration}_{sample}', tags={'__sample_index__': sample})
+            all_data[simulation] = self.analyzer.map(data={self.analyzer.filenames[0]: sim_df}, item=None)
+        return self.analyzer.reduce(all_data=all_data)
+
+    def test_load_stratum_likelihoods(self):
+        self.assertRaises(MissingStratumLikelihoodsException, load_stratum_likelihoods,
+                          calibration_dir=self.directory.name)
+
+        self.analyze_iteration(iteration=0)
+        self.analyze_iteration(iteration=1)
+        stratum_likelihoods = load_stratum_likelihoods(calibration_dir=self.directory.name)
+        self.assertEqual([(0, self.analyzer.uid), (1, self.analyzer.uid)], sorted(stratum_likelihoods.keys()))
+        likelihoods = stratum_likelihoods[(0, self.analyzer.uid)]
+        self.assertEqual(['Sample', *self.analyzer.reference.stratifiers], list(likelihoods.index.names))
+        self.assertEqual([0, 1, 2], sorted(set(likelihoods.index.get_level_values('Sample'))))
+        self.assertEqual([HIVAnalyzer.LOG_LIKELIHOOD_CHANNEL, PopulationObs.WEIGHT_CHANNEL],
+                         list(likelihoods.columns))
+
+    def test_reference_weights_for(self):
+        self.analyze_iteration(iteration=0)
+        likelihoods = load_stratum_likelihoods(calibration_dir=self.directory.name)[(0, self.analyzer.uid)]
+        weights = reference_weights_for(stratum_likelihoods=likelihoods, analyzer=self.analyzer)
+        np.testing.assert_allclose(weights, likelihoods[PopulationObs.WEIGHT_CHANNEL].to_numpy())
+
+        # re-weighting cannot change the reference strata
+        reference = self.analyzer.reference._dataframe
+        self.analyzer.reference._dataframe = reference.loc[reference['Province'] != 'Atacama']
+        self.assertRaises(MismatchedReferenceDataException, reference_weights_for,
+                          stratum_likelihoods=likelihoods, analyzer=self.analyzer)
+
+    def test_reference_weights_for_numeric_strata(self):
+        # numeric-looking strata (node-numbered provinces, years) are loaded back as strings
+        iteration_directory = os.path.join(self.directory.name, 'iter0')
+        os.makedirs(iteration_directory)
+        pd.DataFrame({'Sample': [0, 0], 'Province': ['1', '2'], 'Year': [2010.5, 2010.5],
+                      HIVAnalyzer.LOG_LIKELIHOOD_CHANNEL: [-1.0, -2.0], PopulationObs.WEIGHT_CHANNEL: [1.0, 1.0]})\
+            .to_csv(os.path.join(iteration_directory, HIVAnalyzer.construct_stratum_likelihoods_filename(uid='a')),
+                    index=False)
+        likelihoods = load_stratum_likelihoods(calibration_dir=self.directory.name)[(0, 'a')]
+        reference = pd.DataFrame({'Province': pd.Series(['2', '1'], dtype='string'), 'Year': [2010.5, 2010.5],
+                                  PopulationObs.WEIGHT_CHANNEL: [3.0, 1.0]})
+        analyzer = SimpleNamespace(uid='a', reference=SimpleNamespace(stratifiers=['Province', 'Year'],
+                                                                      _dataframe=reference))
+        self.assertEqual([1.0, 3.0], reference_weights_for(stratum_likelihoods=likelihoods, analyzer=analyzer).tolist())
+
+        reference['Province'] = [2, 1]
+        self.assertEqual([1.0, 3.0], reference_weights_for(stratum_likelihoods=likelihoods, analyzer=analyzer).tolist())
+
+    def test_reweight_from_saved_likelihoods(self):
+        results = {iteration: self.analyze_iteration(iteration=iteration) for iteration in [0, 1]}
+        stratum_likelihoods = load_stratum_likelihoods(calibration_dir=self.directory.name)
+
+        # the calibration weights reproduce the analyzed likelihoods
+        reweighted = reweight(stratum_likelihoods=stratum_likelihoods, analyzer_weights={self.analyzer.uid: 0.5},
+                              analyzers={self.analyzer.uid: self.analyzer})
+        self.assertEqual(['iteration', 'sample'], list(reweighted.index.names))
+        self.assertEqual(sorted(reweighted['total'], reverse=True), reweighted['total'].tolist())
+        for iteration, expected in results.items():
+            np.testing.assert_allclose(reweighted.loc[iteration, self.analyzer.uid].sort_index().to_numpy(),
+                                       expected.to_numpy())
+        np.testing.assert_allclose(reweighted['total'].to_numpy(), reweighted[self.analyzer.uid].to_numpy())
+
+        # analyzer weights scale the likelihoods; new reference weights of the edited ingest form are applied
+        reweighted = reweight(stratum_likelihoods=stratum_likelihoods, analyzer_weights={self.analyzer.uid: 1.0})
+        np.testing.assert_allclose(reweighted.loc[0, 'total'].sort_index().to_numpy(), results[0].to_numpy() * 2)
+        reference = self.analyzer.reference._dataframe
+        self.analyzer.reference._dataframe = reference.assign(**{
+            PopulationObs.WEIGHT_CHANNEL: np.where(reference['Province'] == 'Atacama', 1.0, 0.0)})
+        reweighted = reweight(stratum_likelihoods=stratum_likelihoods, analyzer_weights={self.analyzer.uid: 1.0},
+                              analyzers={self.analyzer.uid: self.analyzer})
+        likelihoods = stratum_likelihoods[(0, self.analyzer.uid)][HIVAnalyzer.LOG_LIKELIHOOD_CHANNEL]
+        atacama = likelihoods.xs('Atacama', level='Province')
+        np.testing.assert_allclose(reweighted.loc[0, 'total'].sort_index().to_numpy(),
+                                   atacama.groupby('Sample').mean().to_numpy())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from argparse import Namespace
+from types import SimpleNamespace
+from unittest import mock
+
+from idmtools.core import EntityStatus
+
+import pandas as pd
+
+from emodpy_workflow.scripts import download
+from emodpy_workflow.scripts.run import download_args, experiment_definitions, match_receipt_definitions, \
+    samples_to_resume, submit_experiments
+
+
+class FakePlatform:
+    def __init__(self, simulations):
+        self.simulations = simulations
+
+    def get_children(self, item_id, item_type, force=False):
+        return self.simulations
+
+
+class SlowPlatform:
+    def __init__(self, delay):
+        self.delay = delay
+        self.submitted = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def run_items(self, item):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+            self.submitted.append(item)
+
+
+class TestRun(unittest.TestCase):
+
+    def test_experiment_definitions(self):
+        sweeps = [{'experiment_name': 'high', 'Base_Infectivity': 2.0}, {'Base_Infectivity': 1.0}]
+        args = Namespace(sweep_parameter_sets={'baseline': {'sweeps': sweeps}}, doing_sweeps=True, suite_name='suite')
+        definitions = experiment_definitions(args=args, frames={'baseline': None})
+        self.assertEqual(definitions, [('baseline', 'high', {'Base_Infectivity': 2.0}),
+                                       ('baseline', 'baseline', {'Base_Infectivity': 1.0})])
+        # the sweep definitions are left intact, so they can be compared against a receipt again
+        self.assertEqual(experiment_definitions(args=args, frames={'baseline': None}), definitions)
+
+    def test_match_receipt_definitions_across_frames(self):
+        args = Namespace(sweep_parameter_sets={'baseline': {'sweeps': [{}]},
+                                               'minimal': {'sweeps': [{'experiment_name': 'low', 'x': 1},
+                                                                      {'experiment_name': 'high', 'x': 2}]}},
+                         doing_sweeps=True, suite_name='suite')
+        receipt = pd.DataFrame({'frame': ['minimal', 'minimal', 'baseline'],
+                                'experiment_name': ['low', 'high', 'baseline'],
+                                'experiment_id': ['e0', 'e1', 'e2']},
+                               index=pd.Index([0, 1, 2], name='index'))
+        # the frames are defined in a different order than the receipt was written in
+        definitions = experiment_definitions(args=args, frames={'baseline': None, 'minimal': None})
+        matched = match_receipt_definitions(receipt=receipt, definitions=definitions)
+        self.assertEqual([(index, row['experiment_id'], definition) for index, row, definition in matched],
+                         [(0, 'e0', ('minimal', 'low', {'x': 1})),
+                          (1, 'e1', ('minimal', 'high', {'x': 2})),
+                          (2, 'e2', ('baseline', 'baseline', {}))])
+
+        with self.assertRaises(ValueError):
+            match_receipt_definitions(receipt=receipt.iloc[:2], definitions=definitions)
+        with self.assertRaises(ValueError):
+            match_receipt_definitions(receipt=receipt, definitions=definitions[:2])
+
+    def test_samples_to_resume(self):
+        def simulation(sample_index, status):
+            return SimpleNamespace(tags={'__sample_index__': str(sample_index)}, status=status)
+        platform = FakePlatform(simulations=[simulation(0, EntityStatus.SUCCEEDED),
+                                             simulation(1, EntityStatus.FAILED),
+                                             simulation(2, EntityStatus.RUNNING),
+                                             simulation(3, EntityStatus.FAILED),
+                                             simulation(3, EntityStatus.SUCCEEDED)])  # already resumed once
+        # sample 1 failed, sample 4 is missing, sample 5 is linked to a completed simulation elsewhere
+        self.assertEqual(samples_to_resume(platform=platform, experiment_id='exp', n_samples=6,
+                                           linked_sample_indices=[5]), [1, 4])
+
+    def test_submit_experiments_concurrently(self):
+        platform = SlowPlatform(delay=0.2)
+        built = []
+
+        def experiments():
+            for index in range(8):
+                # submissions may lag building by no more than the number of workers (plus the one being built)
+                self.assertLessEqual(len(built) - len(platform.submitted), 5)
+                built.append(index)
+                yield index
+
+        start = time.time()
+        submit_experiments(platform=platform, experiments=experiments(), max_workers=4)
+        self.assertEqual(sorted(platform.submitted), list(range(8)))
+        self.assertEqual(platform.max_in_flight, 4)
+        self.assertLess(time.time() - start, 8 * 0.2)
+
+    def test_submission_errors_are_raised(self):
+        class FailingPlatform:
+            def run_items(self, item):
+                raise RuntimeError('submission failed')
+        self.assertRaises(RuntimeError, submit_experiments, platform=FailingPlatform(), experiments=iter([1]),
+                          max_workers=2)
+
+    def test_download_args_are_accepted_by_download(self):
+        with tempfile.TemporaryDirectory() as directory:
+            receipt_path = os.path.join(directory, 'experiment_index.csv')
+            pd.DataFrame({'frame': ['baseline', 'baseline'], 'experiment_id': ['exp1', 'exp2'],
+                          'experiment_name': ['arm_a', 'arm_b']}).rename_axis('index').to_csv(receipt_path)
+            args = Namespace(download_filenames=['output/InsetChart.json'], catalog=None)
+            with mock.patch.object(download, 'Platform'), \
+                    mock.patch.object(download, 'download_experiments', return_value=[]) as download_experiments:
+                download.main(args=download_args(args=args, platform_name='SLURM', receipt_path=receipt_path))
+        kwargs = download_experiments.call_args.kwargs
+        self.assertEqual(['exp1', 'exp2'], list(kwargs['experiment_ids']))
+        self.assertEqual(['output/InsetChart.json'], kwargs['analyzer'].filenames)
+        self.assertFalse(kwargs['skip_early_terminated'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import pandas as pd
+from emod_api.demographics.node import Node
+from emod_api.schema_to_class import ReadOnlyDict
+from emodpy.demographics.demographics import Demographics
+from emodpy.emod_task import EMODTask
+from idmtools.assets import Asset, AssetCollection
+from idmtools.core import EntityStatus
+
+from emodpy_workflow.lib.analysis.download_analyzer_by_experiment_receipt import DownloadAnalyzerByExperimentReceipt
+from emodpy_workflow.lib.utils.simulation_index import simulation_input_hash, SimulationIndex, \
+    LINKED_SIMULATIONS_FILENAME
+
+
+def build_simulation(run_number, sample_index=0, population=1000, eradication_path=None):
+    parameters = ReadOnlyDict({'Run_Number': run_number, 'Base_Infectivity': 1.5, 'Demographics_Filenames': []})
+    task = SimpleNamespace(config=ReadOnlyDict({'parameters': parameters}),
+                           campaign=None,
+                           reporters=SimpleNamespace(builtin_reporters=[]),
+                           eradication_path=eradication_path,
+                           transient_assets=AssetCollection(),
+                           common_assets=AssetCollection())
+    # as runtime.map_sample_to_model_input() builds demographics: into a randomly named temporary file
+    EMODTask.create_demographics_from_callback(
+        task, builder=lambda: Demographics(nodes=[Node(lat=0, lon=0, pop=population, forced_id=1)]), from_sweep=True)
+    return SimpleNamespace(task=task, tags={'__sample_index__': sample_index})
+
+
+class FakePlatform:
+    def __init__(self, statuses):
+        self.statuses = statuses  # experiment id: {simulation id: status}
+        self.n_queries = 0
+
+    def get_children(self, item_id, item_type, force=False):
+        self.n_queries += 1
+        return [SimpleNamespace(id=sim_id, status=status) for sim_id, status in self.statuses[item_id].items()]
+
+
+class TestSimulationIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'simulation_index.csv')
+        # keep the demographics files emodpy builds in this test's directory
+        patcher = mock.patch('tempfile.tempdir', self.directory.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_executable_is_hashed_once(self):
+        executable = os.path.join(self.directory.name, 'Eradication')
+        with open(executable, 'wb') as f:
+            f.write(b'version 1')
+        with mock.patch.object(Asset, 'calculate_checksum', autospec=True,
+                               side_effect=Asset.calculate_checksum) as checksum:
+            hashes = [simulation_input_hash(build_simulation(run_number=run_number, eradication_path=executable))
+                      for run_number in range(3)]
+        executable_checksums = [call for call in checksum.call_args_list if call.args[0].absolute_path == executable]
+        self.assertEqual(1, len(executable_checksums))
+        self.assertEqual(3, len(set(hashes)))
+
+        # a changed executable is hashed again
+        with open(executable, 'wb') as f:
+            f.write(b'version 2, rebuilt')
+        self.assertNotEqual(hashes[0], simulation_input_hash(build_simulation(run_number=0,
+                                                                              eradication_path=executable)))
+
+    def test_input_hash_depends_on_all_inputs(self):
+        reference = simulation_input_hash(build_simulation(run_number=1))
+        self.assertEqual(reference, simulation_input_hash(build_simulation(run_number=1, sample_index=7)))
+        self.assertNotEqual(reference, simulation_input_hash(build_simulation(run_number=2)))
+        self.assertNotEqual(reference, simulation_input_hash(build_simulation(run_number=1, population=500)))
+
+    def test_input_hash_ignores_demographics_filenames(self):
+        simulations = [build_simulation(run_number=1) for _ in range(2)]
+        filenames = [simulation.task.config.parameters.Demographics_Filenames for simulation in simulations]
+        self.assertNotEqual(filenames[0], filenames[1])  # emodpy names each built demographics file randomly
+        self.assertEqual(simulation_input_hash(simulations[0]), simulation_input_hash(simulations[1]))
+
+    def test_only_completed_simulations_are_linked(self):
+        index = SimulationIndex(path=self.path)
+        hashes = [simulation_input_hash(build_simulation(run_number=run_number)) for run_number in range(3)]
+        for run_number, input_hash in enumerate(hashes):
+            index.add(input_hash=input_hash, platform_name='SLURM', experiment_id='exp1',
+                      simulation_id=f'sim{run_number}')
+        index.save()
+
+        platform = FakePlatform(statuses={'exp1': {'sim0': EntityStatus.SUCCEEDED,
+                                                   'sim1': EntityStatus.FAILED,
+                                                   'sim2': EntityStatus.RUNNING}})
+        index = SimulationIndex(path=self.path)
+        simulations = [build_simulation(run_number=run_number, sample_index=run_number) for run_number in range(4)]
+        to_run, input_hashes, linked = index.partition(simulations=simulations, platform=platform,
+                                                       platform_name='SLURM')
+        self.assertEqual(linked, {0: 'sim0'})
+        self.assertEqual([simulation.tags['__sample_index__'] for simulation in to_run], [1, 2, 3])
+        self.assertEqual(input_hashes[:2], hashes[1:])
+        self.assertEqual(platform.n_queries, 1)  # statuses are retrieved once per experiment
+        # the failed simulation is dropped from the index, the running one is kept
+        self.assertEqual(sorted(index.index['simulation_id']), ['sim0', 'sim2'])
+
+        # nothing is linked across platforms
+        _, _, linked = index.partition(simulations=simulations, platform=platform, platform_name='COMPS')
+        self.assertEqual(linked, {})
+
+    def test_receipt_download_writes_linked_simulations_into_receipt_experiments(self):
+        receipt_path = os.path.join(self.directory.name, 'experiment_index.csv')
+        receipt = pd.DataFrame({'frame': ['baseline', 'baseline'], 'experiment_id': ['exp1', None],
+                                'experiment_name': ['arm_a', 'arm_b']})
+        receipt.index.name = 'index'
+        receipt.to_csv(receipt_path)
+        pd.DataFrame({'receipt_index': [1, 1], 'sample_index': [0, 1], 'simulation_id': ['old0', 'old1']}).to_csv(
+            os.path.join(self.directory.name, LINKED_SIMULATIONS_FILENAME), index=False)
+
+        analyzer = DownloadAnalyzerByExperimentReceipt(filenames=['output/InsetChart.json'],
+                                                       receipt_file=receipt_path)
+        self.assertEqual(analyzer.linked_simulation_ids, ['old0', 'old1'])
+
+        linked = SimpleNamespace(id='old1', tags={'__sample_index__': 5, 'Run_Number': 3},
+                                 experiment=SimpleNamespace(id='old_experiment'))
+        [(directory, tags)] = analyzer.destinations(item=linked)
+        self.assertEqual(directory, os.path.join(self.directory.name, 'arm_b--1'))
+        self.assertEqual(tags['__sample_index__'], 1)
+
+        created = SimpleNamespace(id='new0', tags={'__sample_index__': 0, 'Run_Number': 3},
+                                  experiment=SimpleNamespace(id='exp1'))
+        [(directory, tags)] = analyzer.destinations(item=created)
+        self.assertEqual(directory, os.path.join(self.directory.name, 'arm_a--0'))
+
+
+if __name__ == '__main__':
+    unittest.main()
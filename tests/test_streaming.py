@@ -0,0 +1,133 @@
+import os
+import unittest
+from types import SimpleNamespace
+
+import pandas as pd
+from idmtools.core import EntityStatus
+
+from emodpy_workflow.lib.calibration.streaming import StreamingIterationState
+
+
+class FakeAnalyzer:
+    def __init__(self, uid, filenames, result_cache=True):
+        self.uid = uid
+        self.filenames = filenames
+        self.result_cache = {} if result_cache else None
+        self.working_dir = None
+        self.reduced = None
+
+    def cached_result(self, item):
+        return self.result_cache.get(item.id)
+
+    def map(self, data, item):
+        self.result_cache[item.id] = sorted(data.keys())
+        return self.result_cache[item.id]
+
+    def initialize(self):
+        pass
+
+    def destroy(self):
+        pass
+
+    def reduce(self, all_data):
+        self.reduced = all_data
+        return pd.Series({str(simulation.tags['__sample_index__']): float(len(result))
+                          for simulation, result in all_data.items()})
+
+
+class FakePlatform:
+    def __init__(self, experiment=None):
+        self.experiment = experiment
+        self.retrieved = []
+
+    def get_item(self, item_id, item_type):
+        return self.experiment
+
+    def get_files(self, item, files):
+        self.retrieved.append(item.id)
+        return {filename: b'' for filename in files}
+
+
+class FakeSimulation(SimpleNamespace):
+    __hash__ = object.__hash__
+
+
+class FakeNextPointAlgorithm:
+    def __init__(self):
+        self.results = None
+
+    def get_results_to_cache(self, results):
+        results = results.copy()
+        results['total'] = results.sum(axis=1)
+        return results.to_dict(orient='list')
+
+    def set_results_for_iteration(self, iteration, results):
+        self.results = results
+
+    def update_summary_table(self, iteration_state, all_results):
+        return pd.DataFrame({'total': [0.0], 'iteration': [0]}), None
+
+
+class TestStreamingIterationState(unittest.TestCase):
+
+    def build_state(self, analyzers, experiment=None):
+        state = SimpleNamespace(iteration=0, platform=FakePlatform(experiment=experiment), analyzer_list=analyzers,
+                                experiment_id='exp', calibration_directory='calibration', results={}, all_results=None,
+                                next_point_algo=FakeNextPointAlgorithm())
+        return StreamingIterationState.from_iteration_state(state=state, poll_interval=0)
+
+    def test_only_new_succeeded_simulations_are_mapped(self):
+        analyzers = [FakeAnalyzer(uid='a', filenames=['Prevalence.csv', 'Population.csv']),
+                     FakeAnalyzer(uid='b', filenames=['Incidence.csv', 'Population.csv'])]
+        state = self.build_state(analyzers=analyzers)
+
+        simulations = [SimpleNamespace(id='sim1', status=EntityStatus.SUCCEEDED),
+                       SimpleNamespace(id='sim2', status=EntityStatus.RUNNING)]
+        experiment = SimpleNamespace(simulations=simulations)
+        self.assertEqual(state.stream_completed_simulations(experiment=experiment), 1)
+        self.assertEqual(analyzers[0].result_cache, {'sim1': ['Population.csv', 'Prevalence.csv']})
+        self.assertEqual(analyzers[1].result_cache, {'sim1': ['Incidence.csv', 'Population.csv']})
+
+        # the next poll only maps the simulation that has since completed; files are retrieved once per simulation
+        simulations[1].status = EntityStatus.SUCCEEDED
+        self.assertEqual(state.stream_completed_simulations(experiment=experiment), 1)
+        self.assertEqual(state.stream_completed_simulations(experiment=experiment), 0)
+        self.assertEqual(state.platform.retrieved, ['sim1', 'sim2'])
+        self.assertEqual(sorted(analyzers[0].result_cache.keys()), ['sim1', 'sim2'])
+
+    def test_iteration_is_reduced_from_cached_results(self):
+        analyzers = [FakeAnalyzer(uid='a', filenames=['Prevalence.csv']),
+                     FakeAnalyzer(uid='b', filenames=['Incidence.csv', 'Population.csv'])]
+        simulations = [FakeSimulation(id=f'sim{i}', status=EntityStatus.SUCCEEDED, tags={'__sample_index__': i})
+                       for i in range(3)]
+        simulations.append(FakeSimulation(id='sim3', status=EntityStatus.FAILED, tags={'__sample_index__': 3}))
+        experiment = SimpleNamespace(simulations=simulations)
+        state = self.build_state(analyzers=analyzers, experiment=experiment)
+
+        # sim0 was streamed; sim1 is only cached by one analyzer (e.g. an interrupted stream); sim2 is not cached
+        state.stream_completed_simulations(experiment=SimpleNamespace(simulations=simulations[:1]))
+        analyzers[0].map(data={'Prevalence.csv': b''}, item=simulations[1])
+        state.platform.retrieved = []
+
+        state.analyze_iteration()
+        self.assertEqual(['sim1', 'sim2'], state.platform.retrieved)
+        for analyzer in analyzers:
+            self.assertEqual(os.path.join('calibration', 'iter0'), analyzer.working_dir)
+            self.assertEqual(['sim0', 'sim1', 'sim2'], [simulation.id for simulation in analyzer.reduced])
+        self.assertEqual([0, 1, 2], state.next_point_algo.results.index.tolist())
+        self.assertEqual([1.0, 1.0, 1.0], state.next_point_algo.results['a'].tolist())
+        self.assertEqual([2.0, 2.0, 2.0], state.next_point_algo.results['b'].tolist())
+        self.assertEqual([3.0, 3.0, 3.0], state.results['total'])
+
+        # a reloaded iteration is not analyzed again
+        state.platform.retrieved = []
+        self.assertEqual([3.0, 3.0, 3.0], state.analyze_iteration())
+        self.assertEqual([], state.platform.retrieved)
+
+    def test_result_cache_is_required(self):
+        state = self.build_state(analyzers=[FakeAnalyzer(uid='a', filenames=['Prevalence.csv'], result_cache=False)])
+        self.assertRaises(StreamingIterationState.ResultCacheRequiredException, state._verify_result_caches)
+
+
+if __name__ == '__main__':
+    unittest.main()